@@ -4,6 +4,9 @@ from datetime import timedelta
 from routes.main import main_bp
 from routes.auth import auth_bp
 from routes.settings import settings_bp
+from routes.api import api_bp
+from routes.metrics import metrics_bp
+import instrumentation
 
 
 app = Flask(__name__)
@@ -20,6 +23,16 @@ def make_session_permanent():
 app.register_blueprint(main_bp)
 app.register_blueprint(auth_bp)
 app.register_blueprint(settings_bp)
+app.register_blueprint(api_bp)
+app.register_blueprint(metrics_bp)
+
+# Spans, Server-Timing, request logs and opt-in profiling
+instrumentation.init_app(app)
+
+# Async serving mode: the summary view awaits its storage and price I/O concurrently
+if Config.SERVER_MODE == "async":
+    from routes import main_async
+    app.view_functions["main.summary"] = main_async.summary
 
 # ------------------------
 # Jinja Filter Definition
@@ -45,4 +58,8 @@ def format_currency(value, currency_symbol="₹"):
 app.jinja_env.filters["format_currency"] = format_currency
 
 if __name__ == "__main__":
+    # Under gunicorn the scheduler is started per worker (see gunicorn.conf.py)
+    if Config.SUMMARY_REFRESH_MODE == "thread":
+        from scheduler import start_scheduler
+        start_scheduler()
     app.run(host="0.0.0.0", port=8080)
@@ -0,0 +1,165 @@
+# benchmarks/load_test.py
+"""Load test for the summary page, and a sync vs async serving-mode comparison.
+
+Against a running server:
+
+    python benchmarks/load_test.py --url http://127.0.0.1:8080/ --concurrency 50 --requests 500
+
+Comparing modes (run from the repo root; uses the storage configured in the
+environment, so the transaction file must exist there):
+
+    python benchmarks/load_test.py --compare --concurrency 50 --requests 500 --upstream-delay 0.5
+
+--compare starts a stub mfapi server that answers after --upstream-delay
+seconds. It then runs gunicorn once per SERVER_MODE with the price cache and
+the background scheduler disabled, so every request does its price lookups,
+and prints throughput and latency percentiles for both.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+MODES = ("sync", "async")
+
+
+def run_load(url, concurrency, total):
+    """Issue `total` GETs from `concurrency` threads; returns latency and error stats."""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        session = requests.Session()
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=120)
+                ok = response.status_code == 200
+            except requests.RequestException as e:
+                ok, response = False, e
+            elapsed = time.perf_counter() - started
+            with lock:
+                (latencies if ok else errors).append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] if latencies else None
+
+    return {
+        "requests": total,
+        "errors": len(errors),
+        "seconds": round(wall, 3),
+        "throughput": round(len(latencies) / wall, 2) if wall else None,
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+class StubMfapi(BaseHTTPRequestHandler):
+    """/mf/<code>/latest after a fixed delay, in mfapi's response shape."""
+    delay = 0.0
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = json.dumps({"data": [{"date": time.strftime("%d-%m-%Y"), "nav": "100.0"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return True
+        except requests.RequestException:
+            time.sleep(0.25)
+    return False
+
+
+def compare(args):
+    StubMfapi.delay = args.upstream_delay
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), StubMfapi)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    results = {}
+    for mode in MODES:
+        env = dict(
+            os.environ,
+            SERVER_MODE=mode,
+            SUMMARY_REFRESH_MODE="off",
+            PRICE_CACHE_MAX_ENTRIES="0",
+            MFAPI_BASE_URL=f"http://127.0.0.1:{upstream.server_port}",
+        )
+        bind = f"127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "--bind", bind,
+             "--workers", str(args.workers), "--timeout", "120", "app:app"],
+            env=env,
+        )
+        try:
+            url = f"http://{bind}/"
+            if not wait_until_up(url):
+                raise SystemExit(f"gunicorn ({mode}) did not start")
+            run_load(url, 1, 1)  # warm up
+            results[mode] = run_load(url, args.concurrency, args.requests)
+        finally:
+            server.terminate()
+            server.wait()
+    upstream.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080/")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--compare", action="store_true", help="run gunicorn in each SERVER_MODE and compare")
+    parser.add_argument("--upstream-delay", type=float, default=0.5, help="stub mfapi response delay (--compare)")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn workers (--compare)")
+    parser.add_argument("--port", type=int, default=8099, help="gunicorn port (--compare)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = compare(args) if args.compare else {"target": run_load(args.url, args.concurrency, args.requests)}
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 s':>10}{'p95 s':>10}{'p99 s':>10}{'errors':>8}")
+    for mode, stats in results.items():
+        cells = [stats["throughput"], stats["p50"], stats["p95"], stats["p99"]]
+        print(f"{mode:<8}" + "".join(f"{c:>10.3f}" if c is not None else f"{'-':>10}" for c in cells)
+              + f"{stats['errors']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
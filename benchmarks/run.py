@@ -0,0 +1,201 @@
+# benchmarks/run.py
+"""Benchmarks for the tracker, storage and route hot paths.
+
+    python -m benchmarks.run                       # small and medium portfolios
+    python -m benchmarks.run --sizes large --repeat 1
+    python -m benchmarks.run --output new.json --baseline old.json
+
+Everything runs offline: storage goes through the in-memory clients in
+testing/fakes.py and prices are a constant. Results are written as JSON
+(one record per case and size, with the commit they were measured on);
+--baseline prints the ratio to an earlier results file.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Before config is imported: no background refresh, so "/" does the full
+# summary work on every request, and snapshots go to a scratch directory
+os.environ.setdefault("SUMMARY_REFRESH_MODE", "off")
+os.environ.setdefault("SNAPSHOT_CACHE_DIR", tempfile.mkdtemp(prefix="bench-snapshots-"))
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # no per-request log lines
+
+import numpy as np
+
+import tracker
+from config import Config
+from portfolio import FIFO, LotLedger, TransactionType, xirr_batch
+from prices import PriceFetchResult
+from storage import FirestoreBackend, FirestoreRowsBackend, GCSBackend
+
+from testing import fakes
+from .synthetic import SIZES, generate_portfolio, to_csv
+
+STUB_PRICE = 100.0
+
+
+def stub_prices(symbols):
+    result = PriceFetchResult()
+    for key in symbols:
+        result.prices[key] = STUB_PRICE
+    return result
+
+
+def measure(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def cash_flows(by_scheme):
+    """Per scheme: (dates, amounts) with a terminal value at the stub price."""
+    today = datetime.today()
+    groups = []
+    for txns in by_scheme.values():
+        dates, amounts, units = [], [], 0.0
+        for t in txns:
+            sign = -1 if t.type is TransactionType.BUY else 1
+            dates.append(t.day)
+            amounts.append(sign * t.nav * t.units)
+            units -= sign * t.units
+        dates.append(today)
+        amounts.append(units * STUB_PRICE)
+        groups.append((dates, amounts))
+    return groups
+
+
+def replay_fifo(by_scheme):
+    for txns in by_scheme.values():
+        ledger = LotLedger(FIFO)
+        for t in sorted(txns, key=lambda t: t.day):
+            if t.type is TransactionType.BUY:
+                ledger.buy(t.day, t.units, t.nav)
+            else:
+                ledger.sell(t.day, t.units, t.nav)
+
+
+def storage_cases(header, rows, repeat):
+    fakes.install()
+    backends = {
+        "gcs": lambda: GCSBackend("bench-bucket"),
+        "firestore": lambda: FirestoreBackend(),
+        "firestore_rows": lambda: FirestoreRowsBackend(),
+    }
+    for name, make in backends.items():
+        backend = make()
+        yield f"{name}.save_csv", measure(lambda: backend.save_csv("bench.csv", header, rows), repeat)
+        yield f"{name}.load_csv", measure(lambda: backend.load_csv("bench.csv"), repeat)
+
+
+def route_cases(header, rows, schemes, repeat):
+    fakes.install()
+    from app import app
+
+    GCSBackend(Config.BUCKET_NAME).save_csv(Config.CSV_FILENAME, header, rows)
+    client = app.test_client()
+    client.post("/login", data={"username": Config.USERNAME, "password": Config.PASSWORD})
+    client.get("/")  # first hit builds the snapshot and saved state
+
+    def get_summary():
+        response = client.get("/")
+        assert response.status_code == 200, response.status_code
+
+    yield "route.summary", measure(get_summary, repeat)
+
+    batches = iter(range(1, repeat + 1))
+
+    def post_upload():
+        # A fresh batch each time, so rows are not all duplicates
+        _, new_rows = generate_portfolio(schemes, min(1000, len(rows)), seed=next(batches))
+        data = {"file": (io.BytesIO(to_csv(header, new_rows).encode("utf-8")), "upload.csv")}
+        response = client.post("/upload", data=data, content_type="multipart/form-data")
+        assert response.status_code in (200, 302), response.status_code
+
+    yield "route.upload", measure(post_upload, repeat)
+
+
+def run_size(size, repeat):
+    schemes, transactions = SIZES[size]
+    header, rows = generate_portfolio(schemes, transactions)
+    text = to_csv(header, rows)
+    by_scheme = tracker.read_transactions(io.StringIO(text))
+    groups = cash_flows(by_scheme)
+
+    yield "read_transactions", measure(lambda: tracker.read_transactions(io.StringIO(text)), repeat)
+    yield "generate_summary_data", measure(lambda: tracker.generate_summary_data(by_scheme), repeat)
+    yield "xirr", measure(lambda: [tracker.xirr(list(zip(*group))) for group in groups], repeat)
+    yield "xirr_batch", measure(lambda: xirr_batch(groups), repeat)
+    yield "fifo", measure(lambda: replay_fifo(by_scheme), repeat)
+    yield from storage_cases(header, rows, repeat)
+    yield from route_cases(header, rows, schemes, repeat)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small,medium", help=f"comma-separated, from {', '.join(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    tracker.get_latest_prices = stub_prices
+    results = []
+    for size in args.sizes.split(","):
+        schemes, transactions = SIZES[size]
+        for case, timings in run_size(size, args.repeat):
+            record = {
+                "case": case,
+                "size": size,
+                "schemes": schemes,
+                "transactions": transactions,
+                "repeat": len(timings),
+                "min": min(timings),
+                "median": statistics.median(timings),
+                "mean": statistics.fmean(timings),
+            }
+            results.append(record)
+            print(f"{size:<8}{case:<26}{record['min']:>10.4f}s min{record['median']:>10.4f}s median", flush=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+        print(f"\nvs {args.baseline} (median, new / old; above 1 is slower)")
+        for record in results:
+            old = baseline.get((record["case"], record["size"]))
+            if old and old["median"]:
+                print(f"{record['size']:<8}{record['case']:<26}{record['median'] / old['median']:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
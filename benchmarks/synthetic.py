@@ -0,0 +1,56 @@
+# benchmarks/synthetic.py
+"""Synthetic SIP portfolios for the benchmarks."""
+import csv
+import io
+import random
+from datetime import date, timedelta
+
+HEADER = ["date", "scheme_code", "scheme_name", "nav", "units", "type", "asset_type"]
+ASSET_TYPES = ("mutual_fund", "mutual_fund", "indian_equity", "aus_equity")
+
+SIZES = {
+    "small": (10, 10_000),
+    "medium": (100, 100_000),
+    "large": (1_000, 1_000_000),
+}
+
+
+def generate_portfolio(schemes, transactions, seed=0):
+    """(header, rows): `transactions` CSV rows spread over `schemes` schemes.
+
+    Each scheme is a daily-ish SIP with a random-walk NAV and about one
+    sell in twenty, so FIFO matching has real work to do.
+    """
+    rng = random.Random(seed)
+    per_scheme = max(transactions // schemes, 1)
+    start = date(2005, 1, 1)
+    rows = []
+    for s in range(schemes):
+        asset_type = ASSET_TYPES[s % len(ASSET_TYPES)]
+        code = f"SYN{s:04d}.AX" if asset_type == "aus_equity" else f"{100000 + s}"
+        name = f"Synthetic Scheme {s}"
+        nav = rng.uniform(10, 500)
+        held = 0.0
+        day = start + timedelta(days=rng.randrange(365))
+        for _ in range(per_scheme):
+            day += timedelta(days=rng.randint(1, 3))
+            nav = max(nav * (1 + rng.gauss(0.0003, 0.01)), 0.01)
+            if held > 1 and rng.random() < 0.05:
+                units = round(held * rng.uniform(0.05, 0.3), 3)
+                held -= units
+                tx_type = "sell"
+            else:
+                units = round(rng.uniform(1000, 10000) / nav, 3)
+                held += units
+                tx_type = "buy"
+            rows.append((day.strftime("%d-%m-%Y"), code, name, f"{nav:.4f}", f"{units:.3f}", tx_type, asset_type))
+    rows = rows[:transactions]
+    return HEADER, rows
+
+
+def to_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue()
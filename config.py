@@ -1,4 +1,5 @@
 from datetime import timedelta
+import json
 import os
 
 class Config:
@@ -8,3 +9,123 @@ class Config:
     USERNAME = os.environ.get("UPLOAD_USER", "admin")
     PASSWORD = os.environ.get("UPLOAD_PASS", "secret")
     PERMANENT_SESSION_LIFETIME = timedelta(minutes=5)
+
+    # Logins and the portfolios each one may open (see routes/auth.py), e.g.
+    # PORTFOLIO_USERS='{"asha": {"password": "...", "portfolios": ["family"]}}';
+    # "*" opens every portfolio. UPLOAD_USER/UPLOAD_PASS stay the admin login.
+    USERS = {
+        USERNAME: {"password": PASSWORD, "portfolios": ["*"]},
+        **json.loads(os.environ.get("PORTFOLIO_USERS", "{}")),
+    }
+
+    # Latest-price fetching (see prices/engine.py)
+    MFAPI_BASE_URL = os.environ.get("MFAPI_BASE_URL", "https://api.mfapi.in")
+    PRICE_FETCH_TIMEOUT = float(os.environ.get("PRICE_FETCH_TIMEOUT", 10))    # per upstream request
+    PRICE_FETCH_DEADLINE = float(os.environ.get("PRICE_FETCH_DEADLINE", 20))  # whole summary fetch
+    PRICE_FETCH_CONCURRENCY = {
+        "mfapi": int(os.environ.get("MFAPI_CONCURRENCY", 8)),
+        "yahoo": int(os.environ.get("YAHOO_CONCURRENCY", 4)),
+    }
+
+    # Pooled keep-alive HTTP for the price APIs (see prices/http.py):
+    # connections kept per upstream base URL, and bytes of revalidatable responses kept
+    HTTP_POOL_SIZE = {
+        MFAPI_BASE_URL: PRICE_FETCH_CONCURRENCY["mfapi"],
+        "https://au.finance.yahoo.com": PRICE_FETCH_CONCURRENCY["yahoo"],
+        "default": 10,
+    }
+    HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+    # Price providers (see prices/providers.py): fallback order per asset type,
+    # overridable with e.g. PRICE_PROVIDER_ORDER='{"aus_equity": ["yahoo_page"]}'
+    PRICE_PROVIDER_ORDER = {
+        "mutual_fund": ["mfapi"],
+        "indian_equity": ["yahoo", "yahoo_page"],
+        "aus_equity": ["yahoo", "yahoo_page"],
+        **json.loads(os.environ.get("PRICE_PROVIDER_ORDER", "{}")),
+    }
+    PRICE_PROVIDER_DEFAULTS = {
+        "timeout": PRICE_FETCH_TIMEOUT,  # seconds per attempt
+        "retries": int(os.environ.get("PRICE_FETCH_RETRIES", 1)),
+        "backoff": 0.25,  # seconds; retry n waits up to backoff * 2^n, jittered
+        "breaker_threshold": 5,  # consecutive failures that open the circuit
+        "breaker_cooldown": 60,  # seconds before a trial call is let through
+    }
+    PRICE_PROVIDER_SETTINGS = {  # per-provider overrides of the defaults
+        "yahoo_page": {"timeout": 5, "retries": 0},
+    }
+
+    # Latest-price cache (see prices/cache.py)
+    PRICE_CACHE_BACKEND = os.environ.get("PRICE_CACHE_BACKEND", "memory")  # "memory" or "sqlite"
+    PRICE_CACHE_PATH = os.environ.get("PRICE_CACHE_PATH", "/tmp/sample_app/price_cache.sqlite3")
+    PRICE_CACHE_MAX_ENTRIES = int(os.environ.get("PRICE_CACHE_MAX_ENTRIES", 5000))
+    PRICE_CACHE_MAX_STALE = int(os.environ.get("PRICE_CACHE_MAX_STALE", 7 * 24 * 3600))  # serve-stale window, seconds
+    PRICE_CACHE_TTL = {
+        "indian_equity": int(os.environ.get("EQUITY_PRICE_TTL", 300)),
+        "aus_equity": int(os.environ.get("EQUITY_PRICE_TTL", 300)),
+        "default": 300,
+    }
+    MF_NAV_PUBLISH_TIME = os.environ.get("MF_NAV_PUBLISH_TIME", "23:00")  # AMFI publishes NAVs by 11 PM IST
+    MF_NAV_PUBLISH_TZ = "Asia/Kolkata"
+
+    # Historical daily prices (see prices/history.py)
+    PRICE_HISTORY_PATH = os.environ.get("PRICE_HISTORY_PATH", "/tmp/sample_app/price_history.sqlite3")
+    PRICE_HISTORY_TIMEOUT = int(os.environ.get("PRICE_HISTORY_TIMEOUT", 30))  # seconds per history download
+    PRICE_HISTORY_RECHECK = int(os.environ.get("PRICE_HISTORY_RECHECK", 6 * 3600))  # seconds before asking upstream for newer closes
+    PRICE_HISTORY_DEADLINE = float(os.environ.get("PRICE_HISTORY_DEADLINE", 120))  # whole background history update
+    PRICE_HISTORY_WAIT = float(os.environ.get("PRICE_HISTORY_WAIT", 5))  # seconds /api/history waits for downloads
+
+    # Seconds each worker caches the storage backend setting read from Firestore
+    BACKEND_TYPE_TTL = int(os.environ.get("BACKEND_TYPE_TTL", 30))
+    # Pins the storage backend, overriding the setting in Firestore: "gcs", "firestore", "firestore_rows" or "local"
+    STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "")
+
+    # Local SQLite storage (see storage/local_backend.py), as a backend of its
+    # own or as a write-through replica in front of gcs/firestore
+    LOCAL_STORAGE_PATH = os.environ.get("LOCAL_STORAGE_PATH", "/tmp/sample_app/storage/storage.sqlite3")
+    LOCAL_STORAGE_MMAP_SIZE = int(os.environ.get("LOCAL_STORAGE_MMAP_SIZE", 256 * 1024 * 1024))  # bytes read via mmap
+    LOCAL_REPLICA = os.environ.get("LOCAL_REPLICA", "") == "1"
+    LOCAL_REPLICA_PATH = os.environ.get("LOCAL_REPLICA_PATH", "/tmp/sample_app/replica-{backend}.sqlite3")
+    LOCAL_REPLICA_TTL = int(os.environ.get("LOCAL_REPLICA_TTL", 30))  # seconds before manifests are re-read remotely
+
+    # How sells are matched against buy lots: "fifo", "lifo" or "average"
+    COST_BASIS_METHOD = os.environ.get("COST_BASIS_METHOD", "fifo")
+
+    # Append-only storage layout (see storage/base.py)
+    SEGMENT_COMPACT_THRESHOLD = int(os.environ.get("SEGMENT_COMPACT_THRESHOLD", 20))  # segments before compaction
+    SEGMENT_GC_GRACE = int(os.environ.get("SEGMENT_GC_GRACE", 600))  # seconds before retired objects are deleted
+
+    # Local copies of columnar transaction snapshots (see portfolio/snapshot.py)
+    SNAPSHOT_CACHE_DIR = os.environ.get("SNAPSHOT_CACHE_DIR", "/tmp/sample_app/snapshots")
+
+    # Rendered summary pages and per-asset-type fragments kept per worker (see page_cache.py)
+    PAGE_CACHE_MAX_ENTRIES = int(os.environ.get("PAGE_CACHE_MAX_ENTRIES", 200))
+    FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get("FRAGMENT_CACHE_MAX_ENTRIES", 100))
+
+    # JSON API and exports (see routes/api.py)
+    API_MAX_PER_PAGE = int(os.environ.get("API_MAX_PER_PAGE", 500))
+    EXPORT_CHUNK_ROWS = int(os.environ.get("EXPORT_CHUNK_ROWS", 1000))  # rows decoded and sent per chunk
+
+    # Serving mode (see gunicorn.conf.py): "sync" workers, or "async" summary
+    # views on threaded workers with prices fetched on a pooled async client
+    SERVER_MODE = os.environ.get("SERVER_MODE", "sync")
+    ASYNC_WORKER_THREADS = int(os.environ.get("ASYNC_WORKER_THREADS", 32))  # requests in flight per worker
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get("ASYNC_HTTP_MAX_CONNECTIONS", 100))
+
+    # Instrumentation (see instrumentation.py)
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+    PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "") == "1"  # allow ?profile=1 to dump a cProfile per request
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/sample_app/profiles")
+
+    # Streaming uploads (see portfolio/ingest.py)
+    UPLOAD_CHUNK_ROWS = int(os.environ.get("UPLOAD_CHUNK_ROWS", 5000))  # rows appended per segment
+
+    # Background price refresh and precomputed summary (see scheduler.py)
+    SUMMARY_REFRESH_MODE = os.environ.get("SUMMARY_REFRESH_MODE", "thread")  # thread (in each app worker, one of them leading), worker (python scheduler.py) or off
+    MARKET_REFRESH_INTERVAL = int(os.environ.get("MARKET_REFRESH_INTERVAL", 900))  # seconds between equity refreshes while markets are open
+    MF_NAV_REFRESH_DELAY = int(os.environ.get("MF_NAV_REFRESH_DELAY", 900))  # seconds after MF_NAV_PUBLISH_TIME
+    SCHEDULER_LEASE = int(os.environ.get("SCHEDULER_LEASE", 180))  # seconds a dead scheduler keeps the leader lease
+    MARKET_HOURS = {  # asset_type -> (timezone, open, close), weekdays only
+        "aus_equity": ("Australia/Sydney", "10:00", "16:10"),
+        "indian_equity": ("Asia/Kolkata", "09:15", "15:30"),
+    }
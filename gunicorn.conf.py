@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+from config import Config
+
+bind = "0.0.0.0:8080"
+
+if Config.SERVER_MODE == "async":
+    # Async views still hold a thread while they await, so the async mode runs
+    # threaded workers: each keeps ASYNC_WORKER_THREADS summary requests in
+    # flight while their price lookups share one pooled async HTTP client
+    worker_class = "gthread"
+    threads = Config.ASYNC_WORKER_THREADS
+
+
+def post_worker_init(worker):
+    # Keep prices and the precomputed summary fresh in the background: one
+    # scheduler thread per worker, started here rather than when app is
+    # imported, so scripts and tests that import it start nothing
+    if Config.SUMMARY_REFRESH_MODE == "thread":
+        from scheduler import start_scheduler
+        start_scheduler()
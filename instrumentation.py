@@ -0,0 +1,210 @@
+# instrumentation.py
+"""Named timing spans, request metrics and structured logs.
+
+Spans recorded while a request is being served end up in its Server-Timing
+header and its log line; every span also feeds a latency histogram served
+in Prometheus text format at /metrics. Metrics are per worker process.
+"""
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from config import Config
+
+logger = logging.getLogger("portfolio")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Spans of the request being served in this context (None outside requests)
+_spans = ContextVar("spans", default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(key + (('le', str(bound)),))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', '+Inf'),))} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_labels(key)} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._series = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._series[tuple(sorted(labels.items()))] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._series.items()):
+                lines.append(f"{self.name}{_labels(key)} {value:g}")
+        return lines
+
+
+def _labels(items):
+    if not items:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+REQUEST_SECONDS = Histogram("portfolio_request_duration_seconds", "Request latency by endpoint and status.")
+SPAN_SECONDS = Histogram("portfolio_span_duration_seconds", "Latency of named spans inside requests and jobs.")
+PRICE_FETCH_ERRORS = Counter("portfolio_price_fetch_errors_total", "Failed price lookups by provider.")
+METRICS = [REQUEST_SECONDS, SPAN_SECONDS, PRICE_FETCH_ERRORS]
+
+
+def record(name, seconds, **labels):
+    """Record a finished span measured elsewhere (e.g. in a worker thread)."""
+    SPAN_SECONDS.observe(seconds, span=name)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds, labels))
+
+
+@contextmanager
+def span(name, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started, **labels)
+
+
+def timed(name):
+    """Decorator form of `span`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """One JSON log line: {"event": ..., **fields}."""
+    logger.log(level, json.dumps({"event": event, **fields}, default=str))
+
+
+def render_metrics():
+    # imported late: prices itself records spans
+    from prices import get_price_cache
+    from prices.http import get_conditional_cache
+    from page_cache import FRAGMENTS, PAGES
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, value in sorted(get_price_cache().stats.items()):
+        lines.append(f"# TYPE portfolio_price_cache_{name}_total counter")
+        lines.append(f"portfolio_price_cache_{name}_total {value}")
+    for name, value in sorted(get_conditional_cache().stats.items()):
+        lines.append(f"# TYPE portfolio_price_http_{name}_total counter")
+        lines.append(f"portfolio_price_http_{name}_total {value}")
+    for cache_name, cache in (("page", PAGES), ("fragment", FRAGMENTS)):
+        for name, value in sorted(cache.stats.items()):
+            lines.append(f"# TYPE portfolio_{cache_name}_cache_{name}_total counter")
+            lines.append(f"portfolio_{cache_name}_cache_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Install the request hooks: spans, Server-Timing, a log line per request and opt-in profiling."""
+    from flask import g, request, before_render_template, template_rendered
+
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=Config.LOG_LEVEL, format="%(message)s")
+
+    @app.before_request
+    def start_request():
+        g.instrumentation_started = time.perf_counter()
+        g.instrumentation_token = _spans.set([])
+        g.profiler = None
+        if Config.PROFILE_REQUESTS and request.args.get("profile") == "1":
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def template_started(sender, template, context, **extra):
+        g.template_started = time.perf_counter()
+
+    def template_finished(sender, template, context, **extra):
+        if "template_started" in g:
+            record("render", time.perf_counter() - g.pop("template_started"), template=template.name)
+
+    before_render_template.connect(template_started, app)
+    template_rendered.connect(template_finished, app)
+
+    @app.after_request
+    def finish_request(response):
+        if "instrumentation_started" not in g:
+            return response
+        elapsed = time.perf_counter() - g.instrumentation_started
+        spans = _spans.get() or []
+        endpoint = request.endpoint or "unknown"
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+
+        totals = defaultdict(float)
+        for name, seconds, _ in spans:
+            totals[name] += seconds
+        timings = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items()]
+        response.headers["Server-Timing"] = ", ".join(timings + [f"total;dur={elapsed * 1000:.1f}"])
+
+        if g.profiler is not None:
+            g.profiler.disable()
+            os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+            path = os.path.join(Config.PROFILE_DIR, f"{int(time.time() * 1000)}-{endpoint}.prof")
+            g.profiler.dump_stats(path)
+            log_event("profile_written", path=path, endpoint=endpoint)
+
+        log_event(
+            "request",
+            method=request.method,
+            path=request.path,
+            endpoint=endpoint,
+            status=response.status_code,
+            duration_ms=round(elapsed * 1000, 1),
+            spans=[{"name": name, "ms": round(seconds * 1000, 1), **labels} for name, seconds, labels in spans],
+        )
+        return response
+
+    @app.teardown_request
+    def reset_spans(exc):
+        token = g.pop("instrumentation_token", None)
+        if token is not None:
+            _spans.reset(token)
@@ -0,0 +1,117 @@
+# page_cache.py
+"""Rendered summary pages and per-asset-type fragments.
+
+A summary page is identified by everything it shows: the storage backend
+and transaction file version, the summary snapshot it was rendered from,
+the query string (page, filters, flash message), the logged-in user and
+the coarse "prices as of" age. That identity is the page's ETag, so a
+browser holding the current page gets a 304 without anything being loaded
+or rendered, and a repeat GET in the same worker is served from memory.
+
+The per-asset-type tables are cached apart from the page, keyed on their
+own data, so a new price for one asset type only re-renders its fragments.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import make_response, render_template, request
+from markupsafe import Markup
+
+from config import Config
+
+# Part of every ETag, so pages cached by browsers are dropped when the templates change
+_TEMPLATES = ("summary.html", "_asset_details.html", "_asset_section.html")
+
+
+def _template_digest():
+    digest = hashlib.blake2b(digest_size=8)
+    for name in _TEMPLATES:
+        with open(os.path.join(os.path.dirname(__file__), "templates", name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+_TEMPLATE_DIGEST = _template_digest()
+
+
+class RenderCache:
+    """Per-process LRU of key -> rendered HTML."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return html
+
+    def set(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+PAGES = RenderCache(Config.PAGE_CACHE_MAX_ENTRIES)
+FRAGMENTS = RenderCache(Config.FRAGMENT_CACHE_MAX_ENTRIES)
+
+
+def _digest(*parts):
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def page_etag(*parts):
+    return _digest(_TEMPLATE_DIGEST, *parts)
+
+
+def fragments(summary_data):
+    """{asset_type: {"details": Markup, "section": Markup}} for the summary template."""
+    result = {}
+    for asset_type, data in summary_data.items():
+        key = _digest(_TEMPLATE_DIGEST, asset_type, data)
+        cached = FRAGMENTS.get(key)
+        if cached is None:
+            cached = {
+                "details": Markup(render_template("_asset_details.html", asset_type=asset_type, data=data)),
+                "section": Markup(render_template("_asset_section.html", asset_type=asset_type, data=data)),
+            }
+            FRAGMENTS.set(key, cached)
+        result[asset_type] = cached
+    return result
+
+
+def page_response(html, etag, last_modified):
+    """A 200 for `html`, or a 304 when the request's validators still match."""
+    response = make_response(html)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Pages are per user: browsers may keep them but must revalidate each time
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response.make_conditional(request)
+
+
+def cached_page(etag, last_modified):
+    """The response for an already rendered page, or None if it has to be rendered."""
+    if request.if_none_match.contains(etag):
+        return page_response("", etag, last_modified)
+    html = PAGES.get(etag)
+    if html is None:
+        return None
+    return page_response(html, etag, last_modified)
+
+
+def store_page(html, etag, last_modified):
+    PAGES.set(etag, html)
+    return page_response(html, etag, last_modified)
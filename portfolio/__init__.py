@@ -0,0 +1,8 @@
+from .transactions import Transaction, TransactionSet, TransactionType, parse_transaction
+from .xirr import XirrResult, solve_xirr, xirr_batch
+from .lots import LotLedger, Lot, RealizedGain, FIFO, LIFO, AVERAGE
+from .state import build_scheme_state, build_states, get_states, update_states
+from .snapshot import Snapshot, load_snapshot, save_snapshot
+from .query import TransactionQuery, TransactionPage
+from .ingest import IngestReport, RowHashIndex, ingest_csv
+from .timeseries import PortfolioSeries, holdings, portfolio_series
@@ -0,0 +1,252 @@
+# portfolio/ingest.py
+
+import csv
+import hashlib
+import io
+import logging
+from datetime import datetime
+
+import numpy as np
+
+from config import Config
+from instrumentation import log_event
+from prices.engine import PROVIDERS
+from storage.base import widen_header
+from .snapshot import Snapshot, load_snapshot, save_snapshot
+from .state import update_states
+from .transactions import TransactionSet
+
+ROWHASH_SUFFIX = ".rowhashes.npz"
+FINGERPRINT_FORMAT = 3  # bump when normalization changes; older indexes are rebuilt
+REQUIRED_COLUMNS = ("date", "scheme_code", "scheme_name", "nav", "units")
+TRANSACTION_TYPES = ("buy", "sell")
+MAX_REPORTED_REJECTIONS = 200
+
+
+def _normalize(column, value):
+    value = value.strip()
+    try:
+        if column == "date":
+            return datetime.strptime(value, "%d-%m-%Y").date().isoformat()
+        if column in ("nav", "units"):
+            return repr(float(value))
+    except ValueError:
+        return value
+    if column == "type":
+        return value.lower() or "buy"
+    if column == "asset_type":
+        return value or "mutual_fund"
+    return value
+
+
+def fingerprint(header, row):
+    """64-bit hash of a row's normalized content, independent of column order.
+
+    "100" and "100.0", "BUY" and "buy", or the same columns in another order
+    fingerprint the same; empty columns are left out so a file with an extra
+    blank column still matches, and a missing or blank type/asset_type counts
+    as its default.
+    """
+    values = {"type": "buy", "asset_type": "mutual_fund"}
+    values.update(
+        (column, _normalize(column, value))
+        for column, value in zip(header, row)
+        if value.strip()
+    )
+    fields = sorted(f"{column}={value}" for column, value in values.items())
+    digest = hashlib.blake2b("\x1f".join(fields).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class RowHashIndex:
+    """Sorted uint64 fingerprints of every stored row, saved next to the CSV.
+
+    Uploads check membership with a binary search instead of loading the
+    stored rows; 8 bytes per row stay in memory. `version` is the file
+    version the index was built for.
+    """
+
+    def __init__(self, header, hashes, version):
+        self.header = list(header) if header else None
+        self.hashes = hashes
+        self.version = version
+
+    @classmethod
+    def build(cls, header, rows, version):
+        hashes = np.unique(np.fromiter((fingerprint(header, row) for row in rows), dtype=np.uint64))
+        return cls(header, hashes, version)
+
+    @classmethod
+    def load(cls, backend, filename):
+        """The index for the file's current version, rebuilt (one full load) if missing or stale."""
+        version = backend.get_version(filename)
+        data = backend.load_object(filename + ROWHASH_SUFFIX)
+        if data:
+            arrays = np.load(io.BytesIO(data))
+            current = "format" in arrays and int(arrays["format"]) == FINGERPRINT_FORMAT
+            if current and str(arrays["version"]) == (version or ""):
+                header = [str(name) for name in arrays["header"]] or None
+                return cls(header, arrays["hashes"], version)
+
+        header, rows = backend.load_csv(filename)
+        index = cls.build(header, rows, version)
+        if version is not None:
+            index.save(backend, filename)
+        return index
+
+    def save(self, backend, filename):
+        """Best effort: an index that cannot be stored is rebuilt on the next upload."""
+        buffer = io.BytesIO()
+        np.savez(buffer, header=np.array(self.header or [], dtype=str),
+                 hashes=self.hashes, version=np.array(self.version or ""),
+                 format=np.array(FINGERPRINT_FORMAT))
+        try:
+            backend.save_object(filename + ROWHASH_SUFFIX, buffer.getvalue())
+        except Exception as e:
+            log_event("derived_save_failed", logging.WARNING, object=filename + ROWHASH_SUFFIX, error=repr(e))
+
+    def contains(self, hashes):
+        """Boolean mask: which of `hashes` (uint64 array) are already stored."""
+        positions = np.searchsorted(self.hashes, hashes)
+        found = np.zeros(len(hashes), dtype=bool)
+        in_range = positions < len(self.hashes)
+        found[in_range] = self.hashes[positions[in_range]] == hashes[in_range]
+        return found
+
+    def add(self, hashes):
+        self.hashes = np.union1d(self.hashes, hashes)
+
+
+class IngestReport:
+    def __init__(self):
+        self.accepted = 0
+        self.duplicates = 0
+        self.rejected = []  # (line number, reason, raw cells), capped at MAX_REPORTED_REJECTIONS
+        self.rejected_count = 0
+
+    def reject(self, line_no, reason, row):
+        self.rejected_count += 1
+        if len(self.rejected) < MAX_REPORTED_REJECTIONS:
+            self.rejected.append((line_no, reason, row))
+
+
+def validate_row(record):
+    """Why a row (dict of column -> text) cannot be stored, or None if it is fine."""
+    try:
+        datetime.strptime(record["date"].strip(), "%d-%m-%Y")
+    except ValueError:
+        return f"date '{record['date']}' is not in dd-mm-YYYY format"
+    if not record["scheme_code"].strip():
+        return "scheme_code is empty"
+    for column in ("nav", "units"):
+        try:
+            value = float(record[column])
+        except ValueError:
+            return f"{column} '{record[column]}' is not a number"
+        if not value > 0:
+            return f"{column} must be greater than zero"
+    tx_type = (record.get("type") or "buy").strip().lower()
+    if tx_type not in TRANSACTION_TYPES:
+        return f"type '{record.get('type')}' is not one of {', '.join(TRANSACTION_TYPES)}"
+    if record["asset_type"] not in PROVIDERS:
+        return f"asset_type '{record['asset_type']}' is not one of {', '.join(PROVIDERS)}"
+    return None
+
+
+def ingest_csv(backend, filename, text_stream, method, chunk_rows=None):
+    """Stream an uploaded CSV into storage, row by row.
+
+    Rows are validated and checked against the persisted RowHashIndex, and
+    only new ones are appended, `chunk_rows` at a time, so memory stays bounded
+    by the chunk and the 8-byte-per-row index rather than by the history.
+    The snapshot and states of the new version are derived from the previous
+    version's plus the appended rows; the stored file is not read back.
+    Raises ValueError if the header is unusable.
+    """
+    chunk_rows = chunk_rows or Config.UPLOAD_CHUNK_ROWS
+    reader = csv.reader(text_stream)
+    header = next(reader, None)
+    if not header:
+        raise ValueError("Invalid or empty CSV file.")
+    header = [column.strip() for column in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    # Ensure asset_type exists in the header
+    add_default_asset_type = "asset_type" not in header
+    if add_default_asset_type:
+        header.append("asset_type")
+
+    index = RowHashIndex.load(backend, filename)
+    # Columns the stored file lacks widen its header; stored rows read them as blank
+    stored_header = widen_header(index.header, header) if index.header else header
+    positions = [header.index(column) if column in header else None for column in stored_header]
+    code_idx = stored_header.index("scheme_code")
+
+    report = IngestReport()
+    touched = set()
+    start_version = version = index.version
+    in_sequence = True  # no other write landed between our appends
+    pending = {}
+    appended = []
+
+    def flush():
+        nonlocal version, in_sequence
+        if not pending:
+            return
+        hashes = np.fromiter(pending, dtype=np.uint64, count=len(pending))
+        is_new = ~index.contains(hashes)
+        rows = [row for row, new in zip(pending.values(), is_new) if new]
+        report.duplicates += len(pending) - len(rows)
+        if rows:
+            version, replaced = backend.append_rows(filename, stored_header, rows)
+            in_sequence = in_sequence and replaced == index.version
+            index.header = stored_header
+            index.add(hashes[is_new])
+            index.version = version
+            report.accepted += len(rows)
+            touched.update(row[code_idx] for row in rows)
+            appended.extend(rows)
+        pending.clear()
+
+    for line_no, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+        if add_default_asset_type:
+            row.append("mutual_fund")
+        if len(row) != len(header):
+            report.reject(line_no, f"expected {len(header)} columns, found {len(row)}", row)
+            continue
+        reason = validate_row(dict(zip(header, row)))
+        if reason:
+            report.reject(line_no, reason, row)
+            continue
+
+        stored = tuple(row[i] if i is not None else "" for i in positions)
+        key = fingerprint(stored_header, stored)
+        if key in pending:
+            report.duplicates += 1
+            continue
+        pending[key] = stored
+        if len(pending) >= chunk_rows:
+            flush()
+    flush()
+
+    if report.accepted and in_sequence:
+        index.save(backend, filename)
+        # Derived data for the new version: the previous snapshot extended with
+        # the appended rows, and state rebuilt only for the touched schemes.
+        # If another write interleaved or the previous snapshot is gone, the
+        # next read rebuilds them from the file instead.
+        if start_version is None:
+            snapshot = Snapshot.build(stored_header, appended, version)
+        else:
+            previous = load_snapshot(backend, filename, start_version)
+            usable = previous is not None and previous.header == stored_header
+            snapshot = previous.extend(appended, version) if usable else None
+        if snapshot is not None:
+            save_snapshot(backend, filename, snapshot)
+            update_states(backend, filename, method, start_version, version,
+                          TransactionSet.from_snapshot(snapshot), touched)
+    return report
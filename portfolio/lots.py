@@ -0,0 +1,100 @@
+# portfolio/lots.py
+
+from collections import deque
+
+FIFO = "fifo"
+LIFO = "lifo"
+AVERAGE = "average"
+METHODS = (FIFO, LIFO, AVERAGE)
+
+
+class Lot:
+    # Dates here and in RealizedGain are day numbers (date.toordinal())
+    __slots__ = ("date", "units", "nav")
+
+    def __init__(self, date, units, nav):
+        self.date = date
+        self.units = units
+        self.nav = nav
+
+
+class RealizedGain:
+    """One buy lot (or part of it) closed by a sell, for tax reporting."""
+    __slots__ = ("buy_date", "sell_date", "units", "cost_nav", "sell_nav")
+
+    def __init__(self, buy_date, sell_date, units, cost_nav, sell_nav):
+        self.buy_date = buy_date
+        self.sell_date = sell_date
+        self.units = units
+        self.cost_nav = cost_nav
+        self.sell_nav = sell_nav
+
+    @property
+    def gain(self):
+        return (self.sell_nav - self.cost_nav) * self.units
+
+    @property
+    def holding_days(self):
+        return self.sell_date - self.buy_date
+
+
+class LotLedger:
+    """Open buy lots of one scheme with running units and cost basis.
+
+    Lots live in a deque, so FIFO and LIFO sells consume them in O(1)
+    amortized time. With the average-cost method lots are still drawn down
+    oldest first (holding periods stay correct) but gains use the average cost.
+    """
+
+    def __init__(self, method=FIFO):
+        if method not in METHODS:
+            raise ValueError(f"Unknown cost basis method: {method}")
+        self.method = method
+        self.lots = deque()
+        self.units = 0.0      # units still held in open lots
+        self.cost = 0.0       # cost basis of those units
+        self.realized = 0.0   # realized P/L so far
+        self.gains = []       # RealizedGain records, in sell order
+
+    @property
+    def average_cost(self):
+        return self.cost / self.units if self.units else 0.0
+
+    def buy(self, date, units, nav):
+        self.lots.append(Lot(date, units, nav))
+        self.units += units
+        self.cost += units * nav
+
+    def sell(self, date, units, nav):
+        """Match `units` sold at `nav` against open lots; returns the new gain records.
+
+        Units sold beyond what the ledger holds are not matched.
+        """
+        new_gains = []
+        average = self.average_cost
+        remaining = units
+        while remaining > 0 and self.lots:
+            lot = self.lots[-1] if self.method == LIFO else self.lots[0]
+            matched = min(lot.units, remaining)
+            cost_nav = average if self.method == AVERAGE else lot.nav
+            new_gains.append(RealizedGain(lot.date, date, matched, cost_nav, nav))
+
+            self.units -= matched
+            self.cost -= matched * cost_nav
+            remaining -= matched
+            if matched == lot.units:
+                if self.method == LIFO:
+                    self.lots.pop()
+                else:
+                    self.lots.popleft()
+            else:
+                lot.units -= matched
+
+        if not self.lots:
+            # Clear float residue once the position is fully closed
+            self.units = 0.0
+            self.cost = 0.0
+        for record in new_gains:
+            self.realized += record.gain
+        self.gains.extend(new_gains)
+        return new_gains
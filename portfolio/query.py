@@ -0,0 +1,93 @@
+# portfolio/query.py
+
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+from .snapshot import EPOCH_ORDINAL, INDEXED_COLUMNS
+
+
+class TransactionPage:
+    def __init__(self, rows, page, total_pages, total_rows, newer_cursor, older_cursor):
+        self.rows = rows
+        self.page = page
+        self.total_pages = total_pages
+        self.total_rows = total_rows
+        self.newer_cursor = newer_cursor  # pass as `before` for the previous (newer) page
+        self.older_cursor = older_cursor  # pass as `after` for the next (older) page
+
+
+class TransactionQuery:
+    """Newest-first pages of a Snapshot, filtered without scanning the history.
+
+    Snapshots are stored in date order and carry per-column indexes, so a
+    filter is a slice of an index, a date range is two binary searches, and a
+    page only decodes the rows it shows. Cursors are row positions in the
+    snapshot: `after` continues with older rows, `before` with newer ones.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def options(self):
+        """Distinct values of each filterable column, for filter dropdowns."""
+        return {name: self.snapshot.dictionaries[name].tolist()
+                for name in INDEXED_COLUMNS if name in self.snapshot.dictionaries}
+
+    def _candidates(self, filters, start, end):
+        """Matching row positions in ascending (oldest first) order, as a range or array."""
+        snapshot = self.snapshot
+        runs = []
+        for name, value in filters.items():
+            if name not in snapshot.dictionaries:
+                return range(0)
+            values = snapshot.dictionaries[name]
+            code = int(np.searchsorted(values, value))
+            if code >= len(values) or values[code] != value:
+                return range(0)
+            positions, offsets = snapshot.index(name)
+            runs.append((name, code, positions[offsets[code]:offsets[code + 1]]))
+
+        if runs:
+            # Walk the shortest index run and check the other filters on it
+            runs.sort(key=lambda run: len(run[2]))
+            candidates = runs[0][2]
+            for name, code, _ in runs[1:]:
+                candidates = candidates[snapshot.columns[name][candidates] == code]
+            days = snapshot.columns["date"][candidates]
+        else:
+            candidates = range(len(snapshot))
+            days = snapshot.columns["date"]
+
+        lo = 0 if start is None else int(np.searchsorted(days, start.toordinal() - EPOCH_ORDINAL, "left"))
+        hi = len(candidates) if end is None else int(np.searchsorted(days, end.toordinal() - EPOCH_ORDINAL, "right"))
+        return candidates[lo:hi]
+
+    def positions(self, start=None, end=None, **filters):
+        """Positions of every matching row, oldest first (e.g. for an export)."""
+        return self._candidates({name: value for name, value in filters.items() if value}, start, end)
+
+    def page(self, per_page=20, page=1, after=None, before=None, start=None, end=None, **filters):
+        filters = {name: value for name, value in filters.items() if value}
+        candidates = self._candidates(filters, start, end)
+        total = len(candidates)
+        total_pages = (total + per_page - 1) // per_page
+
+        # hi is one past the newest row shown; rows are shown newest first
+        if after is not None:
+            hi = bisect_left(candidates, after)
+        elif before is not None:
+            hi = min(bisect_right(candidates, before) + per_page, total)
+        else:
+            hi = total - (max(page, 1) - 1) * per_page
+        lo = max(hi - per_page, 0)
+        shown = [int(p) for p in reversed(candidates[lo:max(hi, 0)])]
+
+        return TransactionPage(
+            rows=self.snapshot.rows(np.array(shown, dtype=np.int64)) if shown else [],
+            page=(total - hi) // per_page + 1 if shown else max(page, 1),
+            total_pages=total_pages,
+            total_rows=total,
+            newer_cursor=shown[0] if shown and hi < total else None,
+            older_cursor=shown[-1] if shown and lo > 0 else None,
+        )
@@ -0,0 +1,298 @@
+# portfolio/snapshot.py
+
+import io
+import logging
+import mmap
+import os
+import struct
+import zipfile
+from datetime import date, datetime
+
+import numpy as np
+
+from config import Config
+from instrumentation import log_event, timed
+
+SNAPSHOT_SUFFIX = ".snapshot.npz"
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+NO_DATE = np.iinfo(np.int32).min  # rows whose date does not parse
+NUMERIC_COLUMNS = ("nav", "units")
+INDEXED_COLUMNS = ("scheme_code", "asset_type", "type")  # filterable through portfolio.query
+
+
+def _format_number(value):
+    if value != value:  # NaN: the cell was not a number
+        return ""
+    text = repr(float(value))
+    return text[:-2] if text.endswith(".0") else text
+
+
+def _read_npz(buffer):
+    """Load the arrays of an uncompressed .npz without copying their data.
+
+    `buffer` is bytes or an mmap; each array is a read-only view into it.
+    """
+    view = memoryview(buffer)
+    arrays = {}
+    with zipfile.ZipFile(io.BytesIO(view) if isinstance(buffer, bytes) else buffer) as zf:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("snapshot members must be stored uncompressed")
+            name_len, extra_len = struct.unpack("<HH", view[info.header_offset + 26:info.header_offset + 30])
+            start = info.header_offset + 30 + name_len + extra_len
+            header = io.BytesIO(view[start:start + min(info.file_size, 4096)])
+            version = np.lib.format.read_magic(header)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(header)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(header)
+            count = int(np.prod(shape))
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=start + header.tell())
+            arrays[info.filename[:-4]] = array.reshape(shape)
+    return arrays
+
+
+class Snapshot:
+    """The transaction file as typed columns, in date order.
+
+    `date` is stored as int32 days since 1970-01-01, `nav` and `units` as
+    float64, and every other column dictionary-encoded (int32 codes into a
+    sorted array of distinct values). `nav` and `units` also keep their cells
+    as written, dictionary-encoded the same way in `texts`, so rows() gives
+    back the stored text ("100.50", not "100.5").
+
+    Filterable columns also carry an index built at write time: the row
+    positions grouped by code (still in date order within each code) and the
+    offset where each code's run starts.
+    """
+
+    def __init__(self, header, version, columns, dictionaries, indexes=None, texts=None):
+        self.header = list(header)
+        self.version = version
+        self.columns = columns            # column name -> array, one entry per row
+        self.dictionaries = dictionaries  # encoded column name -> distinct values
+        self.indexes = indexes or {}      # encoded column name -> (positions, offsets)
+        self.texts = texts or {}          # numeric column name -> (codes, distinct cell texts)
+
+    def __len__(self):
+        return len(self.columns[self.header[0]]) if self.header else 0
+
+    @classmethod
+    def build(cls, header, rows, version):
+        date_idx = header.index("date")
+
+        def epoch_day(text):
+            try:
+                return datetime.strptime(text, "%d-%m-%Y").toordinal() - EPOCH_ORDINAL
+            except ValueError:
+                return NO_DATE
+
+        day_cache = {}
+        keyed = []
+        for row in rows:
+            text = row[date_idx]
+            if text not in day_cache:
+                day_cache[text] = epoch_day(text)
+            keyed.append((day_cache[text], row))
+        keyed.sort()
+
+        columns, dictionaries, texts = {}, {}, {}
+        cells = list(zip(*(row for _, row in keyed))) if keyed else [()] * len(header)
+        for i, name in enumerate(header):
+            if name == "date":
+                columns[name] = np.array([day for day, _ in keyed], dtype=np.int32)
+                continue
+            values, codes = np.unique(np.array(cells[i], dtype=str), return_inverse=True)
+            codes = codes.astype(np.int32)
+            if name in NUMERIC_COLUMNS:
+                # Each distinct text is parsed once
+                columns[name] = np.array([_to_float(v) for v in values.tolist()], dtype=np.float64)[codes]
+                texts[name] = (codes, values)
+            else:
+                columns[name] = codes
+                dictionaries[name] = values
+        snapshot = cls(header, version, columns, dictionaries, texts=texts)
+        for name in INDEXED_COLUMNS:
+            if name in dictionaries:
+                snapshot.index(name)
+        return snapshot
+
+    def extend(self, rows, version):
+        """A new snapshot with `rows` (CSV-style tuples in this header's
+        order) added, for file version `version`.
+
+        Only the new rows are parsed. The existing columns are re-coded
+        against the merged dictionaries and merged in date order, so an
+        append costs array work on the snapshot, not a reload of the file.
+        """
+        added = Snapshot.build(self.header, rows, version)
+
+        def merge(old_values, old, new_values, new):
+            values = np.union1d(old_values, new_values)
+            old = np.searchsorted(values, old_values).astype(np.int32)[old]
+            new = np.searchsorted(values, new_values).astype(np.int32)[new]
+            return values, np.concatenate([old, new])
+
+        columns, dictionaries, texts = {}, {}, {}
+        for name in self.header:
+            old, new = self.columns[name], added.columns[name]
+            if name in self.dictionaries:
+                dictionaries[name], columns[name] = merge(self.dictionaries[name], old, added.dictionaries[name], new)
+            else:
+                columns[name] = np.concatenate([old, new])
+            if name in self.texts:
+                (old_codes, old_values), (new_codes, new_values) = self.texts[name], added.texts[name]
+                values, codes = merge(old_values, old_codes, new_values, new_codes)
+                texts[name] = (codes, values)
+        order = np.argsort(columns["date"], kind="stable")
+        columns = {name: column[order] for name, column in columns.items()}
+        texts = {name: (codes[order], values) for name, (codes, values) in texts.items()}
+        snapshot = Snapshot(self.header, version, columns, dictionaries, texts=texts)
+        for name in INDEXED_COLUMNS:
+            if name in dictionaries:
+                snapshot.index(name)
+        return snapshot
+
+    def index(self, name):
+        """(positions, offsets) for an encoded column: rows with code c are
+        positions[offsets[c]:offsets[c + 1]], in date order."""
+        if name not in self.indexes:
+            codes = self.columns[name]
+            positions = np.argsort(codes, kind="stable").astype(np.int32)
+            offsets = np.searchsorted(codes[positions], np.arange(len(self.dictionaries[name]) + 1)).astype(np.int32)
+            self.indexes[name] = (positions, offsets)
+        return self.indexes[name]
+
+    def to_bytes(self):
+        arrays = {"header": np.array(self.header, dtype=str), "version": np.array(self.version or "")}
+        for i, name in enumerate(self.header):
+            arrays[f"col_{i}"] = self.columns[name]
+            if name in self.dictionaries:
+                arrays[f"dict_{i}"] = self.dictionaries[name]
+            if name in self.indexes:
+                arrays[f"idx_{i}"], arrays[f"off_{i}"] = self.indexes[name]
+            if name in self.texts:
+                arrays[f"txt_{i}"], arrays[f"tdict_{i}"] = self.texts[name]
+        buffer = io.BytesIO()
+        np.savez(buffer, **arrays)  # uncompressed, so it can be read in place
+        return buffer.getvalue()
+
+    @classmethod
+    def from_buffer(cls, buffer):
+        arrays = _read_npz(buffer)
+        header = [str(name) for name in arrays["header"]]
+        columns, dictionaries, indexes, texts = {}, {}, {}, {}
+        for i, name in enumerate(header):
+            columns[name] = arrays[f"col_{i}"]
+            if f"dict_{i}" in arrays:
+                dictionaries[name] = arrays[f"dict_{i}"]
+            if f"idx_{i}" in arrays:
+                indexes[name] = (arrays[f"idx_{i}"], arrays[f"off_{i}"])
+            if f"txt_{i}" in arrays:
+                texts[name] = (arrays[f"txt_{i}"], arrays[f"tdict_{i}"])
+        return cls(header, str(arrays["version"]) or None, columns, dictionaries, indexes, texts)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a snapshot file; pages are only read as columns are touched."""
+        with open(path, "rb") as f:
+            return cls.from_buffer(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def decoded(self, name, indices=None):
+        """A column as Python values: date strings, floats, or the original text."""
+        column = self.columns[name]
+        if indices is not None:
+            column = column[indices]
+        if name == "date":
+            unique, inverse = np.unique(column, return_inverse=True)
+            texts = [date.fromordinal(int(day) + EPOCH_ORDINAL).strftime("%d-%m-%Y") if day != NO_DATE else ""
+                     for day in unique]
+            return [texts[i] for i in inverse.tolist()]
+        if name in self.dictionaries:
+            values = self.dictionaries[name].tolist()
+            return [values[i] for i in column.tolist()]
+        return column.tolist()
+
+    def rows(self, indices=None):
+        """Rows as CSV-style text tuples, optionally only those at `indices`."""
+        cells = []
+        for name in self.header:
+            if name in self.texts:
+                codes, values = self.texts[name]
+                if indices is not None:
+                    codes = codes[indices]
+                values = values.tolist()
+                cells.append([values[i] for i in codes.tolist()])
+                continue
+            values = self.decoded(name, indices)
+            if name in NUMERIC_COLUMNS:
+                # Snapshots written before the texts were kept
+                values = [_format_number(v) for v in values]
+            cells.append(values)
+        return list(zip(*cells))
+
+
+def _to_float(text):
+    """NaN for a cell that is not a number: the table still shows the row,
+    and replaying it raises (see TransactionSet.by_scheme)."""
+    try:
+        return float(text)
+    except ValueError:
+        return float("nan")
+
+
+def _cache_path(filename, version):
+    return os.path.join(Config.SNAPSHOT_CACHE_DIR, f"{filename}.{version}{SNAPSHOT_SUFFIX}")
+
+
+def save_snapshot(backend, filename, snapshot):
+    """Best effort: a snapshot that cannot be stored is rebuilt from the CSV later."""
+    data = snapshot.to_bytes()
+    try:
+        backend.save_object(filename + SNAPSHOT_SUFFIX, data)
+    except Exception as e:
+        log_event("derived_save_failed", logging.WARNING, object=filename + SNAPSHOT_SUFFIX, error=repr(e))
+    _write_cache(filename, snapshot.version, data)
+
+
+def _write_cache(filename, version, data):
+    path = _cache_path(filename, version)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        # Older versions of this file are never read again
+        prefix = os.path.basename(f"{filename}.")
+        for name in os.listdir(os.path.dirname(path)):
+            if name.startswith(prefix) and name.endswith(SNAPSHOT_SUFFIX) and name != os.path.basename(path):
+                os.remove(os.path.join(os.path.dirname(path), name))
+    except OSError:
+        pass  # the local copy is only an optimisation
+
+
+@timed("load_snapshot")
+def load_snapshot(backend, filename, version):
+    """The snapshot for `version`, or None if it is missing or stale.
+
+    A local copy per version is memory-mapped when present, so a warm worker
+    never downloads the snapshot again.
+    """
+    if version is None:
+        return None
+    path = _cache_path(filename, version)
+    if os.path.exists(path):
+        try:
+            return Snapshot.open(path)
+        except (OSError, ValueError):
+            pass
+
+    data = backend.load_object(filename + SNAPSHOT_SUFFIX)
+    if not data:
+        return None
+    snapshot = Snapshot.from_buffer(bytes(data))
+    if snapshot.version != version:
+        return None
+    _write_cache(filename, version, data)
+    return snapshot
@@ -0,0 +1,124 @@
+# portfolio/state.py
+
+import json
+import logging
+import zlib
+from operator import attrgetter
+
+from instrumentation import log_event
+from .lots import LotLedger
+from .transactions import TransactionType
+
+STATE_SUFFIX = ".state"
+
+
+def build_scheme_state(txns, method):
+    """Replay one scheme's transactions into everything the summary needs
+    apart from the latest price.
+
+    `txns` are Transactions; they are replayed in day order (a stable sort,
+    so same-day transactions keep their file order).
+    """
+    net_units = 0
+    invested = 0
+    ledger = LotLedger(method)
+    flows = []
+    navs = []
+
+    for t in sorted(txns, key=attrgetter("day")):
+        day, nav, units = t.day, t.nav, t.units
+
+        if t.type is TransactionType.BUY:
+            net_units += units
+            invested += nav * units
+            ledger.buy(day, units, nav)
+            flows.append((day, -nav * units))
+            navs.append(nav)
+
+        elif t.type is TransactionType.SELL:
+            net_units -= units
+            flows.append((day, nav * units))
+            ledger.sell(day, units, nav)
+
+    return {
+        "asset_type": txns[0].asset_type,
+        "scheme_name": txns[0].scheme_name,
+        "net_units": net_units,
+        "invested": invested,
+        "realized": ledger.realized,
+        "cost": ledger.cost,
+        "lots": [(lot.date, lot.units, lot.nav) for lot in ledger.lots],
+        "flows": flows,  # (date ordinal, amount): buys negative, sells positive
+        "min_nav": min(navs) if navs else 0,
+        "max_nav": max(navs) if navs else 0,
+    }
+
+
+def build_states(transactions, method):
+    """scheme_code -> state for a `read_transactions`-shaped mapping."""
+    return {
+        scheme_code.strip(): build_scheme_state(txns, method)
+        for scheme_code, txns in transactions.items()
+    }
+
+
+def load_states(backend, filename):
+    """Return (source_version, method, states) saved next to `filename`, or None."""
+    data = backend.load_object(filename + STATE_SUFFIX)
+    if not data:
+        return None
+    payload = json.loads(zlib.decompress(data))
+    return payload["version"], payload["method"], payload["schemes"]
+
+
+def save_states(backend, filename, version, method, states):
+    """Best effort: states that cannot be stored are recomputed on the next read."""
+    payload = {"version": version, "method": method, "schemes": states}
+    try:
+        # Fastest level: the state is rewritten on every upload
+        backend.save_object(filename + STATE_SUFFIX, zlib.compress(json.dumps(payload).encode("utf-8"), 1))
+    except Exception as e:
+        log_event("derived_save_failed", logging.WARNING, object=filename + STATE_SUFFIX, error=repr(e))
+
+
+def get_states(backend, filename, method, transactions, version=None):
+    """Computed per-scheme state that matches the current file.
+
+    The saved state is used while its version matches the file; otherwise
+    everything is rebuilt from `transactions` (a TransactionSet, or a callable
+    returning one) and saved again.
+    """
+    if version is None:
+        version = backend.get_version(filename)
+    saved = load_states(backend, filename)
+    if saved and version is not None and saved[0] == version and saved[1] == method:
+        return saved[2]
+
+    if callable(transactions):
+        transactions = transactions()
+    states = build_states(transactions.by_scheme(), method)
+    if version is not None:
+        save_states(backend, filename, version, method, states)
+    return states
+
+
+def update_states(backend, filename, method, previous_version, version, transactions, scheme_codes):
+    """Rebuild only `scheme_codes` after an upload.
+
+    `transactions` is the merged TransactionSet just saved, and
+    `previous_version` / `version` the file versions before and after the save. Schemes not in
+    `scheme_codes` keep their saved state as long as it was up to date.
+    """
+    saved = load_states(backend, filename)
+    if saved and previous_version is not None and saved[0] == previous_version and saved[1] == method:
+        states = saved[2]
+        touched = {code.strip() for code in scheme_codes}
+        by_scheme = transactions.by_scheme(touched)
+    else:
+        states = {}
+        by_scheme = transactions.by_scheme()
+
+    states.update(build_states(by_scheme, method))
+    if version is not None:
+        save_states(backend, filename, version, method, states)
+    return states
@@ -0,0 +1,139 @@
+# portfolio/timeseries.py
+
+from datetime import date
+
+import numpy as np
+
+from .snapshot import EPOCH_ORDINAL, NO_DATE
+
+
+class PortfolioSeries:
+    """Daily series on a shared calendar axis.
+
+    `days` are int32 days since 1970-01-01; `series` maps a scheme code or
+    asset type to {"value", "invested", "drawdown"} float64 arrays aligned
+    with `days`.
+    """
+
+    def __init__(self, days, series):
+        self.days = days
+        self.series = series
+
+    def dates(self):
+        return [date.fromordinal(int(day) + EPOCH_ORDINAL).isoformat() for day in self.days]
+
+
+def _scheme_columns(snapshot):
+    """Per-row scheme index, buy/sell sign and validity mask, plus the (asset_type, scheme_code) of each scheme."""
+    n_rows = len(snapshot)
+    days = snapshot.columns["date"]
+    valid = (days != NO_DATE) & np.isfinite(snapshot.columns["nav"]) & np.isfinite(snapshot.columns["units"])
+
+    codes = snapshot.columns["scheme_code"]
+    code_values = [value.strip() for value in snapshot.dictionaries["scheme_code"].tolist()]
+    if "asset_type" in snapshot.dictionaries:
+        assets = snapshot.columns["asset_type"]
+        asset_values = [value or "mutual_fund" for value in snapshot.dictionaries["asset_type"].tolist()]
+    else:
+        assets = np.zeros(n_rows, dtype=np.int32)
+        asset_values = ["mutual_fund"]
+
+    if "type" in snapshot.dictionaries:
+        signs = np.array([-1.0 if value.strip().lower() == "sell" else 1.0
+                          for value in snapshot.dictionaries["type"].tolist()])
+        sign = signs[snapshot.columns["type"]] if len(signs) else np.ones(n_rows)
+    else:
+        sign = np.ones(n_rows)
+
+    pairs, scheme = np.unique(codes.astype(np.int64) * len(asset_values) + assets, return_inverse=True)
+    keys = [(asset_values[pair % len(asset_values)], code_values[pair // len(asset_values)]) for pair in pairs.tolist()]
+    return scheme.reshape(-1), sign, valid, keys
+
+
+def holdings(snapshot):
+    """{(asset_type, scheme_code): date of its first transaction}, for filling a price history."""
+    if not len(snapshot):
+        return {}
+    scheme, _, valid, keys = _scheme_columns(snapshot)
+    first = np.full(len(keys), np.iinfo(np.int32).max, dtype=np.int64)
+    np.minimum.at(first, scheme[valid], snapshot.columns["date"][valid])
+    return {
+        key: date.fromordinal(int(day) + EPOCH_ORDINAL)
+        for key, day in zip(keys, first.tolist()) if day != np.iinfo(np.int32).max
+    }
+
+
+def portfolio_series(snapshot, prices, by="asset_type", start=None, end=None):
+    """Daily value, net invested capital and drawdown, per scheme or per asset type.
+
+    `prices` maps (asset_type, scheme_code) to (days, closes) arrays, e.g. from
+    prices.PriceHistoryStore.series; transaction NAVs fill days it does not
+    cover. Prices carry forward over holidays. Drawdown is measured on a
+    time-weighted return index, so contributions and withdrawals do not show
+    up as gains or losses.
+    """
+    if not len(snapshot):
+        return PortfolioSeries(np.empty(0, dtype=np.int32), {})
+    scheme, sign, valid, keys = _scheme_columns(snapshot)
+    days = snapshot.columns["date"]
+    today = date.today().toordinal() - EPOCH_ORDINAL
+    first = int(days[valid].min()) if valid.any() else today
+    last = (end.toordinal() - EPOCH_ORDINAL) if end else today
+    n_days = max(last - first + 1, 1)
+    n_schemes = len(keys)
+
+    rows = valid & (days <= last)
+    flat = scheme[rows] * n_days + (days[rows] - first)
+    units = sign[rows] * snapshot.columns["units"][rows]
+    held = np.bincount(flat, weights=units, minlength=n_schemes * n_days).reshape(n_schemes, n_days).cumsum(axis=1)
+    invested = np.bincount(flat, weights=units * snapshot.columns["nav"][rows],
+                           minlength=n_schemes * n_days).reshape(n_schemes, n_days).cumsum(axis=1)
+
+    # Price points keyed by scheme * n_days + day; stored closes win over a
+    # transaction NAV on the same day
+    point_keys, point_values, point_priority = [flat], [snapshot.columns["nav"][rows]], [np.zeros(len(flat))]
+    for s, key in enumerate(keys):
+        history_days, closes = prices.get(key, (np.empty(0, dtype=np.int32), np.empty(0)))
+        inside = (history_days >= first) & (history_days <= last)
+        point_keys.append(s * n_days + (history_days[inside].astype(np.int64) - first))
+        point_values.append(closes[inside])
+        point_priority.append(np.ones(int(inside.sum())))
+    point_keys = np.concatenate(point_keys)
+    point_values = np.concatenate(point_values)
+    order = np.lexsort((np.concatenate(point_priority), point_keys))
+    point_keys, point_values = point_keys[order], point_values[order]
+
+    grid = np.arange(n_schemes * n_days)
+    latest = np.searchsorted(point_keys, grid, side="right") - 1
+    known = (latest >= 0) & (point_keys[np.maximum(latest, 0)] // n_days == grid // n_days)
+    price = np.where(known, point_values[np.maximum(latest, 0)], 0.0).reshape(n_schemes, n_days)
+    value = np.where(np.abs(held) > 1e-9, held * price, 0.0)
+
+    if by == "scheme_code":
+        names = [code for _, code in keys]
+        group = np.arange(n_schemes)
+    else:
+        names = sorted({asset_type for asset_type, _ in keys})
+        group = np.array([names.index(asset_type) for asset_type, _ in keys])
+    group_value = np.zeros((len(names), n_days))
+    group_invested = np.zeros((len(names), n_days))
+    np.add.at(group_value, group, value)
+    np.add.at(group_invested, group, invested)
+
+    # Time-weighted daily returns: the day's change in value less the day's net flow
+    flows = np.diff(group_invested, axis=1, prepend=0.0)
+    previous = np.concatenate([np.zeros((len(names), 1)), group_value[:, :-1]], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(previous > 0, (group_value - flows) / previous, 1.0)
+    index = np.cumprod(growth, axis=1)
+    drawdown = index / np.maximum.accumulate(index, axis=1) - 1
+
+    offset = max((start.toordinal() - EPOCH_ORDINAL) - first, 0) if start else 0
+    window = slice(offset, n_days)
+    return PortfolioSeries(
+        np.arange(first, first + n_days, dtype=np.int32)[window],
+        {
+            name: {"value": group_value[i, window], "invested": group_invested[i, window], "drawdown": drawdown[i, window]}
+            for i, name in enumerate(names)
+        },
+    )
@@ -0,0 +1,217 @@
+# portfolio/transactions.py
+
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+
+import numpy as np
+
+from instrumentation import timed
+from .query import TransactionQuery
+from .snapshot import EPOCH_ORDINAL, NO_DATE, Snapshot, load_snapshot, save_snapshot
+
+DATE_FORMAT = "%d-%m-%Y"
+DEFAULT_ASSET_TYPE = "mutual_fund"
+
+
+class TransactionType(str, Enum):
+    BUY = "buy"
+    SELL = "sell"
+
+
+_TYPES = {t.value: t for t in TransactionType}
+
+
+def parse_type(text):
+    """The TransactionType for a `type` cell (empty means buy), or None for
+    any other type, which the replay skips."""
+    return _TYPES.get((text or "buy").strip().lower())
+
+
+@lru_cache(maxsize=8192)
+def parse_day(text):
+    """Day number (date.toordinal()) of a DD-MM-YYYY date; raises ValueError.
+
+    A portfolio has far fewer distinct dates than rows, so each one is parsed once.
+    """
+    return datetime.strptime(text, DATE_FORMAT).toordinal()
+
+
+class Transaction:
+    """One transaction, parsed once when the file is loaded.
+
+    `day` is a day number, so transactions sort chronologically as ints;
+    the repeated strings (scheme code and name, asset type) are interned.
+    """
+    __slots__ = ("day", "scheme_code", "scheme_name", "asset_type", "type", "nav", "units")
+
+    def __init__(self, day, scheme_code, scheme_name, asset_type, tx_type, nav, units):
+        self.day = day
+        self.scheme_code = sys.intern(scheme_code)
+        self.scheme_name = sys.intern(scheme_name)
+        self.asset_type = sys.intern(asset_type)
+        self.type = tx_type
+        self.nav = nav
+        self.units = units
+
+    @property
+    def date(self):
+        return date.fromordinal(self.day)
+
+    def __repr__(self):
+        return (f"Transaction({self.date:%d-%m-%Y}, {self.scheme_code!r}, {self.type}, "
+                f"nav={self.nav}, units={self.units})")
+
+
+def parse_transaction(row):
+    """Convert one CSV row (as a dict of column -> text) into a Transaction."""
+    return Transaction(
+        parse_day(row['date']),
+        row.get('scheme_code', '').strip(),
+        row['scheme_name'],
+        row.get('asset_type') or DEFAULT_ASSET_TYPE,  # default if missing
+        parse_type(row.get('type')),
+        float(row['nav']),
+        float(row['units']),
+    )
+
+
+class TransactionSet:
+    """All transactions of one file, loaded once and shared for the whole request.
+
+    Backed either by the raw CSV rows or by a columnar Snapshot. `rows` keeps
+    CSV-style tuples for the transaction table; the typed per-scheme view used
+    by the summary is built lazily.
+    """
+
+    def __init__(self, header, rows=None, snapshot=None):
+        self.header = list(header) if header else None
+        self.snapshot = snapshot
+        self._rows = sorted(rows) if rows is not None else None  # same order the backends write the file in
+        self._by_scheme = None
+        self._sorted_rows = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot.header, snapshot=snapshot)
+
+    @classmethod
+    @timed("load_transactions")
+    def load(cls, backend, filename, version=None):
+        """Load from the columnar snapshot when it matches the file, else from the CSV.
+
+        A CSV load writes a fresh snapshot for the next request.
+        """
+        if version is None:
+            version = backend.get_version(filename)
+        snapshot = load_snapshot(backend, filename, version)
+        if snapshot is not None:
+            return cls.from_snapshot(snapshot)
+
+        header, rows = backend.load_csv(filename)
+        if not header or version is None:
+            return cls(header, rows)
+        snapshot = Snapshot.build(header, rows, version)
+        save_snapshot(backend, filename, snapshot)
+        return cls.from_snapshot(snapshot)
+
+    @property
+    def rows(self):
+        if self._rows is None:
+            self._rows = self.snapshot.rows() if self.snapshot is not None else []
+        return self._rows
+
+    def __len__(self):
+        return len(self.snapshot) if self.snapshot is not None else len(self.rows)
+
+    def by_scheme(self, scheme_codes=None):
+        """scheme_code -> list of Transactions (the `read_transactions` shape).
+
+        Pass `scheme_codes` to parse only those schemes.
+        """
+        if scheme_codes is None and self._by_scheme is not None:
+            return self._by_scheme
+
+        transactions = defaultdict(list)
+        if self.header and self.snapshot is not None:
+            self._snapshot_by_scheme(transactions, scheme_codes)
+        elif self.header:
+            code_idx = self.header.index("scheme_code")
+            for row in self.rows:
+                if scheme_codes is not None and row[code_idx].strip() not in scheme_codes:
+                    continue
+                record = dict(zip(self.header, row))
+                transactions[record['scheme_code']].append(parse_transaction(record))
+        if scheme_codes is None:
+            self._by_scheme = transactions
+        return transactions
+
+    def _snapshot_by_scheme(self, transactions, scheme_codes):
+        # Columns are already typed and dates already day numbers: each
+        # dictionary value is converted once, not once per row
+        snapshot = self.snapshot
+        if scheme_codes is None:
+            where = np.arange(len(snapshot))
+        else:
+            # Only the wanted schemes' rows, found through the scheme_code index
+            positions, offsets = snapshot.index("scheme_code")
+            wanted = [code for code, value in enumerate(snapshot.dictionaries["scheme_code"].tolist())
+                      if value.strip() in scheme_codes]
+            where = np.sort(np.concatenate(
+                [positions[offsets[code]:offsets[code + 1]] for code in wanted] or [np.empty(0, dtype=np.int32)]))
+        n_rows = len(where)
+
+        def column(name, convert, default):
+            if name not in snapshot.dictionaries:
+                return [default] * n_rows
+            values = [convert(value) for value in snapshot.dictionaries[name].tolist()]
+            return [values[i] for i in snapshot.columns[name][where].tolist()]
+
+        raw_codes = column("scheme_code", str, "")
+        codes = column("scheme_code", lambda value: sys.intern(value.strip()), "")
+        names = column("scheme_name", sys.intern, "")
+        assets = column("asset_type", lambda value: sys.intern(value or DEFAULT_ASSET_TYPE), DEFAULT_ASSET_TYPE)
+        types = column("type", parse_type, TransactionType.BUY)
+        days = snapshot.columns["date"][where]
+        navs = snapshot.columns["nav"][where]
+        units = snapshot.columns["units"][where]
+
+        # A date or number that did not parse fails the replay, as it does for CSV rows
+        invalid = np.flatnonzero((days == NO_DATE) | np.isnan(navs) | np.isnan(units))
+        if len(invalid):
+            i = invalid[0]
+            field = "date" if days[i] == NO_DATE else "nav or units"
+            raise ValueError(f"Invalid {field} for scheme {codes[i]}: {snapshot.rows([where[i]])[0]}")
+        days, navs, units = days.tolist(), navs.tolist(), units.tolist()
+
+        for i in range(n_rows):
+            transactions[raw_codes[i]].append(Transaction(
+                days[i] + EPOCH_ORDINAL, codes[i], names[i], assets[i], types[i], navs[i], units[i]))
+
+    def query(self):
+        """A TransactionQuery for filtered, paginated reads of these rows."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            snapshot = self.snapshot = Snapshot.build(self.header or [], self.rows, None)
+        return TransactionQuery(snapshot)
+
+    def sorted_rows(self):
+        """Raw rows, newest first."""
+        if self._sorted_rows is None:
+            if self.snapshot is not None:
+                # Snapshots are stored in date order already
+                self._sorted_rows = self.rows[::-1]
+                return self._sorted_rows
+
+            date_idx = self.header.index("date")
+
+            def parse_date(row):
+                try:
+                    return parse_day(row[date_idx])
+                except ValueError:
+                    return 0
+
+            self._sorted_rows = sorted(self.rows, key=parse_date, reverse=True)
+        return self._sorted_rows
@@ -0,0 +1,147 @@
+# portfolio/xirr.py
+
+from numbers import Integral
+
+import numpy as np
+
+LOW_RATE = -0.9999
+HIGH_RATES = (10.0, 100.0, 1000.0)  # Brent brackets tried in turn
+
+
+class XirrResult:
+    __slots__ = ("rate", "reason")
+
+    def __init__(self, rate=None, reason=None):
+        self.rate = rate
+        self.reason = reason  # why the solve failed; None on success
+
+    def __bool__(self):
+        return self.rate is not None
+
+    def __repr__(self):
+        return f"XirrResult(rate={self.rate!r}, reason={self.reason!r})"
+
+
+def _year_fractions(dates):
+    # dates are date/datetime objects or proleptic Gregorian ordinals
+    days = np.array([d if isinstance(d, Integral) else d.toordinal() for d in dates], dtype=np.int64)
+    return (days - days.min()) / 365.0
+
+
+def _npv(rate, times, amounts):
+    with np.errstate(over="ignore", invalid="ignore"):
+        return float(np.dot(amounts, (1.0 + rate) ** -times))
+
+
+def _brent(times, amounts, low, high, tolerance, max_iterations):
+    f_low, f_high = _npv(low, times, amounts), _npv(high, times, amounts)
+    if f_low * f_high > 0:
+        return None
+    if abs(f_low) < abs(f_high):
+        low, high, f_low, f_high = high, low, f_high, f_low
+    c, f_c, d = low, f_low, None
+    bisected = True
+    for _ in range(max_iterations):
+        if f_high == 0 or abs(high - low) < tolerance:
+            return high
+        if f_low != f_c and f_high != f_c:
+            # inverse quadratic interpolation
+            s = (low * f_high * f_c / ((f_low - f_high) * (f_low - f_c))
+                 + high * f_low * f_c / ((f_high - f_low) * (f_high - f_c))
+                 + c * f_low * f_high / ((f_c - f_low) * (f_c - f_high)))
+        else:
+            s = high - f_high * (high - low) / (f_high - f_low)  # secant
+        if (not (min((3 * low + high) / 4, high) < s < max((3 * low + high) / 4, high))
+                or (bisected and abs(s - high) >= abs(high - c) / 2)
+                or (not bisected and abs(s - high) >= abs(c - d) / 2)):
+            s = (low + high) / 2
+            bisected = True
+        else:
+            bisected = False
+        f_s = _npv(s, times, amounts)
+        d, c, f_c = c, high, f_high
+        if f_low * f_s < 0:
+            high, f_high = s, f_s
+        else:
+            low, f_low = s, f_s
+        if abs(f_low) < abs(f_high):
+            low, high, f_low, f_high = high, low, f_high, f_low
+    return None
+
+
+def xirr_batch(groups, guess=0.1, tolerance=1e-9, max_iterations=50):
+    """Solve XIRR for many cash-flow series in one vectorized pass.
+
+    `groups` is a list of (dates, amounts) pairs. Year fractions are computed
+    once per group, all groups share one flat array, and Newton's method runs
+    on every group at the same time. Groups Newton cannot settle are retried
+    with a bracketed Brent solve. Returns one XirrResult per group.
+    """
+    results = [XirrResult() for _ in groups]
+    solvable, times, amounts, lengths = [], [], [], []
+    for i, (dates, flows) in enumerate(groups):
+        flows = np.asarray(flows, dtype=np.float64)
+        if len(flows) < 2:
+            results[i].reason = "needs at least two cash flows"
+        elif not (flows > 0).any() or not (flows < 0).any():
+            results[i].reason = "cash flows must include both money in and money out"
+        else:
+            solvable.append(i)
+            times.append(_year_fractions(dates))
+            amounts.append(flows)
+            lengths.append(len(flows))
+    if not solvable:
+        return results
+
+    t = np.concatenate(times)
+    a = np.concatenate(amounts)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    group_of = np.repeat(np.arange(len(solvable)), lengths)
+    scale = np.add.reduceat(np.abs(a), starts)
+
+    rate = np.full(len(solvable), guess)
+    active = np.ones(len(solvable), dtype=bool)
+    converged = np.zeros(len(solvable), dtype=bool)
+    for _ in range(max_iterations):
+        # Rates far from the root overflow to inf/nan; those groups are dropped below
+        with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+            base = 1.0 + rate[group_of]
+            discounted = a * base ** -t
+            f = np.add.reduceat(discounted, starts)
+            fp = np.add.reduceat(-t * discounted / base, starts)
+            step = np.where(active, f / fp, 0.0)
+        bad = active & ~np.isfinite(step)
+        active &= ~bad
+        step[bad] = 0.0
+
+        new_rate = rate - step
+        # Stay inside the domain: halve the way towards -100% instead of crossing it
+        new_rate = np.where(new_rate <= -1.0, (rate - 1.0) / 2, new_rate)
+        done = active & (np.abs(step) < tolerance * (1 + np.abs(rate))) & (np.abs(f) < 1e-6 * scale)
+        converged |= done
+        active &= ~done
+        rate = np.where(active, new_rate, rate)
+        if not active.any():
+            break
+
+    for j, i in enumerate(solvable):
+        if converged[j] and LOW_RATE < rate[j] < HIGH_RATES[-1]:
+            results[i].rate = float(rate[j])
+            continue
+        lo, hi = starts[j], starts[j] + lengths[j]
+        for high in HIGH_RATES:
+            root = _brent(t[lo:hi], a[lo:hi], LOW_RATE, high, tolerance, 200)
+            if root is not None:
+                results[i].rate = root
+                break
+        else:
+            results[i].reason = f"no rate between {LOW_RATE:.2%} and {HIGH_RATES[-1]:.0%} sets NPV to zero"
+    return results
+
+
+def solve_xirr(cash_flows):
+    """XIRR of a list of (date, amount) pairs as an XirrResult."""
+    if not cash_flows:
+        return XirrResult(reason="no cash flows")
+    dates, amounts = zip(*cash_flows)
+    return xirr_batch([(dates, amounts)])[0]
@@ -0,0 +1,4 @@
+from .engine import fetch_prices, PriceFetchResult
+from .providers import FakeProvider, PriceProvider, REGISTRY, register
+from .cache import get_latest_prices, get_price_cache
+from .history import PriceHistoryStore, get_price_history
@@ -0,0 +1,214 @@
+# prices/aio.py
+"""Price lookups for the async serving mode (SERVER_MODE=async).
+
+All lookups in a worker run on one background event loop, so mfapi calls
+from every in-flight request share a single pooled httpx client and are
+multiplexed over its keep-alive connections (HTTP/2 when h2 is installed),
+revalidating against the same ETag cache as prices/http.py. yfinance has
+no async API, so other providers go through the sync engine (and its
+provider pools) on a worker thread.
+
+Not imported by the package so httpx is only needed in async mode.
+"""
+
+import asyncio
+import importlib.util
+import random
+import threading
+from functools import partial
+
+import httpx
+
+from config import Config
+from .cache import get_price_cache
+from .engine import PriceFetchResult, fetch_prices, record_fetches
+from .http import get_conditional_cache
+from .providers import REGISTRY, CircuitOpen, provider_chain
+from .sources import MFAPI_LATEST_URL, is_missing_symbol, parse_mfapi_nav
+
+_loop = None
+_loop_lock = threading.Lock()
+_client = None
+_semaphores = {}
+
+
+def _background_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None or not _loop.is_running():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="prices-aio", daemon=True).start()
+        return _loop
+
+
+def _http_client():
+    # Only touched from the background loop, so no lock is needed
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS,
+                                max_keepalive_connections=Config.ASYNC_HTTP_MAX_CONNECTIONS),
+            timeout=Config.PRICE_FETCH_TIMEOUT,
+            http2=importlib.util.find_spec("h2") is not None,  # httpx needs the h2 extra for HTTP/2
+        )
+    return _client
+
+
+def _semaphore(provider):
+    if provider not in _semaphores:
+        _semaphores[provider] = asyncio.Semaphore(Config.PRICE_FETCH_CONCURRENCY.get(provider, 4))
+    return _semaphores[provider]
+
+
+async def _mfapi_nav(scheme_code):
+    """Latest NAV of a scheme, or None if mfapi has no NAV for it."""
+    url = MFAPI_LATEST_URL.format(scheme_code=scheme_code)
+    cache = get_conditional_cache()
+    async with _semaphore("mfapi"):
+        response = await _http_client().get(url, headers=cache.validators(url))
+        cache.count("requests")
+        content = cache.body(url) if response.status_code == 304 else None
+        if content is not None:
+            cache.count("not_modified")
+        else:
+            if response.status_code == 304:
+                response = await _http_client().get(url)
+            if is_missing_symbol(response.status_code):
+                return None
+            response.raise_for_status()
+            content = response.content
+            cache.store(url, response.headers, content)
+    return parse_mfapi_nav(content)
+
+
+async def _mfapi_with_retries(provider, scheme_code, deadline_at):
+    """`PriceProvider.fetch` for one mfapi code, awaiting instead of blocking a thread."""
+    if not provider.breaker.allow():
+        raise CircuitOpen(f"{provider.name}: circuit open")
+    loop = asyncio.get_running_loop()
+    attempt = 0
+    while True:
+        try:
+            timeout = max(0.0, min(provider.timeout, deadline_at - loop.time()))
+            nav = await asyncio.wait_for(_mfapi_nav(scheme_code), timeout)
+        except Exception:
+            delay = random.uniform(0, provider.backoff * 2 ** attempt)
+            if attempt >= provider.retries or loop.time() + delay >= deadline_at:
+                provider.breaker.failure()
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        provider.breaker.success()
+        return nav
+
+
+async def _timed(result, kind, keys, coro):
+    started = asyncio.get_running_loop().time()
+    try:
+        return await coro
+    finally:
+        result.timings.append((kind, keys, asyncio.get_running_loop().time() - started))
+
+
+async def _fetch_prices(symbols, timeout, deadline):
+    """Async counterpart of engine.fetch_prices, run on the background loop.
+
+    Symbols whose first provider is mfapi are fetched here; everything else,
+    and mfapi symbols that have another provider to fall back to, goes
+    through the sync engine on a worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    deadline_at = loop.time() + deadline
+    mfapi = REGISTRY["mfapi"]
+    result = PriceFetchResult()
+    tasks = {}
+    rest = []
+    for key in dict.fromkeys(symbols):
+        chain = provider_chain(key[0])
+        if chain and chain[0] is mfapi and mfapi.breaker.state != "open":
+            tasks[asyncio.ensure_future(
+                _timed(result, "mfapi", [key], _mfapi_with_retries(mfapi, key[1], deadline_at)))] = key
+        else:
+            rest.append(key)
+    # The sync engine blocks on the provider pools, so it runs on the loop's
+    # default executor rather than on one of them
+    sync = loop.run_in_executor(None, partial(fetch_prices, rest, timeout, deadline, report=False)) if rest else None
+
+    if tasks:
+        done, pending = await asyncio.wait(list(tasks), timeout=deadline)
+        for task in pending:
+            task.cancel()
+            result.failed[tasks[task]] = "mfapi: deadline exceeded"
+        retry = []
+        for task in done:
+            key = tasks[task]
+            try:
+                nav = task.result()
+            except Exception as e:
+                if not isinstance(e, CircuitOpen):
+                    result.errors.append("mfapi")
+                reason = str(e) if isinstance(e, CircuitOpen) else f"mfapi: {e}"
+            else:
+                if nav is not None:
+                    result.prices[key] = nav
+                    continue
+                reason = "mfapi: no price data"
+            if len(provider_chain(key[0])) > 1:
+                retry.append(key)
+            else:
+                result.failed[key] = reason
+        remaining = deadline_at - loop.time()
+        if retry and remaining > 0:
+            fallback = await loop.run_in_executor(
+                None, partial(fetch_prices, retry, timeout, remaining, report=False, skip=("mfapi",)))
+            _merge(result, fallback)
+        else:
+            result.failed.update((key, "mfapi: deadline exceeded") for key in retry)
+
+    if sync is not None:
+        _merge(result, await sync)
+    return result
+
+
+def _merge(result, other):
+    result.prices.update(other.prices)
+    result.failed.update(other.failed)
+    result.timings.extend(other.timings)
+    result.errors.extend(other.errors)
+
+
+async def fetch_prices_async(symbols, timeout=None, deadline=None):
+    timeout = timeout or Config.PRICE_FETCH_TIMEOUT
+    deadline = deadline or Config.PRICE_FETCH_DEADLINE
+    future = asyncio.run_coroutine_threadsafe(_fetch_prices(symbols, timeout, deadline), _background_loop())
+    result = await asyncio.wrap_future(future)
+    record_fetches(result)  # here, so the spans land on the awaiting request
+    return result
+
+
+async def get_latest_prices_async(symbols):
+    """Cache-aware `fetch_prices_async`, the async counterpart of get_latest_prices."""
+    cache = get_price_cache()
+    result, missing = cache.lookup(symbols)
+    if not missing:
+        return result
+    mine, waiting = cache.claim(missing)
+    fetched = None
+    try:
+        if mine:
+            fetched = await fetch_prices_async(mine)
+            result.prices.update(fetched.prices)
+            result.failed.update(fetched.failed)
+    finally:
+        cache.settle(mine, fetched)
+    if waiting:
+        try:
+            outcomes = await asyncio.wait_for(
+                asyncio.gather(*(asyncio.wrap_future(future) for future in waiting.values())),
+                Config.PRICE_FETCH_DEADLINE)
+        except asyncio.TimeoutError:
+            outcomes = [(None, "deadline exceeded")] * len(waiting)
+        for key, outcome in zip(waiting, outcomes):
+            cache.collect(result, key, outcome)
+    return result
@@ -0,0 +1,254 @@
+# prices/cache.py
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from config import Config
+from .engine import fetch_prices, PriceFetchResult
+
+
+def expires_at(asset_type, fetched_at):
+    """Epoch seconds after which a price fetched at `fetched_at` is stale.
+
+    Mutual fund NAVs only change once a day, so they stay fresh until the next
+    publish time; equities use a short fixed TTL.
+    """
+    if asset_type == "mutual_fund":
+        tz = ZoneInfo(Config.MF_NAV_PUBLISH_TZ)
+        hour, minute = (int(part) for part in Config.MF_NAV_PUBLISH_TIME.split(":"))
+        fetched = datetime.fromtimestamp(fetched_at, tz)
+        publish = fetched.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if publish <= fetched:
+            publish += timedelta(days=1)
+        return publish.timestamp()
+    return fetched_at + Config.PRICE_CACHE_TTL.get(asset_type, Config.PRICE_CACHE_TTL["default"])
+
+
+class MemoryPriceCacheBackend:
+    """Per-process LRU of (asset_type, scheme_code) -> (price, fetched_at, expires_at)."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLitePriceCacheBackend:
+    """LRU cache in a SQLite file, shared by every gunicorn worker on the host."""
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS prices (
+                    asset_type TEXT NOT NULL,
+                    scheme_code TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (asset_type, scheme_code)
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS prices_accessed ON prices (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT price, fetched_at, expires_at FROM prices WHERE asset_type = ? AND scheme_code = ?",
+                key).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE prices SET accessed_at = ? WHERE asset_type = ? AND scheme_code = ?",
+                    (time.time(), *key))
+            return row
+
+    def set(self, key, entry):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, *entry, time.time()))
+            conn.execute("""
+                DELETE FROM prices WHERE rowid IN (
+                    SELECT rowid FROM prices ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""", (self.max_entries,))
+
+
+class PriceCache:
+    def __init__(self, backend, max_stale):
+        self.backend = backend
+        self.max_stale = max_stale
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+        self._refreshing = set()
+        self._inflight = {}  # key -> Future of the fetch resolving it
+        self._lock = threading.Lock()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prices-refresh")
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.stats[name] += n
+
+    def store(self, result):
+        now = time.time()
+        for key, price in result.prices.items():
+            self.backend.set(key, (price, now, expires_at(key[0], now)))
+
+    def lookup(self, symbols):
+        """(result with the cached prices, keys that must be fetched now).
+
+        Fresh entries are served as is. Stale entries (past their TTL but within
+        `max_stale`) are served immediately and refreshed in the background, so
+        a page never waits on a refresh.
+        """
+        now = time.time()
+        result = PriceFetchResult()
+        missing, stale = [], []
+        for key in dict.fromkeys(symbols):
+            entry = self.backend.get(key)
+            if entry is None or now > entry[2] + self.max_stale:
+                missing.append(key)
+                continue
+            result.prices[key] = entry[0]
+            if now > entry[2]:
+                stale.append(key)
+
+        self._count("hits", len(result.prices) - len(stale))
+        self._count("stale_hits", len(stale))
+        self._count("misses", len(missing))
+
+        if stale:
+            self._refresh_in_background(stale)
+        return result, missing
+
+    def claim(self, keys):
+        """Split cache misses into (keys this caller must fetch, {key: Future} already being fetched).
+
+        Requests for different portfolios holding the same scheme share one
+        upstream call: only the first caller fetches a key; the others wait on
+        its Future. The caller must `settle` the keys it claimed.
+        """
+        mine, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                if key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    self._inflight[key] = Future()
+                    mine.append(key)
+        return mine, waiting
+
+    def settle(self, keys, fetched):
+        """Store a fetch of claimed `keys` and hand its outcome to everyone waiting on them."""
+        if fetched is not None:
+            self.store(fetched)
+        with self._lock:
+            futures = [self._inflight.pop(key) for key in keys]
+        for key, future in zip(keys, futures):
+            if fetched is None:
+                future.set_result((None, "fetch failed"))
+            else:
+                future.set_result((fetched.prices.get(key), fetched.failed.get(key)))
+
+    @staticmethod
+    def collect(result, key, outcome):
+        price, reason = outcome
+        if price is not None:
+            result.prices[key] = price
+        else:
+            result.failed[key] = reason or "no price data"
+
+    def get_prices(self, symbols):
+        """Cache-aware `fetch_prices`; only missing symbols are fetched inline."""
+        result, missing = self.lookup(symbols)
+        if not missing:
+            return result
+        mine, waiting = self.claim(missing)
+        fetched = None
+        try:
+            if mine:
+                fetched = fetch_prices(mine)
+                result.prices.update(fetched.prices)
+                result.failed.update(fetched.failed)
+        finally:
+            self.settle(mine, fetched)
+        deadline = time.monotonic() + Config.PRICE_FETCH_DEADLINE
+        for key, future in waiting.items():
+            try:
+                self.collect(result, key, future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                result.failed[key] = "deadline exceeded"
+        return result
+
+    def refresh(self, symbols):
+        """Fetch `symbols` now regardless of their cache state (used by the scheduler)."""
+        result = fetch_prices(list(dict.fromkeys(symbols)))
+        self.store(result)
+        self._count("refreshes")
+        return result
+
+    def _refresh_in_background(self, keys):
+        with self._lock:
+            keys = [key for key in keys if key not in self._refreshing]
+            self._refreshing.update(keys)
+        if not keys:
+            return
+
+        def refresh():
+            try:
+                self.store(fetch_prices(keys))
+                self._count("refreshes")
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(keys)
+
+        self._refresher.submit(refresh)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_price_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if Config.PRICE_CACHE_BACKEND == "sqlite":
+                backend = SQLitePriceCacheBackend(Config.PRICE_CACHE_PATH, Config.PRICE_CACHE_MAX_ENTRIES)
+            else:
+                backend = MemoryPriceCacheBackend(Config.PRICE_CACHE_MAX_ENTRIES)
+            _cache = PriceCache(backend, Config.PRICE_CACHE_MAX_STALE)
+        return _cache
+
+
+def get_latest_prices(symbols):
+    return get_price_cache().get_prices(symbols)
@@ -0,0 +1,128 @@
+# prices/engine.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config import Config
+from instrumentation import PRICE_FETCH_ERRORS, record
+from .providers import CircuitOpen, provider_chain
+
+# Supported asset types and the provider tried first for each
+PROVIDERS = {asset_type: order[0] for asset_type, order in Config.PRICE_PROVIDER_ORDER.items() if order}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def provider_pool(provider):
+    # One bounded pool per provider caps how many calls hit that upstream at once.
+    # Pools are created lazily so each gunicorn worker builds its own after fork.
+    with _executors_lock:
+        if provider not in _executors:
+            _executors[provider] = ThreadPoolExecutor(
+                max_workers=Config.PRICE_FETCH_CONCURRENCY.get(provider, 4),
+                thread_name_prefix=f"prices-{provider}",
+            )
+        return _executors[provider]
+
+
+class PriceFetchResult:
+    def __init__(self):
+        self.prices = {}   # (asset_type, scheme_code) -> price
+        self.failed = {}   # (asset_type, scheme_code) -> reason
+        self.timings = []  # (provider, [keys], seconds) per upstream call
+        self.errors = []   # provider name per failed upstream call
+
+    def get(self, asset_type, scheme_code):
+        return self.prices.get((asset_type, scheme_code))
+
+
+def fetch_prices(symbols, timeout=None, deadline=None, report=True, skip=()):
+    """Resolve the latest price for many (asset_type, scheme_code) pairs at once.
+
+    Each asset type is tried against its providers in PRICE_PROVIDER_ORDER;
+    symbols a provider fails on or has no price for move on to the next one.
+    Providers retry and trip their circuit breakers on their own (see
+    prices/providers.py); `timeout` caps every upstream call and the whole
+    call returns after at most `deadline` seconds, with anything unresolved
+    by then reported in `failed` rather than waited on. Providers named in
+    `skip` are left out of every chain.
+    """
+    deadline_at = time.monotonic() + (deadline or Config.PRICE_FETCH_DEADLINE)
+    result = PriceFetchResult()
+    pending = {}  # future -> (provider, [keys])
+    submitted = {}  # future -> perf_counter at submission
+    chains = {}  # key -> providers still to try
+    reasons = {}  # key -> why the last provider did not resolve it
+
+    def advance(keys):
+        by_provider = {}
+        for key in keys:
+            chain = chains[key]
+            while chain:
+                provider = chain.pop(0)
+                if provider.breaker.state == "open":
+                    reasons[key] = f"{provider.name}: circuit open"
+                    continue
+                by_provider.setdefault(provider, []).append(key)
+                break
+            else:
+                result.failed[key] = reasons.get(key, f"unknown asset_type: {key[0]}")
+        for provider, provider_keys in by_provider.items():
+            for group in ([provider_keys] if provider.batch else [[key] for key in provider_keys]):
+                future = provider_pool(provider.pool).submit(
+                    provider.fetch, [code for _, code in group], deadline_at, timeout)
+                pending[future] = (provider, group)
+                submitted[future] = time.perf_counter()
+
+    keys = list(dict.fromkeys(symbols))
+    for key in keys:
+        chains[key] = [provider for provider in provider_chain(key[0]) if provider.name not in skip]
+    advance(keys)
+
+    while pending:
+        remaining = deadline_at - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            provider, keys = pending.pop(future)
+            result.timings.append((provider.name, keys, time.perf_counter() - submitted.pop(future)))
+            try:
+                prices = future.result()
+            except CircuitOpen as e:
+                reasons.update((key, str(e)) for key in keys)
+                advance(keys)
+                continue
+            except Exception as e:
+                result.errors.append(provider.name)
+                reasons.update((key, f"{provider.name}: {e}") for key in keys)
+                advance(keys)
+                continue
+
+            missing = []
+            for key in keys:
+                if key[1] in prices:
+                    result.prices[key] = prices[key[1]]
+                else:
+                    reasons[key] = f"{provider.name}: no price data"
+                    missing.append(key)
+            advance(missing)
+
+    for future, (provider, keys) in pending.items():
+        future.cancel()
+        for key in keys:
+            result.failed[key] = f"{provider.name}: deadline exceeded"
+
+    if report:
+        record_fetches(result)
+    return result
+
+
+def record_fetches(result):
+    """Report a fetch's upstream calls as price_fetch spans and failed calls to the error counter."""
+    for provider, keys, seconds in result.timings:
+        record("price_fetch", seconds, provider=provider, symbols=",".join(code for _, code in keys))
+    for provider in result.errors:
+        PRICE_FETCH_ERRORS.inc(provider=provider)
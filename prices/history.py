@@ -0,0 +1,212 @@
+# prices/history.py
+
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+
+import numpy as np
+
+from config import Config
+from .engine import provider_pool
+from .providers import provider_chain
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()  # days are stored like portfolio.snapshot dates
+
+
+def epoch_day(value):
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+class PriceHistoryStore:
+    """Daily closes per (asset_type, scheme_code) in a local SQLite file.
+
+    `coverage` records, per symbol, the earliest date asked for, the last day
+    stored and when upstream was last checked, so `update` only downloads the
+    dates that are missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._inflight = {}  # key -> future of the background update downloading it
+        self._inflight_lock = threading.Lock()
+        self._background = None
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS history (
+                    asset_type TEXT NOT NULL,
+                    scheme_code TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    close REAL NOT NULL,
+                    PRIMARY KEY (asset_type, scheme_code, day)
+                ) WITHOUT ROWID""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS coverage (
+                    asset_type TEXT NOT NULL,
+                    scheme_code TEXT NOT NULL,
+                    requested_from INTEGER NOT NULL,
+                    last_day INTEGER,
+                    checked_at REAL NOT NULL,
+                    PRIMARY KEY (asset_type, scheme_code)
+                )""")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def series(self, asset_type, scheme_code):
+        """(days, closes): int32 days since 1970-01-01 in ascending order and float64 closes."""
+        rows = self._connect().execute(
+            "SELECT day, close FROM history WHERE asset_type = ? AND scheme_code = ? ORDER BY day",
+            (asset_type, scheme_code)).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64)
+        days, closes = zip(*rows)
+        return np.array(days, dtype=np.int32), np.array(closes, dtype=np.float64)
+
+    def coverage(self, key):
+        return self._connect().execute(
+            "SELECT requested_from, last_day, checked_at FROM coverage WHERE asset_type = ? AND scheme_code = ?",
+            key).fetchone()
+
+    def add(self, key, points, requested_from):
+        """Store (date, close) points for `key` and record what has been checked."""
+        rows = [(*key, epoch_day(day), close) for day, close in points]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO history VALUES (?, ?, ?, ?)", rows)
+            last_day = conn.execute(
+                "SELECT MAX(day) FROM history WHERE asset_type = ? AND scheme_code = ?", key).fetchone()[0]
+            previous = self.coverage(key)
+            if previous is not None:
+                requested_from = min(requested_from, previous[0])
+            conn.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?, ?)",
+                         (*key, requested_from, last_day, time.time()))
+
+    def missing_from(self, key, since):
+        """First day (a date) that still has to be downloaded for `key`, or None if it is up to date."""
+        coverage = self.coverage(key)
+        if coverage is None or epoch_day(since) < coverage[0]:
+            return since
+        if time.time() - coverage[2] < Config.PRICE_HISTORY_RECHECK:
+            return None
+        if coverage[1] is None:
+            return since
+        return date.fromordinal(coverage[1] + 1 + EPOCH_ORDINAL)
+
+    def update(self, wanted, timeout=None, deadline=None):
+        """Download whatever is missing for {(asset_type, scheme_code): since date}.
+
+        Each symbol goes through its asset type's providers in
+        PRICE_PROVIDER_ORDER (those that serve history), with their retries
+        and circuit breakers, moving to the next one when a provider fails.
+        Batch providers download every ticker needing the same start date at
+        once. `timeout` caps each download and nothing is waited on past
+        `deadline` seconds. Returns {(asset_type, scheme_code): reason} for
+        symbols that failed.
+        """
+        timeout = timeout or Config.PRICE_HISTORY_TIMEOUT
+        deadline_at = time.monotonic() + (deadline or Config.PRICE_HISTORY_DEADLINE)
+        failed = {}
+        reasons = {}  # key -> why the last provider did not resolve it
+        starts, chains = {}, {}
+        for key, since in wanted.items():
+            start = self.missing_from(key, since)
+            if start is not None:
+                starts[key] = start
+                chains[key] = [provider for provider in provider_chain(key[0]) if provider.has_history]
+        pending = {}  # future -> (provider, keys, start)
+
+        def advance(keys):
+            groups = defaultdict(list)
+            for key in keys:
+                chain = chains[key]
+                while chain and chain[0].breaker.state == "open":
+                    reasons[key] = f"{chain.pop(0).name}: circuit open"
+                if not chain:
+                    failed[key] = reasons.get(key, f"no price history provider for asset_type: {key[0]}")
+                    continue
+                provider = chain.pop(0)
+                groups[(provider, starts[key]) if provider.batch else (provider, starts[key], key)].append(key)
+            for (provider, start, *_), group in groups.items():
+                future = provider_pool(provider.pool).submit(
+                    provider.fetch_history, [code for _, code in group], start, deadline_at, timeout)
+                pending[future] = (provider, group, start)
+
+        advance(list(starts))
+        while pending:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            done, _ = wait(list(pending), timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider, keys, start = pending.pop(future)
+                try:
+                    history = future.result()
+                except Exception as e:
+                    reasons.update((key, f"{provider.name}: {e}") for key in keys)
+                    advance(keys)
+                    continue
+                for key in keys:
+                    # No points since `start` is still recorded, so it is not asked again before the recheck
+                    self.add(key, history.get(key[1], []), epoch_day(start))
+
+        for future, (provider, keys, _) in pending.items():
+            future.cancel()
+            for key in keys:
+                failed[key] = f"{provider.name}: deadline exceeded"
+        return failed
+
+    def refresh(self, wanted, wait_for):
+        """`update` on a background thread, waiting at most `wait_for` seconds.
+
+        Symbols another refresh is already downloading are not asked for
+        again. Returns {(asset_type, scheme_code): reason} for symbols that
+        failed or are still downloading when the wait ends; those downloads
+        carry on and are stored when they finish.
+        """
+        with self._inflight_lock:
+            mine = {key: since for key, since in wanted.items() if key not in self._inflight}
+            if mine:
+                if self._background is None:
+                    self._background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="price-history")
+                future = self._background.submit(self.update, mine)
+                self._inflight.update((key, future) for key in mine)
+                future.add_done_callback(lambda _: self._forget(mine))
+            futures = {key: self._inflight[key] for key in wanted if key in self._inflight}
+
+        done, _ = wait(set(futures.values()), timeout=wait_for)
+        failed = {}
+        for key, future in futures.items():
+            if future not in done:
+                failed[key] = "still downloading"
+            elif future.exception() is not None:
+                failed[key] = str(future.exception())
+            elif key in future.result():
+                failed[key] = future.result()[key]
+        return failed
+
+    def _forget(self, keys):
+        with self._inflight_lock:
+            for key in keys:
+                self._inflight.pop(key, None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_history():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceHistoryStore(Config.PRICE_HISTORY_PATH)
+        return _store
@@ -0,0 +1,116 @@
+# prices/http.py
+"""Pooled, keep-alive HTTP for the price APIs.
+
+Every lookup in a worker process goes through one requests.Session, with a
+connection pool per upstream host (HTTP_POOL_SIZE) sized to that provider's concurrency, so
+consecutive NAV lookups reuse warm TCP+TLS connections instead of paying a
+handshake each. GET responses that carry an ETag or Last-Modified are kept
+(up to HTTP_CACHE_MAX_BYTES) and revalidated with If-None-Match /
+If-Modified-Since; an unchanged NAV then costs an empty 304.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+
+class ConditionalCache:
+    """Bounded LRU of url -> (validator headers, body) for conditional GETs."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "not_modified": 0}
+
+    def validators(self, url):
+        """Headers that make a GET of `url` conditional ({} if nothing is cached)."""
+        with self._lock:
+            entry = self._entries.get(url)
+            return dict(entry[0]) if entry else {}
+
+    def body(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            self._entries.move_to_end(url)
+            return entry[1]
+
+    def store(self, url, headers, content):
+        validators = {}
+        if headers.get("ETag"):
+            validators["If-None-Match"] = headers["ETag"]
+        if headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = headers["Last-Modified"]
+        with self._lock:
+            old = self._entries.pop(url, None)
+            if old is not None:
+                self.size -= len(old[1])
+            if not validators or len(content) > self.max_bytes:
+                return
+            self._entries[url] = (validators, content)
+            self.size += len(content)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+_cache = ConditionalCache(Config.HTTP_CACHE_MAX_BYTES)
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_conditional_cache():
+    return _cache
+
+
+def get_session():
+    """The process's shared Session, rebuilt after a fork so workers never share sockets."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            # Retries are the providers' job (see prices/providers.py)
+            for prefix in ("http://", "https://"):
+                session.mount(prefix, HTTPAdapter(pool_maxsize=Config.HTTP_POOL_SIZE["default"], max_retries=0))
+            for base_url, size in Config.HTTP_POOL_SIZE.items():
+                if base_url != "default":
+                    session.mount(base_url.rstrip("/") + "/", HTTPAdapter(pool_maxsize=size, max_retries=0))
+            _session, _session_pid = session, os.getpid()
+        return _session
+
+
+def fetch(url, timeout, headers=None, check=True):
+    """Body of a GET of `url`, revalidating a cached copy when there is one.
+
+    With check=False an error status returns its body instead of raising,
+    and is neither cached nor served from the cache.
+    """
+    request_headers = {**(headers or {}), **_cache.validators(url)}
+    response = get_session().get(url, headers=request_headers, timeout=timeout)
+    _cache.count("requests")
+    if response.status_code == 304:
+        content = _cache.body(url)
+        if content is not None:
+            _cache.count("not_modified")
+            return content
+        # Evicted between the lookup and the reply: ask again unconditionally
+        response = get_session().get(url, headers=headers, timeout=timeout)
+    if not response.ok:
+        if check:
+            response.raise_for_status()
+        return response.content
+    _cache.store(url, response.headers, response.content)
+    return response.content
@@ -0,0 +1,238 @@
+# prices/providers.py
+
+import random
+import threading
+import time
+from datetime import date
+
+from config import Config
+from .sources import fetch_mfapi_history, fetch_mfapi_nav, fetch_yahoo_closes, fetch_yahoo_history, fetch_yahoo_page_price
+
+
+class CircuitOpen(Exception):
+    """The provider's breaker is open; it is not called until its cooldown ends."""
+
+
+class CircuitBreaker:
+    """Stops calling a source after `threshold` consecutive failures.
+
+    After `cooldown` seconds one trial call is let through (half-open): if it
+    succeeds the breaker closes, otherwise it opens for another cooldown.
+    """
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class PriceProvider:
+    """One upstream price source.
+
+    Subclasses implement `_fetch(codes, timeout)` returning {code: price} for
+    the codes they found. A code upstream has no price for is left out, not
+    raised: only transport errors, timeouts and 5xx responses should raise,
+    as they count toward retries and the circuit breaker. `batch` providers
+    take many codes per call; the others are called once per code. `pool` names the engine thread pool
+    (and PRICE_FETCH_CONCURRENCY entry) the calls run on.
+
+    Providers that serve daily history also implement `_history(codes, start,
+    timeout)` returning {code: [(date, close)]}; it goes through the same
+    retries and circuit breaker as `_fetch`.
+    """
+
+    name = None
+    pool = None
+    batch = False
+
+    def __init__(self, timeout=None, retries=None, backoff=None, threshold=None, cooldown=None):
+        settings = {**Config.PRICE_PROVIDER_DEFAULTS, **Config.PRICE_PROVIDER_SETTINGS.get(self.name, {})}
+        self.timeout = timeout if timeout is not None else settings["timeout"]
+        self.retries = retries if retries is not None else settings["retries"]
+        self.backoff = backoff if backoff is not None else settings["backoff"]
+        self.breaker = CircuitBreaker(
+            threshold if threshold is not None else settings["breaker_threshold"],
+            cooldown if cooldown is not None else settings["breaker_cooldown"],
+        )
+
+    def _fetch(self, codes, timeout):
+        raise NotImplementedError
+
+    def _history(self, codes, start, timeout):
+        raise NotImplementedError
+
+    @property
+    def has_history(self):
+        return type(self)._history is not PriceProvider._history
+
+    def fetch(self, codes, deadline_at, timeout=None):
+        """{code: price} for `codes`, retried with jittered backoff up to `retries` times.
+
+        Each attempt gets the provider's timeout (capped by `timeout`) and
+        nothing waits past `deadline_at` (time.monotonic()). Raises
+        CircuitOpen without calling upstream while the breaker is open.
+        """
+        attempt_timeout = min(self.timeout, timeout or self.timeout)
+        return self._call(lambda remaining: self._fetch(codes, min(attempt_timeout, remaining)), deadline_at)
+
+    def fetch_history(self, codes, start, deadline_at, timeout):
+        """{code: [(date, close)]} from `start` (a date) on, like `fetch` but
+        with `timeout` per attempt: history downloads are much larger."""
+        return self._call(lambda remaining: self._history(codes, start, min(timeout, remaining)), deadline_at)
+
+    def _call(self, request, deadline_at):
+        if not self.breaker.allow():
+            raise CircuitOpen(f"{self.name}: circuit open")
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise TimeoutError("deadline exceeded")
+                value = request(remaining)
+            except Exception:
+                # Full jitter: a random wait up to backoff * 2^attempt
+                delay = random.uniform(0, self.backoff * 2 ** attempt)
+                if attempt >= self.retries or time.monotonic() + delay >= deadline_at:
+                    self.breaker.failure()
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.breaker.success()
+            return value
+
+
+class MfapiProvider(PriceProvider):
+    name = "mfapi"
+    pool = "mfapi"
+
+    def _fetch(self, codes, timeout):
+        prices = {}
+        for code in codes:
+            nav = fetch_mfapi_nav(code, timeout)
+            if nav is not None:
+                prices[code] = nav
+        return prices
+
+    def _history(self, codes, start, timeout):
+        # mfapi only serves a scheme's full history
+        history = {}
+        for code in codes:
+            points = fetch_mfapi_history(code, timeout)
+            if points is not None:
+                history[code] = [(day, nav) for day, nav in points if day >= start]
+        return history
+
+
+class YahooProvider(PriceProvider):
+    """Last close for many tickers in one yfinance download."""
+    name = "yahoo"
+    pool = "yahoo"
+    batch = True
+
+    def _fetch(self, codes, timeout):
+        return fetch_yahoo_closes(codes, timeout, Config.PRICE_FETCH_CONCURRENCY.get("yahoo", 4))
+
+    def _history(self, codes, start, timeout):
+        return fetch_yahoo_history(codes, start, timeout, Config.PRICE_FETCH_CONCURRENCY.get("yahoo", 4))
+
+
+class YahooPageProvider(PriceProvider):
+    """Scrapes the Yahoo quote page; slow, so only used as a fallback."""
+    name = "yahoo_page"
+    pool = "yahoo"
+
+    def _fetch(self, codes, timeout):
+        prices = {}
+        for code in codes:
+            price = fetch_yahoo_page_price(code, timeout)
+            if price is not None:
+                prices[code] = price
+        return prices
+
+
+class FakeProvider(PriceProvider):
+    """Local provider for tests and benchmarks; no network.
+
+    Returns `prices[code]` (or `default` for unknown codes, None = not found)
+    after `delay` seconds, and raises on every call while `fail` is set.
+    History is that price on every day from the start date to today.
+    """
+    name = "fake"
+    pool = "fake"
+    batch = True
+
+    def __init__(self, prices=None, default=100.0, delay=0.0, fail=False, **kwargs):
+        super().__init__(**kwargs)
+        self.prices = dict(prices or {})
+        self.default = default
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def _fetch(self, codes, timeout):
+        self.calls += 1
+        if self.delay:
+            time.sleep(min(self.delay, timeout))
+            if self.delay > timeout:
+                raise TimeoutError(f"fake: no response within {timeout}s")
+        if self.fail:
+            raise ConnectionError("fake: upstream unavailable")
+        found = {code: self.prices.get(code, self.default) for code in codes}
+        return {code: price for code, price in found.items() if price is not None}
+
+    def _history(self, codes, start, timeout):
+        prices = self._fetch(codes, timeout)
+        days = [date.fromordinal(day) for day in range(start.toordinal(), date.today().toordinal() + 1)]
+        return {code: [(day, price) for day in days] for code, price in prices.items()}
+
+
+REGISTRY = {}
+
+
+def register(provider):
+    """Add or replace a provider under its name (e.g. a configured FakeProvider in tests)."""
+    REGISTRY[provider.name] = provider
+    return provider
+
+
+for _cls in (MfapiProvider, YahooProvider, YahooPageProvider, FakeProvider):
+    register(_cls())
+
+
+def provider_chain(asset_type):
+    """Providers to try for `asset_type`, in fallback order (unknown names are skipped)."""
+    return [REGISTRY[name] for name in Config.PRICE_PROVIDER_ORDER.get(asset_type, ()) if name in REGISTRY]
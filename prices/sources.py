@@ -0,0 +1,145 @@
+# prices/sources.py
+
+import json
+import threading
+from datetime import datetime
+
+import requests
+import yfinance as yf
+import pandas as pd
+from bs4 import BeautifulSoup
+
+from config import Config
+from .http import fetch
+
+MFAPI_LATEST_URL = Config.MFAPI_BASE_URL + "/mf/{scheme_code}/latest"
+MFAPI_HISTORY_URL = Config.MFAPI_BASE_URL + "/mf/{scheme_code}"
+YAHOO_QUOTE_URL = "https://au.finance.yahoo.com/quote/{symbol}"
+
+# yf.download keeps its per-call results in module globals, so two downloads
+# running at once in the same process can mix up each other's frames.
+_yahoo_download_lock = threading.Lock()
+
+
+def is_missing_symbol(status_code):
+    """True for an HTTP error that is about the symbol (e.g. a 404), not the upstream.
+
+    Those are a missing price, so they are neither retried nor counted
+    against the provider's circuit breaker; 5xx, 408 and 429 still are.
+    """
+    return 400 <= status_code < 500 and status_code not in (408, 429)
+
+
+def parse_mfapi_nav(content):
+    """The NAV in an mfapi "latest" response, or None when it has none.
+
+    Delisted and unknown schemes come back with an empty `data` list.
+    """
+    try:
+        return float(json.loads(content)["data"][0]["nav"])
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+
+def fetch_mfapi_nav(scheme_code, timeout):
+    """Latest NAV of a scheme, or None if mfapi has no NAV for it."""
+    try:
+        content = fetch(MFAPI_LATEST_URL.format(scheme_code=scheme_code), timeout)
+    except requests.HTTPError as e:
+        if e.response is not None and is_missing_symbol(e.response.status_code):
+            return None
+        raise
+    return parse_mfapi_nav(content)
+
+
+def fetch_mfapi_history(scheme_code, timeout):
+    """Every published NAV of a scheme as (date, nav) pairs, or None if mfapi
+    does not know the scheme; mfapi has no range query."""
+    try:
+        content = fetch(MFAPI_HISTORY_URL.format(scheme_code=scheme_code), timeout)
+    except requests.HTTPError as e:
+        if e.response is not None and is_missing_symbol(e.response.status_code):
+            return None
+        raise
+    return [
+        (datetime.strptime(point["date"], "%d-%m-%Y").date(), float(point["nav"]))
+        for point in json.loads(content).get("data") or []
+    ]
+
+
+def fetch_yahoo_history(symbols, start, timeout, threads=4):
+    """Daily closes from `start` (a date) for many tickers in one download.
+
+    Returns a dict of symbol -> [(date, close)]; symbols without data are left out.
+    """
+    with _yahoo_download_lock:
+        data = yf.download(
+            list(symbols),
+            start=start.isoformat(),
+            group_by="ticker",
+            threads=threads,
+            progress=False,
+            timeout=timeout,
+            auto_adjust=False,
+        )
+    history = {}
+    if data is None or data.empty:
+        return history
+
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            series = data[symbol]["Close"]
+        else:
+            series = data["Close"]
+        series = series.dropna()
+        if not series.empty:
+            history[symbol] = [(day.date(), float(close)) for day, close in series.items()]
+    return history
+
+
+def fetch_yahoo_closes(symbols, timeout, threads=4):
+    """Download the last close for many tickers in one multi-symbol download.
+
+    Returns a dict of symbol -> close; symbols without data are left out.
+    """
+    with _yahoo_download_lock:
+        data = yf.download(
+            list(symbols),
+            period="5d",
+            group_by="ticker",
+            threads=threads,
+            progress=False,
+            timeout=timeout,
+        )
+    closes = {}
+    if data is None or data.empty:
+        return closes
+
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            series = data[symbol]["Close"]
+        else:
+            series = data["Close"]
+        series = series.dropna()
+        if not series.empty:
+            closes[symbol] = float(series.iloc[-1])
+    return closes
+
+
+def fetch_yahoo_page_price(symbol, timeout):
+    page = fetch(YAHOO_QUOTE_URL.format(symbol=symbol), timeout,
+                 headers={"User-Agent": "Mozilla/5.0"}, check=False)
+    soup = BeautifulSoup(page, "html.parser")
+
+    # Find the span that holds the current price (this selector may change over time)
+    price_span = soup.find("fin-streamer", {"data-field": "regularMarketPrice"})
+    if price_span:
+        try:
+            return float(price_span.text.replace(',', ''))
+        except ValueError:
+            pass
+    return None
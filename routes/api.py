@@ -0,0 +1,189 @@
+import csv
+import io
+import json
+import zlib
+import numpy as np
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from storage import get_storage_backend, portfolio_filename
+from routes.auth import current_portfolio
+from portfolio import TransactionSet, holdings, portfolio_series
+from portfolio.snapshot import NUMERIC_COLUMNS
+from prices import get_price_history
+from scheduler import load_summary, refresh_summary
+from page_cache import page_etag, page_response
+from routes.main import parse_date_arg, summaries_stored, summary_is_current
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+@api_bp.route("/history")
+def history():
+    """Daily value, invested capital and drawdown per asset type (or per scheme with ?by=scheme_code).
+
+    Missing closes are downloaded in the background; symbols not done within
+    PRICE_HISTORY_WAIT are listed in "failed" as still downloading, so a
+    later call returns the full series.
+    """
+    backend = get_storage_backend()
+    filename = portfolio_filename(current_portfolio())
+    version = backend.get_version(filename)
+    if version is None:
+        return jsonify({"error": "No transaction file found."}), 404
+
+    by = request.args.get("by", "asset_type")
+    if by not in ("asset_type", "scheme_code"):
+        return jsonify({"error": "by must be asset_type or scheme_code"}), 400
+    start = parse_date_arg(request.args.get("from"))
+    end = parse_date_arg(request.args.get("to"))
+
+    snapshot = TransactionSet.load(backend, filename, version).snapshot
+    wanted = holdings(snapshot)
+
+    # Only dates missing from the local store are downloaded
+    store = get_price_history()
+    failed = store.refresh(wanted, current_app.config["PRICE_HISTORY_WAIT"])
+    prices = {key: store.series(*key) for key in wanted}
+    result = portfolio_series(snapshot, prices, by=by, start=start, end=end)
+
+    return jsonify({
+        "dates": result.dates(),
+        "series": {
+            name: {field: [round(float(v), 4) for v in values[field]] for field in ("value", "invested", "drawdown")}
+            for name, values in result.series.items()
+        },
+        "failed": {f"{asset_type}:{code}": reason for (asset_type, code), reason in failed.items()},
+    })
+
+
+def query_filters():
+    """Transaction filters shared by the list and export endpoints: scheme_code, asset_type, type, from, to."""
+    filters = {name: request.args.get(name, "").strip() for name in ("scheme_code", "asset_type", "type")}
+    return dict(filters, start=parse_date_arg(request.args.get("from")), end=parse_date_arg(request.args.get("to")))
+
+def typed_row(header, row):
+    return {name: float(value) if name in NUMERIC_COLUMNS and value != "" else value
+            for name, value in zip(header, row)}
+
+@api_bp.route("/summary")
+def summary():
+    """The portfolio summary with unformatted numbers (rates are fractions: 0.12 = 12%)."""
+    backend = get_storage_backend()
+    portfolio_id = current_portfolio()
+    filename = portfolio_filename(portfolio_id)
+    version = backend.get_version(filename)
+    if version is None:
+        return jsonify({"error": "No transaction file found."}), 404
+
+    snapshot = load_summary(backend, filename) if summaries_stored() else None
+    if not summary_is_current(snapshot, version):
+        try:
+            snapshot = refresh_summary(backend, filename, version=version, persist=summaries_stored())
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 404
+
+    body = json.dumps({
+        "portfolio": portfolio_id,
+        "version": snapshot.version,
+        "computed_at": snapshot.computed_at,
+        "xirr": snapshot.data.portfolio.get("xirr_rate"),
+        "xirr_error": snapshot.data.portfolio.get("xirr_error"),
+        "asset_types": {
+            asset_type: {
+                "display_name": data["display_name"],
+                "currency": data["currency"],
+                "totals": {
+                    **{field: data["totals"][field] for field in ("invested", "current", "realized", "unrealized")},
+                    "xirr": data["totals"].get("xirr_rate"),
+                },
+                "rows": [dict(row["values"], scheme_name=row["scheme_name"], xirr_error=row["xirr_error"])
+                         for row in data["rows"]],
+            }
+            for asset_type, data in snapshot.data.items()
+        },
+    })
+    return page_response(Response(body, mimetype="application/json"),
+                         page_etag("api.summary", filename, snapshot.version, snapshot.computed_at),
+                         snapshot.computed_at)
+
+@api_bp.route("/transactions")
+def transactions():
+    """One newest-first page of transactions. Follow `cursors.older` with ?after= and `cursors.newer` with ?before=."""
+    backend = get_storage_backend()
+    filename = portfolio_filename(current_portfolio())
+    version = backend.get_version(filename)
+    if version is None:
+        return jsonify({"error": "No transaction file found."}), 404
+
+    per_page = min(max(request.args.get("per_page", 50, type=int), 1), current_app.config["API_MAX_PER_PAGE"])
+    transaction_set = TransactionSet.load(backend, filename, version)
+    result = transaction_set.query().page(
+        per_page=per_page,
+        after=request.args.get("after", type=int),
+        before=request.args.get("before", type=int),
+        **query_filters(),
+    )
+    header = transaction_set.header
+    return jsonify({
+        "version": version,
+        "header": header,
+        "rows": [typed_row(header, row) for row in result.rows],
+        "total_rows": result.total_rows,
+        "cursors": {"older": result.older_cursor, "newer": result.newer_cursor},
+    })
+
+@api_bp.route("/export/transactions.<fmt>")
+def export_transactions(fmt):
+    """Every matching transaction, oldest first, streamed as CSV or NDJSON (gzipped if the client accepts it).
+
+    Rows are decoded from the snapshot a chunk at a time, so neither the
+    export nor its encoded form is ever held in memory whole.
+    """
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 404
+    backend = get_storage_backend()
+    filename = portfolio_filename(current_portfolio())
+    version = backend.get_version(filename)
+    if version is None:
+        return jsonify({"error": "No transaction file found."}), 404
+
+    query = TransactionSet.load(backend, filename, version).query()
+    snapshot = query.snapshot
+    positions = query.positions(**query_filters())
+    chunk_rows = current_app.config["EXPORT_CHUNK_ROWS"]
+
+    def chunks():
+        header = snapshot.header
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == "csv":
+            writer.writerow(header)
+        for lo in range(0, len(positions), chunk_rows):
+            rows = snapshot.rows(np.asarray(positions[lo:lo + chunk_rows], dtype=np.int64))
+            if fmt == "csv":
+                writer.writerows(rows)
+            else:
+                buffer.writelines(json.dumps(typed_row(header, row)) + "\n" for row in rows)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():  # a CSV header with no rows under it
+            yield buffer.getvalue().encode("utf-8")
+
+    gzip = "gzip" in request.accept_encodings
+    body = gzipped(chunks()) if gzip else chunks()
+    headers = {
+        "Content-Disposition": f'attachment; filename="transactions-{version[:12]}.{fmt}"',
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    # No Content-Length: the server sends the body with chunked transfer encoding
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,17 +1,21 @@
-from flask import Blueprint, request, session, redirect, url_for, flash, render_template, current_app
+from flask import Blueprint, request, session, redirect, url_for, flash, render_template, current_app, abort
 from functools import wraps
+from storage import DEFAULT_PORTFOLIO, is_valid_portfolio_id
 
+import hmac
 import os
 
 auth_bp = Blueprint("auth", __name__)
 
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
-    VALID_USERNAME = current_app.config["USERNAME"]
-    VALID_PASSWORD = current_app.config["PASSWORD"]
+    USERS = current_app.config["USERS"]
     if request.method == "POST":
-        if request.form.get("username") == VALID_USERNAME and request.form.get("password") == VALID_PASSWORD:
-            session["user"] = VALID_USERNAME
+        username = request.form.get("username", "")
+        user = USERS.get(username)
+        if user and hmac.compare_digest(request.form.get("password", ""), user["password"]):
+            session["user"] = username
+            session.pop("portfolio", None)
             return redirect(request.args.get("next") or url_for("main.summary"))
         flash("Invalid credentials", "error")
     return render_template("login.html")
@@ -19,6 +23,7 @@ def login():
 @auth_bp.route("/logout")
 def logout():
     session.pop("user", None)
+    session.pop("portfolio", None)
     return redirect(url_for("main.summary"))
 
 def login_required(f):
@@ -28,3 +33,29 @@ def login_required(f):
             return redirect(url_for("auth.login", next=request.url))
         return f(*args, **kwargs)
     return decorated_function
+
+def allowed_portfolios(user):
+    """Portfolio ids `user` may open, or None for every portfolio. Anonymous visitors see the default one."""
+    if user is None:
+        return [DEFAULT_PORTFOLIO]
+    granted = current_app.config["USERS"].get(user, {}).get("portfolios", [])
+    return None if "*" in granted else granted
+
+def can_open(user, portfolio_id):
+    allowed = allowed_portfolios(user)
+    return is_valid_portfolio_id(portfolio_id) and (allowed is None or portfolio_id in allowed)
+
+def current_portfolio():
+    """The portfolio this request works on: ?portfolio= (remembered in the session), else the last one used."""
+    user = session.get("user")
+    requested = request.args.get("portfolio")
+    if requested:
+        if not can_open(user, requested):
+            abort(403)
+        session["portfolio"] = requested
+        return requested
+    portfolio_id = session.get("portfolio")
+    if portfolio_id and can_open(user, portfolio_id):
+        return portfolio_id
+    allowed = allowed_portfolios(user)
+    return allowed[0] if allowed else DEFAULT_PORTFOLIO
@@ -1,77 +1,126 @@
-from flask import Blueprint, request, render_template, redirect, url_for, Response,current_app
-from routes.auth import login_required
-from storage import get_storage_backend
-from tracker import get_portfolio_summary
+from flask import Blueprint, request, render_template, redirect, url_for, Response, current_app, session
+from routes.auth import login_required, allowed_portfolios, current_portfolio
+from storage import DEFAULT_PORTFOLIO, get_storage_backend, list_portfolios, portfolio_filename, register_portfolio
+from scheduler import load_summary, refresh_summary
+from utils import format_age
+from page_cache import cached_page, fragments, page_etag, store_page
 from storage.config import get_backend_type
-from google.cloud import storage
+from portfolio import TransactionSet, ingest_csv
 import io, csv
 from datetime import datetime
 import traceback
 
 main_bp = Blueprint("main", __name__)
 
+def parse_date_arg(value):
+    """Dates from query params: YYYY-MM-DD (date inputs) or dd-mm-YYYY (the CSV format)."""
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+def summaries_stored():
+    """Whether summaries are stored and kept current; with SUMMARY_REFRESH_MODE=off
+    every view computes its own in memory and nothing is written."""
+    return current_app.config["SUMMARY_REFRESH_MODE"] != "off"
+
+def summary_is_current(snapshot, version):
+    return snapshot is not None and snapshot.version == version and summaries_stored()
+
+def summary_etag(backend_type, filename, snapshot):
+    """Identity of the summary page for this request (see page_cache.py)."""
+    return page_etag(backend_type, filename, snapshot.version, snapshot.computed_at, format_age(snapshot.age),
+                     request.full_path, session.get("user"))
+
+def portfolio_options(backend):
+    """Portfolios the switcher offers to the current user."""
+    allowed = allowed_portfolios(session.get("user"))
+    return list_portfolios(backend) if allowed is None else allowed
+
+def render_summary(backend, filename, portfolio_id, transactions, snapshot, msg, backend_type, per_page=20):
+    """The summary page for a stored summary snapshot plus the filtered, paginated transaction table."""
+    page = int(request.args.get("page", 1))
+
+    # Transaction table: filtered and paginated on the snapshot index
+    filters = {name: request.args.get(name, "").strip() for name in ("scheme_code", "asset_type", "type")}
+    start = parse_date_arg(request.args.get("from"))
+    end = parse_date_arg(request.args.get("to"))
+    query = transactions.query()
+    result = query.page(
+        per_page=per_page,
+        page=page,
+        after=request.args.get("after", type=int),
+        before=request.args.get("before", type=int),
+        start=start,
+        end=end,
+        **filters,
+    )
+    # Carried over to the pagination links
+    active_filters = {name: value for name, value in filters.items() if value}
+    if start:
+        active_filters["from"] = start.isoformat()
+    if end:
+        active_filters["to"] = end.isoformat()
+
+    html = render_template(
+        "summary.html",
+        #summary_text=summary_text,
+        summary_data=snapshot.data,
+        fragments=fragments(snapshot.data),
+        summary_age=format_age(snapshot.age),
+        transaction_header=transactions.header,
+        transaction_data=result.rows,
+        page=result.page,
+        total_pages=result.total_pages,
+        newer_cursor=result.newer_cursor,
+        older_cursor=result.older_cursor,
+        filters=active_filters,
+        filter_options=query.options(),
+        msg=msg,
+        backend_type=backend_type,
+        portfolio=portfolio_id,
+        portfolios=portfolio_options(backend),
+    )
+    return store_page(html, summary_etag(backend_type, filename, snapshot), snapshot.computed_at)
+
 @main_bp.route("/")
 def summary():
     backend = get_storage_backend()
-    CSV_FILENAME=current_app.config["CSV_FILENAME"]
-    BUCKET_NAME=current_app.config["BUCKET_NAME"]
     try:
         msg = request.args.get("msg")  # from redirect
-        page = int(request.args.get("page", 1))
-        per_page = 20
-
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(BUCKET_NAME)
-        blob = bucket.blob(CSV_FILENAME)
 
-        if not blob.exists():
+        # Every portfolio is its own file, with its own derived state next to it
+        portfolio_id = current_portfolio()
+        filename = portfolio_filename(portfolio_id)
+        backend_type = get_backend_type()
+        version = backend.get_version(filename)
+        if version is None:
+            if portfolio_id != DEFAULT_PORTFOLIO:
+                return redirect(url_for("main.upload"))  # a new portfolio starts with its first upload
             return Response("⚠️ No transaction file found.", status=404)
 
-        # Read file
-        csv_data = blob.download_as_text()
-        file_obj = io.StringIO(csv_data)
-
-        # Portfolio summary
-        #summary_text = get_portfolio_summary(file_obj)
-        #summary_text = get_portfolio_summary(get_storage_backend(), filename=CSV_FILENAME)
-        summary_data = get_portfolio_summary(get_storage_backend(), filename=CSV_FILENAME)
-
-
-        # Read again for table
-        file_obj.seek(0)
-        reader = csv.reader(file_obj)
-        rows = list(reader)
-        transaction_header = rows[0]
-        transaction_data = rows[1:]
-
-        # Sort by date column
-        date_idx = transaction_header.index("date")
-
-        def parse_date(row):
-            try:
-                return datetime.strptime(row[date_idx], "%d-%m-%Y")
-            except ValueError:
-                return datetime.min
-
-        transaction_data.sort(key=parse_date, reverse=True)
-
-        total_rows = len(transaction_data)
-        total_pages = (total_rows + per_page - 1) // per_page
-        start = (page - 1) * per_page
-        end = start + per_page
-        paged_data = transaction_data[start:end]
-
-        return render_template(
-            "summary.html",
-            #summary_text=summary_text,
-            summary_data=summary_data,
-            transaction_header=transaction_header,
-            transaction_data=paged_data,
-            page=page,
-            total_pages=total_pages,
-            msg=msg,
-            backend_type=get_backend_type()
-        )
+        # Nothing has changed since this page was rendered: answer with a 304
+        # or the cached page before loading anything else
+        snapshot = load_summary(backend, filename) if summaries_stored() else None
+        if summary_is_current(snapshot, version):
+            response = cached_page(summary_etag(backend_type, filename, snapshot), snapshot.computed_at)
+            if response is not None:
+                return response
+
+        # Load once (from the columnar snapshot when current); the summary and
+        # the transaction table share the same rows
+        transactions = TransactionSet.load(backend, filename, version)
+
+        # Portfolio summary: the snapshot kept current by the scheduler, computed
+        # here only when none exists yet for this version (e.g. right after an
+        # upload) or when no scheduler is running
+        if not summary_is_current(snapshot, version):
+            snapshot = refresh_summary(backend, filename, transactions=transactions, version=version,
+                                       persist=summaries_stored())
+
+        return render_summary(backend, filename, portfolio_id, transactions, snapshot, msg, backend_type)
 
     #except Exception as e:
         #full_trace = traceback.format_exc()
@@ -85,7 +134,8 @@ def summary():
 def upload():
     from flask import request, current_app
     backend = get_storage_backend()
-    CSV_FILENAME = current_app.config["CSV_FILENAME"]
+    portfolio_id = current_portfolio()
+    filename = portfolio_filename(portfolio_id)
     BUCKET_NAME = current_app.config["BUCKET_NAME"]
 
     if request.method == "POST":
@@ -93,38 +143,23 @@ def upload():
         if not file or not file.filename.endswith(".csv"):
             return redirect(url_for("main.summary", msg="❌ Invalid file type. Only CSVs allowed."))
 
-        existing_header, existing_rows = backend.load_csv(CSV_FILENAME)
-
-        file_data = file.read().decode('utf-8-sig')
-        reader = csv.reader(io.StringIO(file_data))
-        header = next(reader, None)
-
-        if not header:
-            return redirect(url_for("main.summary", msg="❌ Invalid or empty CSV file."))
-
-        # Ensure asset_type exists in the header
-        if "asset_type" not in header:
-            header.append("asset_type")
-            add_default_asset_type = True
-        else:
-            add_default_asset_type = False
-
-        uploaded_rows = set()
-        for row in reader:
-            if not any(cell.strip() for cell in row):
-                continue
-
-            if add_default_asset_type:
-                row.append("mutual_fund")
-            uploaded_rows.add(tuple(row))
-
-        new_rows = uploaded_rows - existing_rows
-        if not new_rows:
+        # Stream the upload instead of reading it whole; rows are validated,
+        # deduplicated against the stored row-hash index and appended in chunks
+        stream = io.TextIOWrapper(file.stream, encoding="utf-8-sig", newline="")
+        try:
+            report = ingest_csv(backend, filename, stream, current_app.config["COST_BASIS_METHOD"])
+        except ValueError as e:
+            return redirect(url_for("main.summary", msg=f"❌ {e}"))
+        except UnicodeDecodeError:
+            return redirect(url_for("main.summary", msg="❌ The file is not valid UTF-8 text."))
+
+        if report.accepted:
+            register_portfolio(backend, portfolio_id)
+        if report.rejected_count:
+            return render_template("upload.html", report=report, portfolio=portfolio_id)
+        if not report.accepted:
             return redirect(url_for("main.summary", msg="⚠️ No new rows found — all data is already uploaded."))
 
-        merged_rows = existing_rows.union(new_rows)
-        backend.save_csv(CSV_FILENAME, header, merged_rows)
-
-        return redirect(url_for("main.summary", msg=f"✅ {len(new_rows)} lines uploaded"))
+        return redirect(url_for("main.summary", msg=f"✅ {report.accepted} lines uploaded"))
 
-    return render_template("upload.html")
+    return render_template("upload.html", portfolio=portfolio_id)
@@ -0,0 +1,55 @@
+# Async variant of main.summary, swapped in by app.py when SERVER_MODE=async
+import asyncio
+from flask import request, render_template, Response, current_app, redirect, url_for
+from storage import DEFAULT_PORTFOLIO, get_backend, portfolio_filename
+from storage.config import get_backend_type
+from scheduler import load_summary, refresh_summary
+from portfolio import TransactionSet, get_states
+from prices.aio import get_latest_prices_async
+from tracker import price_symbols
+from page_cache import cached_page
+from routes.auth import current_portfolio
+from routes.main import render_summary, summaries_stored, summary_etag, summary_is_current
+
+async def summary():
+    try:
+        msg = request.args.get("msg")  # from redirect
+        portfolio_id = current_portfolio()
+        filename = portfolio_filename(portfolio_id)
+
+        # The backend setting (a Firestore read when not cached) picks the
+        # backend; its version and the stored summary are then read together
+        backend_type = await asyncio.to_thread(get_backend_type)
+        backend = get_backend(backend_type)
+        if summaries_stored():
+            version, snapshot = await asyncio.gather(
+                asyncio.to_thread(backend.get_version, filename),
+                asyncio.to_thread(load_summary, backend, filename),
+            )
+        else:
+            version, snapshot = await asyncio.to_thread(backend.get_version, filename), None
+        if version is None:
+            if portfolio_id != DEFAULT_PORTFOLIO:
+                return redirect(url_for("main.upload"))
+            return Response("⚠️ No transaction file found.", status=404)
+        if summary_is_current(snapshot, version):
+            response = cached_page(summary_etag(backend_type, filename, snapshot), snapshot.computed_at)
+            if response is not None:
+                return response
+
+        transactions = await asyncio.to_thread(TransactionSet.load, backend, filename, version)
+        if not summary_is_current(snapshot, version):
+            states = await asyncio.to_thread(
+                get_states, backend, filename, current_app.config["COST_BASIS_METHOD"], transactions, version)
+            if not states:
+                raise ValueError("No data found in transaction file.")
+            # Every price lookup of this request in flight at once on the shared async client
+            price_result = await get_latest_prices_async(price_symbols(states))
+            snapshot = await asyncio.to_thread(
+                refresh_summary, backend, filename, version=version, states=states, price_result=price_result,
+                persist=summaries_stored())
+
+        return render_summary(backend, filename, portfolio_id, transactions, snapshot, msg, backend_type)
+
+    except ValueError as e:
+        return render_template("msg.html", msg=str(e))
@@ -0,0 +1,9 @@
+from flask import Blueprint, Response
+from instrumentation import render_metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+@metrics_bp.route("/metrics")
+def metrics():
+    """Prometheus text format; counts are per worker process."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
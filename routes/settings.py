@@ -1,5 +1,6 @@
-from flask import Blueprint, request, redirect, url_for, render_template, current_app
-from routes.auth import login_required
+from flask import Blueprint, request, redirect, url_for, render_template, current_app, session, abort
+from routes.auth import login_required, allowed_portfolios
+from storage import BACKEND_TYPES, get_backend, migrate_portfolios
 from storage.config import get_backend_type, set_backend_type
 
 settings_bp = Blueprint("settings", __name__)
@@ -7,10 +8,22 @@ settings_bp = Blueprint("settings", __name__)
 @settings_bp.route("/settings/backend", methods=["GET", "POST"])
 @login_required
 def backend():
+    # The backend holds every portfolio, so only logins that can open all of them may switch it
+    if allowed_portfolios(session.get("user")) is not None:
+        abort(403)
+    pinned = bool(current_app.config["STORAGE_BACKEND"])
     if request.method == "POST":
+        if pinned:
+            # The setting lives in Firestore, which a pinned (e.g. local) deployment may not have
+            return redirect(url_for("main.summary", msg="⚠️ The storage backend is pinned by STORAGE_BACKEND; unset it to switch backends."))
         backend = request.form.get("backend")
-        if backend in ["gcs", "firestore"]:
+        current_backend = get_backend_type()
+        if backend in BACKEND_TYPES:
+            if request.form.get("migrate") and backend != current_backend:
+                copied = migrate_portfolios(get_backend(current_backend), get_backend(backend))
+                set_backend_type(backend)
+                return redirect(url_for("main.summary", msg=f"✅ {copied} rows copied to {backend}"))
             set_backend_type(backend)
         return redirect(url_for("main.summary"))
     current_backend = get_backend_type()
-    return render_template("settings.html", current_backend=current_backend)
+    return render_template("settings.html", current_backend=current_backend, pinned=pinned)
@@ -0,0 +1,265 @@
+# scheduler.py
+"""Background price refresh and precomputed portfolio summary.
+
+Runs inside each gunicorn worker (SUMMARY_REFRESH_MODE=thread, started by
+the post_worker_init hook in gunicorn.conf.py) or as its own
+process: `python scheduler.py` (SUMMARY_REFRESH_MODE=worker). However many
+are started, a leader lease in storage lets only one of them refresh at a time.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from config import Config
+from instrumentation import log_event, span, timed
+from portfolio import TransactionSet, get_states
+from prices import get_price_cache
+from prices.cache import expires_at
+from storage import get_storage_backend, list_portfolios, portfolio_filename
+from tracker import SummaryData, summarize_states
+
+SUMMARY_SUFFIX = ".summary"
+LEADER_OBJECT = "scheduler.leader"
+SUMMARY_FORMAT = 2  # bumped when SummaryData gains fields; older stored summaries are recomputed
+POLL_INTERVAL = 60  # seconds; also how quickly a new upload gets a fresh summary
+
+
+class SummarySnapshot:
+    def __init__(self, version, computed_at, data):
+        self.version = version
+        self.computed_at = computed_at
+        self.data = data
+
+    @property
+    def age(self):
+        return time.time() - self.computed_at
+
+
+def save_summary(backend, filename, version, summary_data, computed_at=None):
+    snapshot = SummarySnapshot(version, computed_at or time.time(), summary_data)
+    payload = {"format": SUMMARY_FORMAT, "version": version, "computed_at": snapshot.computed_at,
+               "summary": summary_data.to_dict()}
+    backend.save_object(filename + SUMMARY_SUFFIX, json.dumps(payload).encode("utf-8"))
+    return snapshot
+
+
+@timed("load_summary")
+def load_summary(backend, filename):
+    data = backend.load_object(filename + SUMMARY_SUFFIX)
+    if not data:
+        return None
+    payload = json.loads(data)
+    if payload.get("format") != SUMMARY_FORMAT:
+        return None
+    return SummarySnapshot(payload["version"], payload["computed_at"], SummaryData.from_dict(payload["summary"]))
+
+
+def refresh_summary(backend, filename, transactions=None, version=None, states=None, price_result=None,
+                    persist=True):
+    """Recompute the summary for the file's current version and store it.
+
+    With `persist=False` (no scheduler keeps stored summaries current) it is
+    only computed, for this request.
+    """
+    if version is None:
+        version = backend.get_version(filename)
+    if states is None:
+        states = get_states(
+            backend, filename, Config.COST_BASIS_METHOD,
+            transactions or (lambda: TransactionSet.load(backend, filename, version)), version,
+        )
+    if not states:
+        raise ValueError("No data found in transaction file.")
+    summary_data = summarize_states(states, price_result)
+    if not persist:
+        return SummarySnapshot(version, time.time(), summary_data)
+    return save_summary(backend, filename, version, summary_data)
+
+
+def _at(local, hhmm):
+    hour, minute = (int(part) for part in hhmm.split(":"))
+    return local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+
+def next_refresh(asset_type, now):
+    """When prices for `asset_type` should next be refreshed after `now` (aware datetime).
+
+    Mutual funds: shortly after the daily NAV publish time. Equities: every
+    MARKET_REFRESH_INTERVAL while their market is open, once more at the
+    close, then at the next weekday open.
+    """
+    interval = timedelta(seconds=Config.MARKET_REFRESH_INTERVAL)
+    if asset_type == "mutual_fund":
+        publish = expires_at(asset_type, now.timestamp())
+        return datetime.fromtimestamp(publish + Config.MF_NAV_REFRESH_DELAY, timezone.utc)
+
+    hours = Config.MARKET_HOURS.get(asset_type)
+    if hours is None:
+        return now + interval
+    tz, open_at, close_at = hours
+    local = now.astimezone(ZoneInfo(tz))
+    opens, closes = _at(local, open_at), _at(local, close_at)
+    if local.weekday() < 5 and opens <= local < closes:
+        return min(local + interval, closes)
+
+    if local >= opens:
+        opens += timedelta(days=1)
+    while opens.weekday() >= 5:
+        opens += timedelta(days=1)
+    return opens
+
+
+class LeaderLock:
+    """A lease stored next to the portfolios, so one scheduler per deployment runs.
+
+    Every scheduler tries to take or renew it before each run (one
+    compare-and-swap); the holder renews it every poll, and another takes
+    over once it has gone SCHEDULER_LEASE seconds without renewal.
+    """
+
+    def __init__(self, lease=None):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = lease or Config.SCHEDULER_LEASE
+
+    def acquire(self, backend):
+        now = time.time()
+
+        def mutate(current):
+            holder = json.loads(current) if current else None
+            if holder and holder["owner"] != self.owner and holder["expires"] > now:
+                return None
+            return json.dumps({"owner": self.owner, "expires": now + self.lease}).encode("utf-8")
+
+        return json.loads(backend.update_object(LEADER_OBJECT, mutate))["owner"] == self.owner
+
+    def release(self, backend):
+        def mutate(current):
+            holder = json.loads(current) if current else None
+            if not holder or holder["owner"] != self.owner:
+                return None
+            return json.dumps({"owner": None, "expires": 0}).encode("utf-8")
+
+        backend.update_object(LEADER_OBJECT, mutate)
+
+
+class RefreshScheduler:
+    """Keeps every portfolio's prices and stored summary fresh.
+
+    Each poll reads only the portfolios' versions. The symbols each portfolio
+    holds are remembered per version, so states are loaded only for a
+    portfolio whose file changed or whose summary needs recomputing because
+    one of its asset types is due. Due symbols from all portfolios are
+    refreshed in one deduplicated fetch, so a fund held in many portfolios is
+    fetched once.
+    """
+
+    def __init__(self, portfolios=None, lock=None):
+        self.portfolios = portfolios  # ids to keep fresh; None = every portfolio in the backend
+        self.lock = lock or LeaderLock()
+        self.next_runs = {}  # asset_type -> aware datetime
+        self.holdings = {}  # portfolio_id -> (version, {(asset_type, scheme_code)})
+        self._stop = threading.Event()
+
+    def _load_states(self, backend, filename, version):
+        return get_states(
+            backend, filename, Config.COST_BASIS_METHOD,
+            lambda: TransactionSet.load(backend, filename, version), version,
+        )
+
+    def run_once(self, now=None):
+        """Refresh prices for the asset types that are due, then each stored summary that changed.
+
+        Returns {portfolio_id: summary snapshot} for the portfolios whose
+        summary was checked or recomputed.
+        """
+        now = now or datetime.now(timezone.utc)
+        backend = get_storage_backend()
+        versions = {}
+        for portfolio_id in self.portfolios or list_portfolios(backend):
+            version = backend.get_version(portfolio_filename(portfolio_id))
+            if version is not None:
+                versions[portfolio_id] = version
+
+        loaded = {}  # portfolio_id -> states, for files that changed since the last run
+        for portfolio_id, version in versions.items():
+            if self.holdings.get(portfolio_id, (None,))[0] != version:
+                states = self._load_states(backend, portfolio_filename(portfolio_id), version)
+                loaded[portfolio_id] = states
+                self.holdings[portfolio_id] = (version, {(state["asset_type"], code) for code, state in states.items()})
+        for portfolio_id in set(self.holdings) - set(versions):
+            del self.holdings[portfolio_id]
+
+        asset_types = {asset_type for _, held in self.holdings.values() for asset_type, _ in held}
+        due = {asset_type for asset_type in asset_types if self.next_runs.get(asset_type, now) <= now}
+        symbols = {key for _, held in self.holdings.values() for key in held if key[0] in due}
+        if symbols:
+            with span("scheduled_price_refresh", symbols=len(symbols), portfolios=len(versions)):
+                get_price_cache().refresh(symbols)
+        for asset_type in due:
+            self.next_runs[asset_type] = next_refresh(asset_type, now)
+
+        snapshots = {}
+        for portfolio_id, version in versions.items():
+            filename = portfolio_filename(portfolio_id)
+            held_due = due & {asset_type for asset_type, _ in self.holdings[portfolio_id][1]}
+            if not held_due:
+                if portfolio_id not in loaded:
+                    continue  # same file, no new prices: the stored summary still holds
+                snapshot = load_summary(backend, filename)
+                if snapshot is not None and snapshot.version == version:
+                    snapshots[portfolio_id] = snapshot
+                    continue
+            states = loaded.get(portfolio_id)
+            if states is None:
+                states = self._load_states(backend, filename, version)
+            snapshots[portfolio_id] = refresh_summary(backend, filename, version=version, states=states)
+        return snapshots
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                if self.lock.acquire(get_storage_backend()):
+                    self.run_once()
+                else:
+                    # Another scheduler leads; start from scratch if this one takes over
+                    self.next_runs.clear()
+                    self.holdings.clear()
+            except Exception:
+                log_event("summary_refresh_failed", logging.ERROR, traceback=traceback.format_exc())
+            now = datetime.now(timezone.utc)
+            wait = min([POLL_INTERVAL] + [(at - now).total_seconds() for at in self.next_runs.values()])
+            self._stop.wait(max(wait, 1))
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.lock.release(get_storage_backend())
+        except Exception:
+            pass  # the lease expires on its own
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Start the in-process scheduler once per worker process (only the leader refreshes)."""
+    global _scheduler, _scheduler_pid
+    with _scheduler_lock:
+        if _scheduler is not None and _scheduler_pid == os.getpid():
+            return _scheduler
+        _scheduler, _scheduler_pid = RefreshScheduler(), os.getpid()
+        threading.Thread(target=_scheduler.run, name="summary-refresh", daemon=True).start()
+        return _scheduler
+
+
+if __name__ == "__main__":
+    RefreshScheduler().run()
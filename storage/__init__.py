@@ -1,14 +1,57 @@
 from .gcs_backend import GCSBackend
 from .firestore_backend import FirestoreBackend
+from .firestore_rows_backend import FirestoreRowsBackend
+from .local_backend import LocalBackend, ReplicatedBackend
 from storage.config import get_backend_type, set_backend_type
+from .portfolios import (DEFAULT_PORTFOLIO, is_valid_portfolio_id, list_portfolios, portfolio_filename,
+                         register_portfolio)
 import os
+import threading
+
+from config import Config
+
+BACKEND_TYPES = ("gcs", "firestore", "firestore_rows", "local")
+
+# Backends are stateless wrappers around the pooled clients, so one instance per
+# (type, bucket) is reused for the life of the worker.
+_backends = {}
+_backends_lock = threading.Lock()
+
+def get_backend(backend_type):
+    bucket_name = os.environ.get("BUCKET_NAME", "your-bucket-name")
+
+    key = (backend_type, bucket_name)
+    with _backends_lock:
+        if key not in _backends:
+            if backend_type == "firestore":
+                backend = FirestoreBackend()
+            elif backend_type == "firestore_rows":
+                backend = FirestoreRowsBackend()
+            elif backend_type == "local":
+                backend = LocalBackend(Config.LOCAL_STORAGE_PATH)
+            else:
+                backend = GCSBackend(bucket_name)
+            # Local write-through replica in front of the cloud object stores
+            if Config.LOCAL_REPLICA and backend_type in ("gcs", "firestore"):
+                backend = ReplicatedBackend(backend, LocalBackend(Config.LOCAL_REPLICA_PATH.format(backend=backend_type)))
+            _backends[key] = backend
+        return _backends[key]
 
 def get_storage_backend():
-    backend_type = get_backend_type()  # 🔄 use dynamic toggle from Firestore
+    return get_backend(get_backend_type())  # 🔄 use dynamic toggle from Firestore (cached)
 
-    if backend_type == "firestore":
-        return FirestoreBackend()
-    else:
-        bucket_name = os.environ.get("BUCKET_NAME", "your-bucket-name")
-        return GCSBackend(bucket_name)
+def migrate(source, target, filename):
+    """Copy a file's transactions from one backend to another; returns the number of rows copied."""
+    header, rows = source.load_csv(filename)
+    if not header:
+        return 0
+    target.save_csv(filename, header, rows)
+    return len(rows)
 
+def migrate_portfolios(source, target):
+    """`migrate` every portfolio and carry the registry over; returns the number of rows copied."""
+    copied = 0
+    for portfolio_id in list_portfolios(source):
+        copied += migrate(source, target, portfolio_filename(portfolio_id))
+        register_portfolio(target, portfolio_id)
+    return copied
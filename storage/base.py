@@ -1,14 +1,242 @@
 # storage/base.py
 
+import csv
+import io
+import json
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
+from config import Config
+from instrumentation import timed
+
+MANIFEST_SUFFIX = ".manifest"
+
+
+def encode_csv(header, rows):
+    output_buffer = io.StringIO()
+    writer = csv.writer(output_buffer)
+    if header:
+        writer.writerow(header)
+    for row in sorted(rows):
+        writer.writerow(row)
+    return output_buffer.getvalue().encode("utf-8")
+
+
+def decode_csv(data):
+    """Parse CSV bytes/text into (header, set of non-empty row tuples)."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    return read_csv(io.StringIO(data))
+
+
+def read_csv(stream):
+    """Like decode_csv, but reading row by row from a text stream (e.g. an open file)."""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    rows = set()
+    for row in reader:
+        if row and any(cell.strip() for cell in row):
+            rows.add(tuple(row))
+    return header, rows
+
+
+def widen_header(header, other):
+    """`header` followed by the columns of `other` it lacks, so no column is dropped."""
+    return list(header) + [column for column in other if column not in header]
+
+
+def remap_rows(rows, from_header, to_header):
+    """Reorder row cells from one header's column order to another's."""
+    if from_header == to_header:
+        return set(rows)
+    positions = [from_header.index(col) if col in from_header else None for col in to_header]
+    return {
+        tuple(row[i] if i is not None and i < len(row) else "" for i in positions)
+        for row in rows
+    }
+
 
 class StorageBackend(ABC):
+    """Transaction storage.
+
+    A file is an immutable base CSV plus immutable append segments, listed in a
+    small JSON manifest. Appends write a new segment and then add it to the
+    manifest with a compare-and-swap, so concurrent uploads never overwrite
+    each other. Once enough segments pile up they are compacted into a new base
+    in the background. Files written before manifests existed are read from
+    the backend's original single-file location (the "legacy" base).
+    """
+
+    # --- primitives each backend implements ---
+
     @abstractmethod
-    def load_csv(self, filename: str):
-        """Load CSV file and return header and a set of unique rows"""
+    def _load_legacy_csv(self, filename: str):
+        """Load the single-file CSV written before the segmented layout: (header, rows)"""
         pass
 
     @abstractmethod
-    def save_csv(self, filename: str, header, rows: set):
-        """Save header and rows to CSV file"""
+    def _legacy_exists(self, filename: str):
+        """Whether a single-file CSV exists for filename"""
+        pass
+
+    @abstractmethod
+    def load_object(self, name: str):
+        """Load bytes saved with save_object, or None if missing"""
+        pass
+
+    @abstractmethod
+    def save_object(self, name: str, data: bytes):
+        """Save derived data (computed state, indexes, segments) stored next to the CSV"""
+        pass
+
+    @abstractmethod
+    def delete_object(self, name: str):
+        """Delete an object saved with save_object (missing objects are ignored)"""
+        pass
+
+    @abstractmethod
+    def update_object(self, name: str, mutate):
+        """Atomically replace an object: mutate(current bytes or None) -> new bytes, or None to leave it.
+
+        Retries if another writer changed the object in between. Returns the bytes left in place.
+        """
         pass
+
+    # --- file API ---
+
+    @timed("load_csv")
+    def load_csv(self, filename: str):
+        """Load CSV file and return header and a set of unique rows"""
+        manifest = self._load_manifest(filename)
+        if manifest is None:
+            return self._load_legacy_csv(filename)
+        return self._read_layout(filename, manifest)
+
+    def save_csv(self, filename: str, header, rows: set):
+        """Replace the whole file with header and rows"""
+        base = self._new_name(filename, "base")
+        self.save_object(base, encode_csv(header, rows))
+
+        def mutate(current):
+            manifest = self._parse_manifest(current)
+            self._retire(manifest, [manifest["base"]] + manifest["segments"])
+            manifest.update(base=base, segments=[], version=uuid.uuid4().hex)
+            return json.dumps(manifest).encode("utf-8")
+
+        self.update_object(filename + MANIFEST_SUFFIX, mutate)
+
+    def append_rows(self, filename: str, header, rows):
+        """Add rows to the file without rewriting it.
+
+        Returns (new version, version replaced); the replaced version tells the
+        caller whether another write landed between its read and this append.
+        """
+        segment = self._new_name(filename, "seg")
+        self.save_object(segment, encode_csv(header, rows))
+        replaced = []
+
+        def mutate(current):
+            manifest = self._parse_manifest(current)
+            replaced[:] = [manifest["version"] if current else None]
+            manifest["segments"].append(segment)
+            manifest["version"] = uuid.uuid4().hex
+            return json.dumps(manifest).encode("utf-8")
+
+        manifest = json.loads(self.update_object(filename + MANIFEST_SUFFIX, mutate))
+        if len(manifest["segments"]) >= Config.SEGMENT_COMPACT_THRESHOLD:
+            threading.Thread(target=self.compact, args=(filename,), daemon=True).start()
+        return manifest["version"], replaced[0]
+
+    def get_version(self, filename: str):
+        """Return a token that changes whenever the file's rows change (None if it does not exist)"""
+        manifest = self._load_manifest(filename)
+        if manifest is not None:
+            return manifest["version"]
+        if not self._legacy_exists(filename):
+            return None
+        # First look at a file from before manifests: start tracking it
+        data = self.update_object(filename + MANIFEST_SUFFIX,
+                                  lambda current: current or json.dumps(self._parse_manifest(None)).encode("utf-8"))
+        return json.loads(data)["version"]
+
+    def compact(self, filename: str):
+        """Fold the current segments into a new base. Safe to run from several workers at once."""
+        manifest = self._load_manifest(filename)
+        if not manifest or not manifest["segments"]:
+            return
+        header, rows = self._read_layout(filename, manifest)
+        base = self._new_name(filename, "base")
+        self.save_object(base, encode_csv(header, rows))
+        folded = set(manifest["segments"])
+
+        def mutate(current):
+            latest = self._parse_manifest(current)
+            if latest["base"] != manifest["base"] or not folded <= set(latest["segments"]):
+                return None  # someone else compacted or rewrote the file first
+            self._retire(latest, [latest["base"]] + manifest["segments"])
+            latest["base"] = base
+            latest["segments"] = [s for s in latest["segments"] if s not in folded]
+            # Same rows, so the version (and everything derived from it) stays valid
+            return json.dumps(latest).encode("utf-8")
+
+        result = json.loads(self.update_object(filename + MANIFEST_SUFFIX, mutate))
+        if result["base"] != base:
+            self.delete_object(base)
+            return
+        self._collect_garbage(filename)
+
+    # --- helpers ---
+
+    def _new_name(self, filename, kind):
+        return f"{filename}.{kind}.{int(time.time())}.{uuid.uuid4().hex[:12]}"
+
+    def _parse_manifest(self, data):
+        if data:
+            return json.loads(data)
+        return {"version": uuid.uuid4().hex, "base": None, "segments": [], "garbage": []}
+
+    def _load_manifest(self, filename):
+        data = self.load_object(filename + MANIFEST_SUFFIX)
+        return json.loads(data) if data else None
+
+    def _retire(self, manifest, names):
+        # Readers holding the previous manifest may still be reading these, so
+        # they are only deleted after a grace period.
+        now = time.time()
+        manifest.setdefault("garbage", []).extend([name, now] for name in names if name)
+
+    def _collect_garbage(self, filename):
+        cutoff = time.time() - Config.SEGMENT_GC_GRACE
+        expired = []
+
+        def mutate(current):
+            manifest = self._parse_manifest(current)
+            expired[:] = [name for name, retired_at in manifest.get("garbage", []) if retired_at < cutoff]
+            if not expired:
+                return None
+            manifest["garbage"] = [entry for entry in manifest["garbage"] if entry[1] >= cutoff]
+            return json.dumps(manifest).encode("utf-8")
+
+        self.update_object(filename + MANIFEST_SUFFIX, mutate)
+        for name in expired:
+            self.delete_object(name)
+
+    def _read_layout(self, filename, manifest):
+        if manifest["base"]:
+            header, rows = decode_csv(self.load_object(manifest["base"]) or b"")
+        else:
+            header, rows = self._load_legacy_csv(filename)
+        for segment in manifest["segments"]:
+            seg_header, seg_rows = decode_csv(self.load_object(segment) or b"")
+            if not seg_header:
+                continue
+            if header is None:
+                header = seg_header
+            # A segment may bring columns the base lacks: widen rather than drop them
+            wider = widen_header(header, seg_header)
+            if wider != header:
+                rows = remap_rows(rows, header, wider)
+                header = wider
+            rows |= remap_rows(seg_rows, seg_header, header)
+        return header, rows
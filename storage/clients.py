@@ -0,0 +1,30 @@
+# storage/clients.py
+
+import os
+import threading
+from google.cloud import firestore, storage
+
+# One client per worker process. Clients hold gRPC channels / HTTP pools that
+# must not be shared across a fork, so the registry resets when the pid changes.
+_clients = {}
+_lock = threading.Lock()
+_pid = None
+
+
+def _get_client(name, factory):
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            _clients.clear()
+            _pid = os.getpid()
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_gcs_client():
+    return _get_client("gcs", storage.Client)
+
+
+def get_firestore_client():
+    return _get_client("firestore", firestore.Client)
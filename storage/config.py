@@ -1,17 +1,47 @@
 # storage/config.py
 
-from google.cloud import firestore
+import threading
+import time
+from config import Config
+from instrumentation import timed
+from .clients import get_firestore_client
 
 FIRESTORE_COLLECTION = "settings"
 FIRESTORE_DOC_ID = "storage_backend"
 
+# The setting rarely changes, so it is cached per process. Writes through
+# set_backend_type() invalidate it here; other workers pick it up after the TTL.
+_cached = {"value": None, "expires": 0.0}
+_cached_lock = threading.Lock()
+
+
+@timed("get_backend_type")
 def get_backend_type():
-    db = firestore.Client()
+    # Pinned by the environment (e.g. STORAGE_BACKEND=local for development without GCP)
+    if Config.STORAGE_BACKEND:
+        return Config.STORAGE_BACKEND
+
+    with _cached_lock:
+        if _cached["value"] is not None and time.monotonic() < _cached["expires"]:
+            return _cached["value"]
+
+    db = get_firestore_client()
     doc = db.collection(FIRESTORE_COLLECTION).document(FIRESTORE_DOC_ID).get()
-    if doc.exists:
-        return doc.to_dict().get("backend", "gcs")
-    return "gcs"  # default fallback
+    value = doc.to_dict().get("backend", "gcs") if doc.exists else "gcs"  # default fallback
+
+    with _cached_lock:
+        _cached["value"] = value
+        _cached["expires"] = time.monotonic() + Config.BACKEND_TYPE_TTL
+    return value
+
 
 def set_backend_type(value):
-    db = firestore.Client()
+    db = get_firestore_client()
     db.collection(FIRESTORE_COLLECTION).document(FIRESTORE_DOC_ID).set({"backend": value})
+    invalidate_backend_type()
+
+
+def invalidate_backend_type():
+    with _cached_lock:
+        _cached["value"] = None
+        _cached["expires"] = 0.0
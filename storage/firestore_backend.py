@@ -1,43 +1,99 @@
 # storage/firestore_backend.py
 
 import base64
-import csv
-import io
+import uuid
 from google.cloud import firestore
-from .base import StorageBackend
+from .base import StorageBackend, decode_csv
+from .clients import get_firestore_client
+
+# Objects larger than this are split over several documents, keeping each
+# well under Firestore's 1 MiB document limit
+MAX_PART_BYTES = 900_000
+
 
 class FirestoreBackend(StorageBackend):
-    def __init__(self):
-        self.db = firestore.Client()
+    """Objects are documents in the "objects" collection.
 
-    def load_csv(self, filename):
-        doc_ref = self.db.collection("csv_files").document(filename)
-        doc = doc_ref.get()
+    An object over MAX_PART_BYTES (a large snapshot, state or row-hash index)
+    is written as parts in the document's "parts" subcollection, each under a
+    fresh id, and the document then lists them; the previous parts are
+    deleted after the switch. update_object is meant for small coordination
+    objects (manifests, the portfolio registry) and always stores one document.
+    """
+
+    def __init__(self, client=None):
+        self.db = client or get_firestore_client()
+
+    def _load_legacy_csv(self, filename):
+        doc = self.db.collection("csv_files").document(filename).get()
+        if not doc.exists:
+            return None, set()
+        encoded_csv = doc.to_dict().get("content")
+        return decode_csv(base64.b64decode(encoded_csv))
+
+    def _legacy_exists(self, filename):
+        return self.db.collection("csv_files").document(filename).get().exists
+
+    def _parts(self, doc_ref):
+        return doc_ref.collection("parts")
 
-        existing_rows = set()
-        existing_header = None
+    def _delete_parts(self, doc_ref, part_ids):
+        parts = self._parts(doc_ref)
+        for part_id in part_ids:
+            parts.document(part_id).delete()
 
+    def load_object(self, name):
+        doc_ref = self.db.collection("objects").document(name)
+        # A second try covers a writer replacing the parts while we read them
+        for _ in range(2):
+            doc = doc_ref.get()
+            if not doc.exists:
+                return None
+            content = doc.to_dict()
+            if "parts" not in content:
+                return content.get("content")
+            parts = [self._parts(doc_ref).document(part_id).get() for part_id in content["parts"]]
+            if all(part.exists for part in parts):
+                return b"".join(part.to_dict()["content"] for part in parts)
+        return None
+
+    def save_object(self, name, data):
+        doc_ref = self.db.collection("objects").document(name)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        previous = doc_ref.get()
+        previous_parts = previous.to_dict().get("parts", []) if previous.exists else []
+        if len(data) <= MAX_PART_BYTES:
+            doc_ref.set({"content": data})
+        else:
+            prefix = uuid.uuid4().hex[:12]
+            part_ids = []
+            for i, start in enumerate(range(0, len(data), MAX_PART_BYTES)):
+                part_id = f"{prefix}-{i}"
+                self._parts(doc_ref).document(part_id).set({"content": data[start:start + MAX_PART_BYTES]})
+                part_ids.append(part_id)
+            doc_ref.set({"parts": part_ids})
+        self._delete_parts(doc_ref, previous_parts)
+
+    def delete_object(self, name):
+        doc_ref = self.db.collection("objects").document(name)
+        doc = doc_ref.get()
         if doc.exists:
-            data = doc.to_dict()
-            encoded_csv = data.get("content")
-            decoded = base64.b64decode(encoded_csv).decode("utf-8")
-            reader = csv.reader(io.StringIO(decoded))
-            existing_header = next(reader, None)
-            for row in reader:
-                if row and any(cell.strip() for cell in row):
-                    existing_rows.add(tuple(row))
-
-        return existing_header, existing_rows
-
-    def save_csv(self, filename, header, rows):
-        output_buffer = io.StringIO()
-        writer = csv.writer(output_buffer)
-        if header:
-            writer.writerow(header)
-        for row in sorted(rows):
-            writer.writerow(row)
-
-        encoded = base64.b64encode(output_buffer.getvalue().encode("utf-8")).decode("utf-8")
-        self.db.collection("csv_files").document(filename).set({
-            "content": encoded
-        })
+            self._delete_parts(doc_ref, doc.to_dict().get("parts", []))
+        doc_ref.delete()
+
+    def update_object(self, name, mutate):
+        doc_ref = self.db.collection("objects").document(name)
+
+        @firestore.transactional
+        def run(transaction):
+            doc = doc_ref.get(transaction=transaction)
+            current = doc.to_dict().get("content") if doc.exists else None
+            data = mutate(current)
+            if data is None:
+                return current
+            transaction.set(doc_ref, {"content": data})
+            return data
+
+        # Firestore retries the transaction itself when the document changes underneath
+        return run(self.db.transaction())
@@ -0,0 +1,119 @@
+# storage/firestore_rows_backend.py
+
+import hashlib
+import uuid
+from datetime import datetime
+from google.cloud import firestore
+from google.cloud.firestore_v1 import FieldFilter
+from instrumentation import timed
+from .base import remap_rows, widen_header
+from .firestore_backend import FirestoreBackend
+
+BATCH_SIZE = 500  # Firestore's limit on writes per batch
+
+
+def row_id(row):
+    """Document id for a row: a hash of its content, so the same row is only ever stored once."""
+    return hashlib.sha256("\x1f".join(row).encode("utf-8")).hexdigest()[:32]
+
+
+class FirestoreRowsBackend(FirestoreBackend):
+    """One Firestore document per transaction, under portfolios/<filename>/transactions.
+
+    Unlike FirestoreBackend there is no single CSV document, so a file is not
+    bound by Firestore's 1 MiB document limit and reads can be filtered by
+    scheme or date. The parent document holds the header and the version.
+    Filtering by scheme and date together needs a composite index on
+    (scheme_code, day).
+
+    An append with new columns widens the stored header at the end, so rows
+    stored before it are read back padded with empty cells.
+    """
+
+    def _file_ref(self, filename):
+        return self.db.collection("portfolios").document(filename)
+
+    def _rows_ref(self, filename):
+        return self._file_ref(filename).collection("transactions")
+
+    def _meta(self, filename):
+        doc = self._file_ref(filename).get()
+        return doc.to_dict() if doc.exists else None
+
+    @timed("load_csv")
+    def load_csv(self, filename):
+        meta = self._meta(filename)
+        if meta is None:
+            return None, set()
+        return meta["header"], set(self.stream_rows(filename))
+
+    def stream_rows(self, filename, scheme_code=None, start=None, end=None):
+        """Yield row tuples, optionally only one scheme's and/or within [start, end] (dates)."""
+        meta = self._meta(filename)
+        width = len(meta["header"]) if meta else 0
+        query = self._rows_ref(filename)
+        if scheme_code is not None:
+            query = query.where(filter=FieldFilter("scheme_code", "==", scheme_code))
+        if start is not None:
+            query = query.where(filter=FieldFilter("day", ">=", start.toordinal()))
+        if end is not None:
+            query = query.where(filter=FieldFilter("day", "<=", end.toordinal()))
+        for doc in query.select(["row"]).stream():
+            row = doc.get("row")
+            yield tuple(row) + ("",) * (width - len(row))
+
+    def append_rows(self, filename, header, rows):
+        meta = self._meta(filename)
+        stored_header = widen_header(meta["header"], header) if meta else list(header)
+        rows = list(remap_rows(rows, list(header), stored_header))
+        code_idx = stored_header.index("scheme_code")
+        date_idx = stored_header.index("date")
+        rows_ref = self._rows_ref(filename)
+
+        def to_doc(row):
+            try:
+                day = datetime.strptime(row[date_idx], "%d-%m-%Y").toordinal()
+            except ValueError:
+                day = None
+            return {"row": list(row), "scheme_code": row[code_idx].strip(), "day": day}
+
+        chunk = BATCH_SIZE
+        for start in range(0, len(rows), chunk):
+            batch = self.db.batch()
+            for row in rows[start:start + chunk]:
+                batch.set(rows_ref.document(row_id(row)), to_doc(row))
+            batch.commit()
+
+        # The version is bumped only once every row is written, so readers never
+        # cache a partially written upload under the new version.
+        version = uuid.uuid4().hex
+        file_ref = self._file_ref(filename)
+
+        @firestore.transactional
+        def bump(transaction):
+            doc = file_ref.get(transaction=transaction)
+            replaced = doc.to_dict().get("version") if doc.exists else None
+            transaction.set(file_ref, {"header": stored_header, "version": version}, merge=True)
+            return replaced
+
+        return version, bump(self.db.transaction())
+
+    def save_csv(self, filename, header, rows):
+        stored_header = list(header)
+        keep = {row_id(row) for row in rows}
+        stale = [doc.reference for doc in self._rows_ref(filename).select([]).stream() if doc.id not in keep]
+        for start in range(0, len(stale), BATCH_SIZE):
+            batch = self.db.batch()
+            for ref in stale[start:start + BATCH_SIZE]:
+                batch.delete(ref)
+            batch.commit()
+        # A full rewrite defines the header, so drop the old one first
+        self._file_ref(filename).set({"header": stored_header}, merge=True)
+        self.append_rows(filename, stored_header, rows)
+
+    def get_version(self, filename):
+        meta = self._meta(filename)
+        return meta.get("version") if meta else None
+
+    def compact(self, filename):
+        pass  # rows are individual documents; there is nothing to fold
@@ -1,37 +1,51 @@
 # storage/gcs_backend.py
 
-import csv
-import io
-from google.cloud import storage
-from .base import StorageBackend
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from .base import StorageBackend, decode_csv
+from .clients import get_gcs_client
 
 class GCSBackend(StorageBackend):
-    def __init__(self, bucket_name):
-        self.client = storage.Client()
+    def __init__(self, bucket_name, client=None):
+        self.client = client or get_gcs_client()
         self.bucket = self.client.bucket(bucket_name)
 
-    def load_csv(self, filename):
+    def _load_legacy_csv(self, filename):
         blob = self.bucket.blob(filename)
-        existing_rows = set()
-        existing_header = None
-
-        if blob.exists():
-            content = blob.download_as_text()
-            reader = csv.reader(io.StringIO(content))
-            existing_header = next(reader, None)
-            for row in reader:
-                if row and any(cell.strip() for cell in row):
-                    existing_rows.add(tuple(row))
-
-        return existing_header, existing_rows
-
-    def save_csv(self, filename, header, rows):
-        output_buffer = io.StringIO()
-        writer = csv.writer(output_buffer)
-        if header:
-            writer.writerow(header)
-        for row in sorted(rows):
-            writer.writerow(row)
+        if not blob.exists():
+            return None, set()
+        return decode_csv(blob.download_as_text())
 
-        blob = self.bucket.blob(filename)
-        blob.upload_from_string(output_buffer.getvalue(), content_type="text/csv")
+    def _legacy_exists(self, filename):
+        return self.bucket.blob(filename).exists()
+
+    def load_object(self, name):
+        try:
+            return self.bucket.blob(name).download_as_bytes()
+        except NotFound:
+            return None
+
+    def save_object(self, name, data):
+        blob = self.bucket.blob(name)
+        blob.upload_from_string(data, content_type="application/octet-stream")
+
+    def delete_object(self, name):
+        try:
+            self.bucket.blob(name).delete()
+        except NotFound:
+            pass
+
+    def update_object(self, name, mutate, retries=20):
+        for _ in range(retries):
+            blob = self.bucket.get_blob(name)
+            generation = blob.generation if blob else 0  # 0 = only if it does not exist yet
+            try:
+                current = blob.download_as_bytes(if_generation_match=generation) if blob else None
+                data = mutate(current)
+                if data is None:
+                    return current
+                self.bucket.blob(name).upload_from_string(
+                    data, content_type="application/json", if_generation_match=generation)
+                return data
+            except (PreconditionFailed, NotFound):
+                continue  # lost the race, read again
+        raise RuntimeError(f"Could not update {name}: too much contention")
@@ -0,0 +1,167 @@
+# storage/local_backend.py
+
+import os
+import sqlite3
+import threading
+import time
+
+from config import Config
+from .base import MANIFEST_SUFFIX, StorageBackend, read_csv
+from .portfolios import REGISTRY_OBJECT
+
+
+class LocalBackend(StorageBackend):
+    """Every object in one SQLite database on local disk; no cloud services needed.
+
+    Objects live in a table keyed (and indexed) by name, read through
+    SQLite's memory-mapped I/O, and update_object is a compare-and-swap
+    under a write lock, so every worker on the host can share the file.
+    A plain CSV named <filename> in the same directory as the database file
+    (LOCAL_STORAGE_PATH) is picked up as the legacy base, which makes it
+    easy to seed a development instance.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    name TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA mmap_size={int(Config.LOCAL_STORAGE_MMAP_SIZE)}")
+            self._local.conn = conn
+        return conn
+
+    def _legacy_path(self, filename):
+        return os.path.join(os.path.dirname(self.path) or ".", filename)
+
+    def _load_legacy_csv(self, filename):
+        path = self._legacy_path(filename)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None, set()
+        # Parsed straight from the file: no copy of the whole CSV is held in memory
+        with open(path, newline="", encoding="utf-8") as f:
+            return read_csv(f)
+
+    def _legacy_exists(self, filename):
+        return os.path.exists(self._legacy_path(filename))
+
+    def load_object(self, name):
+        row = self._connect().execute("SELECT data FROM objects WHERE name = ?", (name,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def save_object(self, name, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._connect().execute(
+            "INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", (name, data, time.time()))
+
+    def delete_object(self, name):
+        self._connect().execute("DELETE FROM objects WHERE name = ?", (name,))
+
+    def update_object(self, name, mutate):
+        conn = self._connect()
+        # BEGIN IMMEDIATE takes the write lock up front, so no other writer can
+        # change the object between the read and the write
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM objects WHERE name = ?", (name,)).fetchone()
+            current = bytes(row[0]) if row else None
+            data = mutate(current)
+            if data is None:
+                conn.execute("COMMIT")
+                return current
+            conn.execute("INSERT OR REPLACE INTO objects VALUES (?, ?, ?)", (name, data, time.time()))
+            conn.execute("COMMIT")
+            return data
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class ReplicatedBackend(StorageBackend):
+    """A cloud backend with a local write-through replica in front of it.
+
+    Writes go to the primary first and then to the replica. Reads are served
+    from the replica: segments and bases never change once written, and
+    derived objects (snapshots, states, summaries, row-hash indexes) record
+    the file version they belong to, so a stale copy is detected and rebuilt
+    by its reader. Only manifests and the portfolio registry change in place
+    under other writers; they are re-read from the primary once they are
+    LOCAL_REPLICA_TTL seconds old. A warm instance therefore reads nothing
+    remotely except those small objects, at most once per TTL.
+
+    Works with the backends that use the shared object layout (gcs and
+    firestore), not firestore_rows, which keeps its rows in documents.
+    """
+
+    def __init__(self, primary, replica, ttl=None):
+        self.primary = primary
+        self.replica = replica
+        self.ttl = Config.LOCAL_REPLICA_TTL if ttl is None else ttl
+        self._checked = {}  # coordination object name -> time.monotonic() of the last primary read
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _changes_in_place(name):
+        return name.endswith(MANIFEST_SUFFIX) or name == REGISTRY_OBJECT
+
+    def _mark_checked(self, name):
+        with self._lock:
+            self._checked[name] = time.monotonic()
+
+    def _is_fresh(self, name):
+        with self._lock:
+            checked = self._checked.get(name)
+        return checked is not None and time.monotonic() - checked < self.ttl
+
+    def _load_legacy_csv(self, filename):
+        return self.primary._load_legacy_csv(filename)
+
+    def _legacy_exists(self, filename):
+        return self.primary._legacy_exists(filename)
+
+    def load_object(self, name):
+        if self._changes_in_place(name):
+            if self._is_fresh(name):
+                return self.replica.load_object(name)
+            data = self.primary.load_object(name)
+            if data is None:
+                self.replica.delete_object(name)
+            else:
+                self.replica.save_object(name, data)
+            self._mark_checked(name)
+            return data
+
+        data = self.replica.load_object(name)
+        if data is None:
+            data = self.primary.load_object(name)
+            if data is not None:
+                self.replica.save_object(name, data)
+        return data
+
+    def save_object(self, name, data):
+        self.primary.save_object(name, data)
+        self.replica.save_object(name, data)
+
+    def delete_object(self, name):
+        self.primary.delete_object(name)
+        self.replica.delete_object(name)
+
+    def update_object(self, name, mutate):
+        # The primary arbitrates between writers; the replica takes whatever won
+        data = self.primary.update_object(name, mutate)
+        if data is not None:
+            self.replica.save_object(name, data)
+            self._mark_checked(name)
+        return data
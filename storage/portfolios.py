@@ -0,0 +1,54 @@
+# storage/portfolios.py
+"""Portfolio partitions.
+
+Each portfolio is its own transaction file, so its manifest, segments,
+columnar snapshot, computed states and summary (all stored next to the file
+under its name) are separate from every other portfolio's. The default
+portfolio keeps the original CSV_FILENAME, so existing data needs no
+migration. The ids of the other portfolios are kept in a small registry
+object, updated with the same compare-and-swap as manifests.
+"""
+import json
+import re
+
+from config import Config
+
+DEFAULT_PORTFOLIO = "default"
+REGISTRY_OBJECT = "portfolios.json"
+
+_PORTFOLIO_ID = re.compile(r"[a-z0-9][a-z0-9_-]{0,62}")
+
+
+def is_valid_portfolio_id(portfolio_id):
+    return bool(portfolio_id) and _PORTFOLIO_ID.fullmatch(portfolio_id) is not None
+
+
+def portfolio_filename(portfolio_id):
+    if portfolio_id == DEFAULT_PORTFOLIO:
+        return Config.CSV_FILENAME
+    if not is_valid_portfolio_id(portfolio_id):
+        raise ValueError(f"Invalid portfolio id: {portfolio_id!r}")
+    # No "/" in the name: Firestore document ids cannot contain one
+    return f"{portfolio_id}.{Config.CSV_FILENAME}"
+
+
+def list_portfolios(backend):
+    """Ids of every portfolio in `backend`, the default one first."""
+    data = backend.load_object(REGISTRY_OBJECT)
+    ids = set(json.loads(data)) if data else set()
+    return [DEFAULT_PORTFOLIO] + sorted(ids - {DEFAULT_PORTFOLIO})
+
+
+def register_portfolio(backend, portfolio_id):
+    """Add a portfolio to the registry (a no-op if it is already there)."""
+    if portfolio_id == DEFAULT_PORTFOLIO:
+        return
+
+    def mutate(current):
+        ids = set(json.loads(current)) if current else set()
+        if portfolio_id in ids:
+            return None
+        return json.dumps(sorted(ids | {portfolio_id})).encode("utf-8")
+
+    backend.update_object(REGISTRY_OBJECT, mutate)
+
@@ -0,0 +1,212 @@
+# testing/fakes.py
+"""In-memory stand-ins for the GCS and Firestore clients.
+
+They implement only what the storage backends call, with the same
+semantics where it matters (blob generations and preconditions, merge
+writes, query filters), so backend code runs unchanged and offline.
+Shared by the tests and the benchmarks.
+"""
+import itertools
+import operator
+import os
+
+from google.api_core.exceptions import NotFound, PreconditionFailed
+from google.cloud import firestore
+
+_generations = itertools.count(1)
+
+
+class FakeBlob:
+    def __init__(self, bucket, name, generation=None):
+        self.bucket = bucket
+        self.name = name
+        self.generation = generation
+
+    def exists(self):
+        return self.name in self.bucket.objects
+
+    def download_as_bytes(self, if_generation_match=None, **kwargs):
+        if self.name not in self.bucket.objects:
+            raise NotFound(self.name)
+        data, generation = self.bucket.objects[self.name]
+        if if_generation_match is not None and generation != if_generation_match:
+            raise PreconditionFailed(self.name)
+        return data
+
+    def download_as_text(self, **kwargs):
+        return self.download_as_bytes(**kwargs).decode("utf-8")
+
+    def upload_from_string(self, data, content_type=None, if_generation_match=None, **kwargs):
+        current = self.bucket.objects.get(self.name, (None, 0))[1]
+        if if_generation_match is not None and current != if_generation_match:
+            raise PreconditionFailed(self.name)
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bucket.objects[self.name] = (bytes(data), next(_generations))
+
+    def delete(self):
+        if self.bucket.objects.pop(self.name, None) is None:
+            raise NotFound(self.name)
+
+
+class FakeBucket:
+    def __init__(self, name):
+        self.name = name
+        self.objects = {}  # name -> (bytes, generation)
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+    def get_blob(self, name):
+        if name not in self.objects:
+            return None
+        return FakeBlob(self, name, self.objects[name][1])
+
+    def list_blobs(self, prefix=""):
+        return [FakeBlob(self, name, generation) for name, (_, generation) in sorted(self.objects.items())
+                if name.startswith(prefix)]
+
+
+class FakeGCSClient:
+    def __init__(self):
+        self.buckets = {}
+
+    def bucket(self, name):
+        return self.buckets.setdefault(name, FakeBucket(name))
+
+
+_OPS = {"==": operator.eq, ">=": operator.ge, "<=": operator.le, "<": operator.lt, ">": operator.gt}
+
+
+class FakeSnapshot:
+    def __init__(self, db, path):
+        self._data = db.docs.get(path)
+        self.id = path.rsplit("/", 1)[-1]
+        self.reference = FakeDocument(db, path)
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data[field]
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def get(self, transaction=None, **kwargs):
+        return FakeSnapshot(self.db, self.path)
+
+    def set(self, data, merge=False):
+        if merge:
+            self.db.docs.setdefault(self.path, {}).update(data)
+        else:
+            self.db.docs[self.path] = dict(data)
+
+    def delete(self):
+        self.db.docs.pop(self.path, None)
+
+    def collection(self, name):
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+
+class FakeCollection:
+    def __init__(self, db, path, filters=()):
+        self.db = db
+        self.path = path
+        self.filters = list(filters)
+
+    def document(self, doc_id):
+        return FakeDocument(self.db, f"{self.path}/{doc_id}")
+
+    def where(self, filter=None, **kwargs):
+        return FakeCollection(self.db, self.path, self.filters + [filter])
+
+    def select(self, fields):
+        return self
+
+    def order_by(self, *args, **kwargs):
+        return self
+
+    def stream(self):
+        prefix = self.path + "/"
+        for path in sorted(self.db.docs):
+            if not path.startswith(prefix) or "/" in path[len(prefix):]:
+                continue
+            data = self.db.docs[path]
+            if all(_OPS[f.op_string](data.get(f.field_path), f.value) for f in self.filters):
+                yield FakeSnapshot(self.db, path)
+
+
+class FakeBatch:
+    def __init__(self):
+        self.writes = []
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(lambda: ref.set(data, merge=merge))
+
+    def delete(self, ref):
+        self.writes.append(ref.delete)
+
+    def commit(self):
+        for write in self.writes:
+            write()
+
+
+class FakeTransaction:
+    def set(self, ref, data, merge=False):
+        ref.set(data, merge=merge)
+
+
+class FakeFirestoreClient:
+    def __init__(self):
+        self.docs = {}  # "collection/doc[/collection/doc...]" -> dict
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch()
+
+    def transaction(self):
+        return FakeTransaction()
+
+
+_real_transactional = firestore.transactional
+
+
+def _reset_clients(clients_by_name):
+    from storage import clients
+    import storage
+
+    with clients._lock:
+        clients._pid = os.getpid()
+        clients._clients.clear()
+        clients._clients.update(clients_by_name)
+    with storage._backends_lock:
+        storage._backends.clear()
+
+
+def install():
+    """Route storage.clients to fresh fakes; returns (gcs_client, firestore_client).
+
+    The backends wrap transactions in firestore.transactional, which needs a
+    real client, so it is replaced by a plain call until `uninstall`.
+    """
+    gcs, db = FakeGCSClient(), FakeFirestoreClient()
+    _reset_clients({"gcs": gcs, "firestore": db})
+    firestore.transactional = lambda func: func
+    return gcs, db
+
+
+def uninstall():
+    """Undo `install`: real clients are created again on next use."""
+    _reset_clients({})
+    firestore.transactional = _real_transactional
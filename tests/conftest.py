@@ -0,0 +1,15 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def fake_clients():
+    """Fresh in-memory GCS and Firestore clients behind storage.clients: (gcs, firestore)."""
+    from testing import fakes
+    yield fakes.install()
+    fakes.uninstall()
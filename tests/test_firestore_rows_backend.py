@@ -0,0 +1,117 @@
+# tests/test_firestore_rows_backend.py
+from datetime import date
+
+import pytest
+
+from storage import FirestoreRowsBackend, GCSBackend, migrate
+from storage.firestore_rows_backend import row_id
+
+HEADER = ["date", "scheme_code", "scheme_name", "nav", "units", "type", "asset_type"]
+ROWS = {
+    ("15-01-2023", "100", "Fund A", "10", "5", "buy", "mutual_fund"),
+    ("05-02-2023", "100", "Fund A", "12", "5", "buy", "mutual_fund"),
+    ("01-03-2024", "200", "Fund B", "30", "2", "buy", "mutual_fund"),
+}
+
+
+@pytest.fixture
+def backend(fake_clients):
+    return FirestoreRowsBackend()
+
+
+def stored_docs(db, filename):
+    prefix = f"portfolios/{filename}/transactions/"
+    return {path: doc for path, doc in db.docs.items() if path.startswith(prefix)}
+
+
+def test_append_rows_stores_one_document_per_row(backend, fake_clients):
+    _, db = fake_clients
+    version, replaced = backend.append_rows("t.csv", HEADER, ROWS)
+
+    assert replaced is None
+    assert version == backend.get_version("t.csv")
+    assert backend.load_csv("t.csv") == (HEADER, ROWS)
+    docs = stored_docs(db, "t.csv")
+    assert len(docs) == len(ROWS)
+    row = ("15-01-2023", "100", "Fund A", "10", "5", "buy", "mutual_fund")
+    doc = docs[f"portfolios/t.csv/transactions/{row_id(row)}"]
+    assert doc["scheme_code"] == "100"
+    assert doc["day"] == date(2023, 1, 15).toordinal()
+
+
+def test_append_rows_reports_the_replaced_version(backend):
+    first, _ = backend.append_rows("t.csv", HEADER, ROWS)
+    second, replaced = backend.append_rows("t.csv", HEADER, {("02-04-2024", "200", "Fund B", "31", "1", "sell", "mutual_fund")})
+
+    assert replaced == first
+    assert second != first
+    assert len(backend.load_csv("t.csv")[1]) == len(ROWS) + 1
+
+
+def test_append_rows_remaps_columns_to_the_stored_header(backend):
+    backend.append_rows("t.csv", HEADER, ROWS)
+    reordered = ["scheme_code", "date", "scheme_name", "nav", "units", "type", "asset_type"]
+    backend.append_rows("t.csv", reordered, {("300", "10-10-2024", "Fund C", "7", "3", "buy", "mutual_fund")})
+
+    header, rows = backend.load_csv("t.csv")
+    assert header == HEADER
+    assert ("10-10-2024", "300", "Fund C", "7", "3", "buy", "mutual_fund") in rows
+
+
+def test_duplicate_rows_are_stored_once(backend, fake_clients):
+    _, db = fake_clients
+    backend.append_rows("t.csv", HEADER, ROWS)
+    backend.append_rows("t.csv", HEADER, ROWS)
+
+    assert len(stored_docs(db, "t.csv")) == len(ROWS)
+    assert backend.load_csv("t.csv") == (HEADER, ROWS)
+
+
+def test_stream_rows_filters_by_scheme_and_date(backend):
+    backend.append_rows("t.csv", HEADER, ROWS)
+
+    assert {row[1] for row in backend.stream_rows("t.csv", scheme_code="200")} == {"200"}
+    in_2023 = set(backend.stream_rows("t.csv", start=date(2023, 1, 1), end=date(2023, 12, 31)))
+    assert {row[0] for row in in_2023} == {"15-01-2023", "05-02-2023"}
+    assert set(backend.stream_rows("t.csv", scheme_code="100", start=date(2023, 2, 1))) == {
+        ("05-02-2023", "100", "Fund A", "12", "5", "buy", "mutual_fund")}
+    assert set(backend.stream_rows("t.csv", scheme_code="missing")) == set()
+
+
+def test_save_csv_replaces_rows_and_header(backend, fake_clients):
+    _, db = fake_clients
+    backend.append_rows("t.csv", HEADER, ROWS)
+    version = backend.get_version("t.csv")
+    header = HEADER[:5]
+    rows = {("01-01-2025", "400", "Fund D", "5", "1")}
+    backend.save_csv("t.csv", header, rows)
+
+    assert backend.load_csv("t.csv") == (header, rows)
+    assert len(stored_docs(db, "t.csv")) == 1
+    assert backend.get_version("t.csv") != version
+
+
+def test_missing_file(backend):
+    assert backend.load_csv("missing.csv") == (None, set())
+    assert backend.get_version("missing.csv") is None
+
+
+def test_migrate_from_gcs(fake_clients):
+    source, target = GCSBackend("bucket"), FirestoreRowsBackend()
+    source.save_csv("t.csv", HEADER, ROWS)
+
+    assert migrate(source, target, "t.csv") == len(ROWS)
+    assert target.load_csv("t.csv") == (HEADER, ROWS)
+    assert migrate(target, GCSBackend("other"), "t.csv") == len(ROWS)
+    assert GCSBackend("other").load_csv("t.csv") == (HEADER, ROWS)
+
+
+def test_append_rows_widens_the_stored_header(backend):
+    header = HEADER[:5]
+    backend.append_rows("t.csv", header, {("15-01-2023", "100", "Fund A", "10", "5")})
+    backend.append_rows("t.csv", HEADER, {("02-04-2024", "100", "Fund A", "12", "2", "sell", "mutual_fund")})
+
+    assert backend.load_csv("t.csv") == (HEADER, {
+        ("15-01-2023", "100", "Fund A", "10", "5", "", ""),
+        ("02-04-2024", "100", "Fund A", "12", "2", "sell", "mutual_fund"),
+    })
@@ -0,0 +1,94 @@
+# tests/test_ingest.py
+import io
+
+import numpy as np
+import pytest
+
+from portfolio.ingest import ROWHASH_SUFFIX, RowHashIndex, fingerprint, ingest_csv
+from portfolio.transactions import TransactionSet, TransactionType
+from storage import LocalBackend
+
+
+HEADER = ["date", "scheme_code", "scheme_name", "nav", "units", "type", "asset_type"]
+ROW = ("15-01-2023", "100", "Fund A", "100", "5", "buy", "mutual_fund")
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.Config.SNAPSHOT_CACHE_DIR", str(tmp_path / "snapshots"))
+    return LocalBackend(str(tmp_path / "portfolio.db"))
+
+
+def upload(backend, text):
+    return ingest_csv(backend, "t.csv", io.StringIO(text), "fifo")
+
+
+def test_upload_with_a_new_column_widens_the_stored_header(backend):
+    upload(backend, "date,scheme_code,scheme_name,nav,units\n15-01-2023,100,Fund A,10,5\n")
+    report = upload(backend, "date,scheme_code,scheme_name,nav,units,type\n02-04-2024,100,Fund A,12,2,sell\n")
+
+    assert report.accepted == 1
+    header, rows = backend.load_csv("t.csv")
+    assert header == ["date", "scheme_code", "scheme_name", "nav", "units", "asset_type", "type"]
+    assert ("02-04-2024", "100", "Fund A", "12", "2", "mutual_fund", "sell") in rows
+    assert ("15-01-2023", "100", "Fund A", "10", "5", "mutual_fund", "") in rows
+    types = [txn.type for txn in TransactionSet.load(backend, "t.csv").by_scheme()["100"]]
+    assert types == [TransactionType.BUY, TransactionType.SELL]
+
+
+def test_rows_without_a_type_column_dedup_against_explicit_buys(backend):
+    upload(backend, "date,scheme_code,scheme_name,nav,units\n15-01-2023,100,Fund A,10,5\n")
+    report = upload(backend, "date,scheme_code,scheme_name,nav,units,type\n15-01-2023,100,Fund A,10,5,buy\n")
+
+    assert report.accepted == 0
+    assert report.duplicates == 1
+
+
+@pytest.mark.parametrize("header, row", [
+    (HEADER, ("15-01-2023", "100", "Fund A", "100.0", "5.00", "BUY", "mutual_fund")),
+    (HEADER, (" 15-01-2023", "100 ", "Fund A", "1e2", "5", "buy", "")),
+    (HEADER[:5], ROW[:5]),
+    (list(reversed(HEADER)), tuple(reversed(ROW))),
+    (HEADER + ["note"], ROW + ("",)),
+])
+def test_equivalent_rows_share_a_fingerprint(header, row):
+    assert fingerprint(header, row) == fingerprint(HEADER, ROW)
+
+
+@pytest.mark.parametrize("column, value", [("nav", "100.5"), ("units", "6"), ("type", "sell"), ("date", "16-01-2023")])
+def test_different_rows_have_different_fingerprints(column, value):
+    row = tuple(value if name == column else cell for name, cell in zip(HEADER, ROW))
+    assert fingerprint(HEADER, row) != fingerprint(HEADER, ROW)
+
+
+def test_reuploads_in_another_layout_are_duplicates(backend):
+    upload(backend, "date,scheme_code,scheme_name,nav,units\n15-01-2023,100,Fund A,100,5\n")
+    report = upload(backend, "scheme_code,units,nav,note,date,scheme_name\n100,5.0,100.0,,15-01-2023,Fund A\n")
+
+    assert (report.accepted, report.duplicates) == (0, 1)
+    assert len(backend.load_csv("t.csv")[1]) == 1
+
+
+def test_stale_index_is_rebuilt_from_the_file(backend):
+    upload(backend, "date,scheme_code,scheme_name,nav,units\n15-01-2023,100,Fund A,100,5\n")
+    # Written behind the index's back, so the saved index is for an older version
+    backend.append_rows("t.csv", backend.load_csv("t.csv")[0], {("16-01-2023", "100", "Fund A", "101", "5", "mutual_fund")})
+
+    index = RowHashIndex.load(backend, "t.csv")
+    assert index.version == backend.get_version("t.csv")
+    assert len(index.hashes) == 2
+    report = upload(backend, "date,scheme_code,scheme_name,nav,units\n16-01-2023,100,Fund A,101,5\n")
+    assert (report.accepted, report.duplicates) == (0, 1)
+
+
+def test_index_in_an_older_format_is_rebuilt(backend):
+    upload(backend, "date,scheme_code,scheme_name,nav,units\n15-01-2023,100,Fund A,100,5\n")
+    version = backend.get_version("t.csv")
+    buffer = io.BytesIO()
+    np.savez(buffer, header=np.array(HEADER[:5]), hashes=np.array([], dtype=np.uint64),
+             version=np.array(version), format=np.array(2))
+    backend.save_object("t.csv" + ROWHASH_SUFFIX, buffer.getvalue())
+
+    assert len(RowHashIndex.load(backend, "t.csv").hashes) == 1
+    report = upload(backend, "date,scheme_code,scheme_name,nav,units\n15-01-2023,100,Fund A,100,5\n")
+    assert (report.accepted, report.duplicates) == (0, 1)
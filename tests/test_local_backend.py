@@ -0,0 +1,28 @@
+# tests/test_local_backend.py
+import pytest
+
+from storage import LocalBackend
+
+HEADER = ["date", "scheme_code", "scheme_name", "nav", "units"]
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return LocalBackend(str(tmp_path / "storage.sqlite3"))
+
+
+def test_legacy_csv_next_to_the_database_is_the_base(backend, tmp_path):
+    (tmp_path / "t.csv").write_text('date,scheme_code,scheme_name,nav,units\n'
+                                    '15-01-2023,100,"Fund, A",10.50,5\n\n', encoding="utf-8")
+    backend.append_rows("t.csv", HEADER, {("01-03-2024", "200", "Fund B", "30", "2")})
+
+    assert backend.load_csv("t.csv") == (HEADER, {
+        ("15-01-2023", "100", "Fund, A", "10.50", "5"),
+        ("01-03-2024", "200", "Fund B", "30", "2"),
+    })
+
+
+def test_empty_legacy_csv_is_ignored(backend, tmp_path):
+    (tmp_path / "t.csv").write_bytes(b"")
+
+    assert backend.load_csv("t.csv") == (None, set())
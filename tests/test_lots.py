@@ -0,0 +1,75 @@
+# tests/test_lots.py
+import pytest
+
+from portfolio import AVERAGE, FIFO, LIFO, LotLedger
+
+
+def ledger_with_two_lots(method):
+    """10 units at 10 on day 1, 10 units at 20 on day 2."""
+    ledger = LotLedger(method)
+    ledger.buy(1, 10, 10.0)
+    ledger.buy(2, 10, 20.0)
+    return ledger
+
+
+def summary(gains):
+    return [(g.buy_date, g.sell_date, g.units, g.cost_nav, g.sell_nav, g.gain, g.holding_days) for g in gains]
+
+
+@pytest.mark.parametrize("method, gains, realized, units, cost, open_lots", [
+    # FIFO: all of the day-1 lot, then 5 of the day-2 lot
+    (FIFO, [(1, 5, 10, 10.0, 30.0, 200.0, 4), (2, 5, 5, 20.0, 30.0, 50.0, 3)], 250.0, 5, 100.0, [(2, 5, 20.0)]),
+    # LIFO: all of the day-2 lot, then 5 of the day-1 lot
+    (LIFO, [(2, 5, 10, 20.0, 30.0, 100.0, 3), (1, 5, 5, 10.0, 30.0, 100.0, 4)], 200.0, 5, 50.0, [(1, 5, 10.0)]),
+    # AVERAGE: lots drawn oldest first, each at the average cost of 15
+    (AVERAGE, [(1, 5, 10, 15.0, 30.0, 150.0, 4), (2, 5, 5, 15.0, 30.0, 75.0, 3)], 225.0, 5, 75.0, [(2, 5, 20.0)]),
+])
+def test_partial_lot_sell(method, gains, realized, units, cost, open_lots):
+    ledger = ledger_with_two_lots(method)
+    new_gains = ledger.sell(5, 15, 30.0)
+
+    assert summary(new_gains) == gains
+    assert ledger.gains == new_gains
+    assert ledger.realized == pytest.approx(realized)
+    assert ledger.units == units
+    assert ledger.cost == pytest.approx(cost)
+    assert [(lot.date, lot.units, lot.nav) for lot in ledger.lots] == open_lots
+
+
+@pytest.mark.parametrize("method", [FIFO, LIFO, AVERAGE])
+def test_oversell_matches_only_the_units_held(method):
+    ledger = ledger_with_two_lots(method)
+    gains = ledger.sell(3, 25, 25.0)
+
+    assert sum(g.units for g in gains) == 20
+    # Every method realizes proceeds minus total cost: 20 * 25 - (100 + 200)
+    assert ledger.realized == pytest.approx(200.0)
+    assert (ledger.units, ledger.cost, len(ledger.lots)) == (0.0, 0.0, 0)
+
+    ledger.buy(4, 2, 30.0)
+    assert (ledger.units, ledger.cost) == (2, 60.0)
+
+
+def test_sell_with_nothing_held_records_nothing():
+    ledger = LotLedger(FIFO)
+
+    assert ledger.sell(1, 5, 10.0) == []
+    assert (ledger.units, ledger.cost, ledger.realized) == (0.0, 0.0, 0.0)
+
+
+def test_average_cost_follows_buys_between_sells():
+    ledger = LotLedger(AVERAGE)
+    ledger.buy(1, 10, 10.0)
+    ledger.sell(2, 5, 20.0)  # at an average cost of 10: gain 50
+    ledger.buy(3, 5, 16.0)   # 5 units at 10 plus 5 at 16: average 13
+
+    assert ledger.average_cost == pytest.approx(13.0)
+    gains = ledger.sell(4, 10, 13.0)
+    assert [(g.buy_date, g.units, g.cost_nav) for g in gains] == [(1, 5, 13.0), (3, 5, 13.0)]
+    assert ledger.realized == pytest.approx(50.0)
+    assert ledger.average_cost == 0.0
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError, match="Unknown cost basis method"):
+        LotLedger("hifo")
@@ -0,0 +1,127 @@
+# tests/test_price_providers.py
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from prices import sources
+from prices.engine import fetch_prices
+from prices.providers import REGISTRY, CircuitOpen, FakeProvider, MfapiProvider, register
+
+
+def far_deadline():
+    return time.monotonic() + 10
+
+
+def test_breaker_opens_after_threshold_failures_and_tries_again_after_cooldown():
+    provider = FakeProvider(fail=True, retries=0, backoff=0, threshold=2, cooldown=0.05)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            provider.fetch(["A"], far_deadline())
+    assert provider.breaker.state == "open"
+    with pytest.raises(CircuitOpen):
+        provider.fetch(["A"], far_deadline())
+    assert provider.calls == 2  # an open breaker does not call upstream
+
+    time.sleep(0.06)
+    assert provider.breaker.state == "half_open"
+    with pytest.raises(ConnectionError):
+        provider.fetch(["A"], far_deadline())  # a failed trial opens it again
+    assert provider.breaker.state == "open"
+
+    time.sleep(0.06)
+    provider.fail = False
+    assert provider.fetch(["A"], far_deadline()) == {"A": 100.0}
+    assert provider.breaker.state == "closed"
+    assert provider.calls == 4
+
+
+def test_retries_count_as_one_breaker_failure():
+    provider = FakeProvider(fail=True, retries=2, backoff=0, threshold=2, cooldown=60)
+
+    with pytest.raises(ConnectionError):
+        provider.fetch(["A"], far_deadline())
+    assert provider.calls == 3
+    assert provider.breaker.state == "closed"
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    """Two fake providers tried in order for the "fake_asset" asset type."""
+    down = FakeProvider(fail=True, retries=0, backoff=0)
+    down.name = "fake_down"
+    backup = FakeProvider(prices={"B": None})
+    for provider in (down, backup):
+        monkeypatch.setitem(REGISTRY, provider.name, provider)
+    monkeypatch.setattr("config.Config.PRICE_PROVIDER_ORDER", {"fake_asset": ["fake_down", "fake"]})
+    return down, backup
+
+
+def test_fetch_prices_falls_back_along_the_chain(chain):
+    down, backup = chain
+    result = fetch_prices([("fake_asset", "A"), ("fake_asset", "B")], report=False)
+
+    assert result.prices == {("fake_asset", "A"): 100.0}
+    assert result.failed == {("fake_asset", "B"): "fake: no price data"}
+    assert down.calls == 1 and backup.calls == 1
+    assert result.errors == ["fake_down"]
+
+
+def test_fetch_prices_skips_open_breakers_and_named_providers(chain):
+    down, backup = chain
+    down.breaker.opened_at = time.monotonic()
+
+    assert fetch_prices([("fake_asset", "A")], report=False).prices == {("fake_asset", "A"): 100.0}
+    assert down.calls == 0
+    result = fetch_prices([("fake_asset", "A")], report=False, skip=("fake",))
+    assert result.failed == {("fake_asset", "A"): "fake_down: circuit open"}
+
+
+def test_register_replaces_a_provider_by_name(monkeypatch):
+    monkeypatch.setitem(REGISTRY, "fake", REGISTRY["fake"])
+    provider = register(FakeProvider(default=7.0))
+
+    assert REGISTRY["fake"] is provider
+
+
+class StubMfapi(BaseHTTPRequestHandler):
+    responses = {
+        "/mf/100/latest": (200, b'{"data": [{"date": "15-01-2024", "nav": "12.5"}]}'),
+        "/mf/200/latest": (200, b'{"meta": {}, "data": []}'),
+        "/mf/300/latest": (404, b'{"status": "not found"}'),
+        "/mf/400/latest": (503, b"unavailable"),
+    }
+
+    def do_GET(self):
+        status, body = self.responses.get(self.path, (404, b""))
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mfapi(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMfapi)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(sources, "MFAPI_LATEST_URL", f"http://127.0.0.1:{server.server_port}/mf/{{scheme_code}}/latest")
+    yield MfapiProvider(retries=0, backoff=0, threshold=1, cooldown=60)
+    server.shutdown()
+    server.server_close()
+
+
+def test_mfapi_missing_navs_are_left_out_without_tripping_the_breaker(mfapi):
+    assert mfapi.fetch(["100", "200", "300"], far_deadline()) == {"100": 12.5}
+    assert mfapi.breaker.state == "closed"
+
+
+def test_mfapi_server_errors_trip_the_breaker(mfapi):
+    with pytest.raises(requests.HTTPError):
+        mfapi.fetch(["400"], far_deadline())
+    assert mfapi.breaker.state == "open"
@@ -0,0 +1,37 @@
+# tests/test_segments.py
+import pytest
+
+from storage import GCSBackend
+
+HEADER = ["date", "scheme_code", "scheme_name", "nav", "units"]
+ROWS = {
+    ("15-01-2023", "100", "Fund A", "10", "5"),
+    ("01-03-2024", "200", "Fund B", "30", "2"),
+}
+
+
+@pytest.fixture
+def backend(fake_clients):
+    return GCSBackend("bucket")
+
+
+def test_segments_with_reordered_columns_merge_into_the_base_header(backend):
+    backend.save_csv("t.csv", HEADER, ROWS)
+    reordered = ["scheme_code", "date", "scheme_name", "nav", "units"]
+    backend.append_rows("t.csv", reordered, {("300", "10-10-2024", "Fund C", "7", "3")})
+
+    header, rows = backend.load_csv("t.csv")
+    assert header == HEADER
+    assert rows == ROWS | {("10-10-2024", "300", "Fund C", "7", "3")}
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_segment_columns_missing_from_the_base_widen_the_header(backend, compact):
+    backend.save_csv("t.csv", HEADER, ROWS)
+    backend.append_rows("t.csv", HEADER + ["type"], {("02-04-2024", "100", "Fund A", "12", "2", "sell")})
+    if compact:
+        backend.compact("t.csv")
+
+    header, rows = backend.load_csv("t.csv")
+    assert header == HEADER + ["type"]
+    assert rows == {row + ("",) for row in ROWS} | {("02-04-2024", "100", "Fund A", "12", "2", "sell")}
@@ -0,0 +1,41 @@
+# tests/test_snapshot.py
+import pytest
+
+from portfolio.snapshot import Snapshot
+from portfolio.transactions import TransactionSet
+from storage import LocalBackend
+
+HEADER = ["date", "scheme_code", "scheme_name", "nav", "units", "type", "asset_type"]
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr("config.Config.SNAPSHOT_CACHE_DIR", str(tmp_path / "snapshots"))
+    return LocalBackend(str(tmp_path / "portfolio.db"))
+
+
+def test_unparseable_numbers_fail_the_replay(backend):
+    backend.save_csv("t.csv", HEADER, {
+        ("15-01-2023", "100", "Fund A", "10", "5", "buy", "mutual_fund"),
+        ("16-01-2023", "100", "Fund A", "n/a", "5", "buy", "mutual_fund"),
+    })
+    transactions = TransactionSet.load(backend, "t.csv")
+
+    assert len(transactions.rows) == 2
+    with pytest.raises(ValueError, match="Invalid nav or units for scheme 100"):
+        transactions.by_scheme()
+
+
+def test_rows_keep_the_numbers_as_written():
+    rows = {
+        ("15-01-2023", "100", "Fund A", "100.50", "5.000", "buy", "mutual_fund"),
+        ("16-01-2023", "100", "Fund A", "1e2", "n/a", "sell", "mutual_fund"),
+    }
+    snapshot = Snapshot.build(HEADER, rows, "v1")
+    extended = snapshot.extend([("01-01-2023", "200", "Fund B", "7.10", "2", "buy", "mutual_fund")], "v2")
+    reloaded = Snapshot.from_buffer(extended.to_bytes())
+
+    assert set(snapshot.rows()) == rows
+    assert reloaded.rows()[0] == ("01-01-2023", "200", "Fund B", "7.10", "2", "buy", "mutual_fund")
+    assert set(reloaded.rows()) == rows | {("01-01-2023", "200", "Fund B", "7.10", "2", "buy", "mutual_fund")}
+    assert reloaded.columns["nav"].tolist() == [7.1, 100.5, 100.0]
@@ -1,108 +1,60 @@
 # tracker.py
 import csv
-import requests
-import yfinance as yf
 from collections import defaultdict
 from datetime import datetime
 from tabulate import tabulate
 from typing import IO
-from io import StringIO
-from bs4 import BeautifulSoup
 from markupsafe import escape
 import html
 
 from utils import round2, percent, format_in_indian_system, parse_indian_value
 from storage import get_storage_backend
+from prices import get_latest_prices
+from portfolio import TransactionSet, parse_transaction, xirr_batch, build_states, get_states
+from config import Config
+from instrumentation import log_event, span, timed
+import logging
 
-def get_portfolio_summary(backend=None, filename="transactions.csv") -> str:
+def get_portfolio_summary(backend=None, filename="transactions.csv", transactions=None, version=None):
     backend = backend or get_storage_backend()
-    header, rows = backend.load_csv(filename)
-
-    if not header or not rows:
+    if version is None:
+        version = backend.get_version(filename)
+    if transactions is None:
+        # Only needed when the saved per-scheme state is missing or out of date
+        transactions = lambda: TransactionSet.load(backend, filename, version)
+
+    states = get_states(backend, filename, Config.COST_BASIS_METHOD, transactions, version)
+    if not states:
         #return "⚠️ No data found in transaction file."
         raise ValueError("No data found in transaction file.")
 
-
-    csv_content = ",".join(header) + "\n" + "\n".join([",".join(row) for row in rows])
-    #return generate_summary_html(read_transactions(StringIO(csv_content)))
-    return generate_summary_data(read_transactions(StringIO(csv_content)))
+    return summarize_states(states)
 
 
+@timed("read_transactions")
 def read_transactions(file_obj: IO):
     transactions = defaultdict(list)
     reader = csv.DictReader(file_obj)
     for row in reader:
-        scheme_code = row['scheme_code']
-        transactions[scheme_code].append({
-            'date': row['date'],
-            'scheme_name': row['scheme_name'],
-            'nav': float(row['nav']),
-            'units': float(row['units']),
-            'type': row.get('type', 'buy').lower(),
-            'asset_type': row.get('asset_type', 'mutual_fund')  # default if missing
-        })
+        transactions[row['scheme_code']].append(parse_transaction(row))
     return transactions
 
 
 def fetch_latest_price(asset_type, scheme_code):
-    try:
-        if asset_type == 'mutual_fund':
-            url = f"https://api.mfapi.in/mf/{scheme_code}/latest"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            return float(data['data'][0]['nav'])
-
-        elif asset_type in ('indian_equity', 'aus_equity'):
-            ticker = yf.Ticker(scheme_code)
-            hist = ticker.history(period="5d")
-            if not hist.empty:
-                return float(hist["Close"][-1])
-            
-            # fallback scrape
-            price = fetch_price_yahoo_fallback(scheme_code)
-            if price:
-                return price
-
-            print(f"[YahooFinance] No price data found for {scheme_code}")
-
-        else:
-            print(f"Unknown asset_type: {asset_type}")
-            return None
-    except Exception as e:
-        print(f"Error fetching price for {scheme_code} ({asset_type}): {e}")
-        return None
-
-def fetch_price_yahoo_fallback(symbol):
-    url = f"https://au.finance.yahoo.com/quote/{symbol}"
-    headers = {"User-Agent": "Mozilla/5.0"}
-    resp = requests.get(url, headers=headers)
-    soup = BeautifulSoup(resp.text, "html.parser")
-
-    # Find the span that holds the current price (this selector may change over time)
-    price_span = soup.find("fin-streamer", {"data-field": "regularMarketPrice"})
-    if price_span:
-        try:
-            price = float(price_span.text.replace(',', ''))
-            return price
-        except Exception:
-            pass
-    return None
+    result = get_latest_prices([(asset_type, scheme_code)])
+    for (_, code), reason in result.failed.items():
+        log_event("price_fetch_failed", logging.WARNING, asset_type=asset_type, scheme_code=code, reason=reason)
+    return result.get(asset_type, scheme_code)
 
+@timed("xirr")
 def xirr(cash_flows, max_iterations=100, tolerance=1e-6):
-    def xnpv(rate):
-        return sum(cf / (1 + rate) ** ((date - cash_flows[0][0]).days / 365.0) for date, cf in cash_flows)
-
-    low, high = -0.9999, 10
-    for _ in range(max_iterations):
-        mid = (low + high) / 2
-        npv = xnpv(mid)
-        if abs(npv) < tolerance:
-            return mid
-        if npv > 0:
-            low = mid
-        else:
-            high = mid
-    return None
+    """XIRR of (date, amount) pairs, or None when it cannot be solved.
+
+    Use portfolio.solve_xirr / xirr_batch to get the reason for a failure.
+    """
+    dates, amounts = zip(*cash_flows) if cash_flows else ((), ())
+    result = xirr_batch([(dates, amounts)], tolerance=tolerance, max_iterations=max_iterations)[0]
+    return result.rate
 
 def format_currency(value, asset_type):
     if asset_type in ('mutual_fund', 'indian_equity'):
@@ -251,8 +203,55 @@ def generate_summary_html(transactions):
 """
     return html_output
 '''
+def _new_asset_summary():
+    return {
+        "rows": [],
+        "totals": {
+            "invested": 0,
+            "current": 0,
+            "realized": 0,
+            "unrealized": 0,
+            "xirr": "N/A",
+            "xirr_rate": None,
+        },
+        "currency": "₹", # default currency, can override below
+        "display_name": "Asset"
+    }
+
+
+class SummaryData(defaultdict):
+    """asset_type -> {rows, totals, currency, display_name}, plus portfolio-wide figures."""
+
+    def __init__(self):
+        super().__init__(_new_asset_summary)
+        self.portfolio = {"xirr": "N/A", "xirr_rate": None, "xirr_error": None}
+
+    def to_dict(self):
+        return {"assets": dict(self), "portfolio": self.portfolio}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary_data = cls()
+        summary_data.update(data["assets"])
+        summary_data.portfolio = data["portfolio"]
+        return summary_data
+
+
 def generate_summary_data(transactions):
-    today = datetime.today()
+    return summarize_states(build_states(transactions, Config.COST_BASIS_METHOD))
+
+
+def price_symbols(states):
+    return [(state["asset_type"], scheme_code) for scheme_code, state in states.items()]
+
+
+def summarize_states(states, price_result=None):
+    """Apply the latest prices to precomputed per-scheme states (see portfolio.state).
+
+    Pass `price_result` when the prices were already looked up (e.g. by the
+    async summary view); otherwise they are fetched here.
+    """
+    today = datetime.today().toordinal()
     latest_prices = {}
     total_portfolio_value = 0
 
@@ -264,37 +263,29 @@ def generate_summary_data(transactions):
         # add others if needed
     }
 
-    summary_data = defaultdict(lambda: {
-        "rows": [],
-        "totals": {
-            "invested": 0,
-            "current": 0,
-            "realized": 0,
-            "unrealized": 0
-        },
-        "currency": "₹", # default currency, can override below
-        "display_name": "Asset"
-    })
+    summary_data = SummaryData()
+    # XIRR inputs, solved together once every scheme has been processed
+    xirr_rows = []
+    xirr_groups = []
+    asset_flows = defaultdict(lambda: ([], []))
 
     # 1. Get total portfolio value (used for % allocation)
-    for scheme_code, txns in transactions.items():
-        asset_type = txns[0].get("asset_type", "unknown")
-        scheme_code = scheme_code.strip()
-        latest_price = fetch_latest_price(asset_type, scheme_code)
+    if price_result is None:
+        price_result = get_latest_prices(price_symbols(states))
+    for (asset_type, scheme_code), reason in price_result.failed.items():
+        log_event("price_fetch_failed", logging.WARNING, asset_type=asset_type, scheme_code=scheme_code, reason=reason)
+
+    for scheme_code, state in states.items():
+        latest_price = price_result.get(state["asset_type"], scheme_code)
         if latest_price is None:
             continue
-        
-        
-        
-        net_units = sum(t["units"] if t["type"] == "buy" else -t["units"] for t in txns)
-        total_portfolio_value += net_units * latest_price
+
+        total_portfolio_value += state["net_units"] * latest_price
         latest_prices[scheme_code] = latest_price
 
     # 2. Process each scheme
-    for scheme_code, txns in transactions.items():
-        asset_type = txns[0].get("asset_type", "unknown")
-        scheme_code = scheme_code.strip()
-        scheme_name = txns[0]["scheme_name"]
+    for scheme_code, state in states.items():
+        asset_type = state["asset_type"]
         latest_price = latest_prices.get(scheme_code)
         if latest_price is None:
             continue
@@ -302,57 +293,26 @@ def generate_summary_data(transactions):
         # Override currency for this asset_type if mapped
         summary_data[asset_type]["currency"] = currency_map.get(asset_type, "₹")
         summary_data[asset_type]["display_name"] = asset_type.replace('_', ' ').title()
-        net_units = 0
-        invested = 0
-        realized_pl = 0
-        cash_flows = []
-        buy_lots = []
-        navs = []
-
-        for t in sorted(txns, key=lambda x: x["date"]):
-            date = datetime.strptime(t["date"], "%d-%m-%Y")
-            nav = t["nav"]
-            units = t["units"]
-            tx_type = t["type"]
-
-            if tx_type == "buy":
-                net_units += units
-                invested += nav * units
-                buy_lots.append({"units": units, "nav": nav})
-                cash_flows.append((date, -nav * units))
-                navs.append(nav)
-
-            elif tx_type == "sell":
-                net_units -= units
-                cash_flows.append((date, nav * units))
-                remaining = units
-                while remaining > 0 and buy_lots:
-                    lot = buy_lots[0]
-                    if lot["units"] <= remaining:
-                        gain = (nav - lot["nav"]) * lot["units"]
-                        realized_pl += gain
-                        remaining -= lot["units"]
-                        buy_lots.pop(0)
-                    else:
-                        gain = (nav - lot["nav"]) * remaining
-                        realized_pl += gain
-                        lot["units"] -= remaining
-                        remaining = 0
+        net_units = state["net_units"]
+        invested = state["invested"]
+        realized_pl = state["realized"]
 
         current_value = net_units * latest_price
-        unrealized_pl = current_value - sum(lot["units"] * lot["nav"] for lot in buy_lots)
-        avg_nav = (sum(lot["units"] * lot["nav"] for lot in buy_lots) / net_units) if net_units else 0
+        unrealized_pl = current_value - state["cost"]
+        avg_nav = (state["cost"] / net_units) if net_units else 0
         pct_change = ((latest_price - avg_nav) / avg_nav * 100) if avg_nav else 0
         pct_portfolio = (current_value / total_portfolio_value * 100) if total_portfolio_value else 0
-        min_nav = min(navs) if navs else 0
-        max_nav = max(navs) if navs else 0
+        min_nav = state["min_nav"]
+        max_nav = state["max_nav"]
 
-        cash_flows.append((today, current_value))
-        rate = xirr(cash_flows)
-        xirr_result = percent(rate * 100) if rate else "N/A"
+        dates = [d for d, _ in state["flows"]] + [today]
+        amounts = [a for _, a in state["flows"]] + [current_value]
+        xirr_groups.append((dates, amounts))
+        asset_flows[asset_type][0].extend(dates)
+        asset_flows[asset_type][1].extend(amounts)
 
         row = {
-            "scheme_name": scheme_name,
+            "scheme_name": state["scheme_name"],
             "latest_nav": round2(latest_price),
             "net_units": round2(net_units),
             "invested": invested,
@@ -362,9 +322,26 @@ def generate_summary_data(transactions):
             "avg_nav": round2(avg_nav),
             "pct_change": percent(pct_change),
             "pct_portfolio": percent(pct_portfolio),
-            "xirr": xirr_result,
+            "xirr": "N/A",
+            "xirr_error": None,
             "min_nav": f"{min_nav:,.2f}",
             "max_nav": f"{max_nav:,.2f}",
+            # Unformatted figures, for the JSON API
+            "values": {
+                "scheme_code": scheme_code,
+                "latest_nav": latest_price,
+                "net_units": net_units,
+                "invested": invested,
+                "current_value": current_value,
+                "realized_pl": realized_pl,
+                "unrealized_pl": unrealized_pl,
+                "avg_nav": avg_nav,
+                "pct_change": pct_change,
+                "pct_portfolio": pct_portfolio,
+                "xirr": None,
+                "min_nav": min_nav,
+                "max_nav": max_nav,
+            },
         }
 
         summary_data[asset_type]["rows"].append(row)
@@ -373,5 +350,33 @@ def generate_summary_data(transactions):
         summary_data[asset_type]["totals"]["current"] += current_value
         summary_data[asset_type]["totals"]["realized"] += realized_pl
         summary_data[asset_type]["totals"]["unrealized"] += unrealized_pl
+        xirr_rows.append(row)
+
+    # 3. XIRR for every scheme, each asset type and the whole portfolio in one pass
+    asset_types = list(asset_flows)
+    xirr_groups.extend(asset_flows[asset_type] for asset_type in asset_types)
+    currencies = {summary_data[asset_type]["currency"] for asset_type in asset_types}
+    if len(currencies) == 1:
+        xirr_groups.append((
+            [d for dates, _ in asset_flows.values() for d in dates],
+            [a for _, amounts in asset_flows.values() for a in amounts],
+        ))
+    with span("xirr", groups=len(xirr_groups)):
+        results = xirr_batch(xirr_groups)
+
+    for row, result in zip(xirr_rows, results):
+        row["xirr"] = percent(result.rate * 100) if result else "N/A"
+        row["xirr_error"] = result.reason
+        row["values"]["xirr"] = result.rate if result else None
+    for asset_type, result in zip(asset_types, results[len(xirr_rows):]):
+        summary_data[asset_type]["totals"]["xirr"] = percent(result.rate * 100) if result else "N/A"
+        summary_data[asset_type]["totals"]["xirr_rate"] = result.rate if result else None
+    if len(currencies) == 1:
+        result = results[-1]
+        summary_data.portfolio["xirr"] = percent(result.rate * 100) if result else "N/A"
+        summary_data.portfolio["xirr_rate"] = result.rate if result else None
+        summary_data.portfolio["xirr_error"] = result.reason
+    elif currencies:
+        summary_data.portfolio["xirr_error"] = "holdings are in more than one currency"
 
     return summary_data
@@ -72,6 +72,16 @@ def parse_indian_value(s):
         # Fallback to raw float if no known currency symbol
         return float(s.replace(",", ""))
 
+def format_age(seconds):
+    """'just now', '5 min ago', '3 h ago', '2 days ago'"""
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h ago"
+    return f"{int(seconds // 86400)} days ago"
+
 def format_currency(value, currency_symbol="₹"):
     try:
         if currency_symbol == "A$":